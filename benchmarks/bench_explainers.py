@@ -0,0 +1,89 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_dataset import generate_record
+import expand_dataset_explanations
+import reference_explainers
+
+# Throughput of the explanation stage.
+#
+# Both corpora cycle a pool of distinct records, so building them is cheap
+# and the measured time is the explainers alone:
+#   legacy     the JSON snapshot in dataset/ in the baseline record format
+#              (no payload, "Conclusion:" syllogisms). Both implementations
+#              parse the question text here, so --impl both compares the
+#              parse-once text path with the old per-explainer regexes.
+#   generated  fresh records from generate_record, payload included. Only
+#              the current explainers understand them.
+# --impl reference runs the frozen pre-parse explainers
+# (reference_explainers.py), which need the legacy corpus.
+
+IMPLEMENTATIONS = {
+    "current": expand_dataset_explanations.generate_explanation,
+    "reference": reference_explainers.generate_explanation,
+}
+
+
+LEGACY_QUESTIONS = os.path.join(ROOT, "dataset", "questions.json")
+LEGACY_ANSWERS = os.path.join(ROOT, "dataset", "answers.json")
+
+
+def synthetic_corpus(n, seed=0, pool_size=5000):
+    pool = [generate_record(seed, i) for i in range(min(n, pool_size))]
+    return itertools.islice(itertools.cycle(pool), n)
+
+
+def legacy_corpus(n):
+    """The baseline-format records of the dataset/ snapshot, cycled to n."""
+    with open(LEGACY_QUESTIONS, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    with open(LEGACY_ANSWERS, "r", encoding="utf-8") as f:
+        answers = json.load(f)
+    # an exported snapshot may hold newer records; only the old ones qualify
+    pool = [(q, a) for q, a in zip(questions, answers) if "payload" not in q]
+    if not pool:
+        raise SystemExit(f"{LEGACY_QUESTIONS} holds no baseline-format records")
+    return itertools.islice(itertools.cycle(pool), n)
+
+
+CORPORA = {
+    "legacy": lambda n, seed: legacy_corpus(n),
+    "generated": synthetic_corpus,
+}
+
+
+def run(n, seed=0, impl="current", corpus=None):
+    generate_explanation = IMPLEMENTATIONS[impl]
+    corpus = corpus if corpus is not None else list(legacy_corpus(n))
+    start = time.perf_counter()
+    for q, a in corpus:
+        generate_explanation(q, a)
+    elapsed = time.perf_counter() - start
+    return {"impl": impl, "records": n, "seconds": round(elapsed, 3), "records_per_sec": round(n / elapsed)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--impl", choices=(*IMPLEMENTATIONS, "both"), default="both",
+                        help="explainers to time; both runs reference then current on one corpus")
+    parser.add_argument("--corpus", choices=CORPORA, default="legacy",
+                        help="legacy: baseline-format records from dataset/; generated: fresh records "
+                             "(current explainers only)")
+    args = parser.parse_args()
+    if args.corpus != "legacy" and args.impl != "current":
+        parser.error("the reference explainers only read the legacy record format; use --corpus legacy")
+    impls = list(IMPLEMENTATIONS)[::-1] if args.impl == "both" else [args.impl]
+    corpus = list(CORPORA[args.corpus](args.records, args.seed))
+    for impl in impls:
+        print(json.dumps(run(args.records, args.seed, impl, corpus)))
@@ -0,0 +1,300 @@
+import re
+from collections import defaultdict
+
+# FROZEN BASELINE - do not edit or keep in step with the live explainers.
+#
+# The explainers as they were before questions were parsed once into
+# structured forms (core.question_parser): each one re-parses the question
+# text with its own regexes. Kept verbatim as the "before" side of
+# bench_explainers.py; not used by the dataset scripts. They only read the
+# baseline record format (e.g. a single "Conclusion:" line in syllogisms),
+# so the benchmark feeds them the legacy records in dataset/.
+
+# Helpers for syllogism parsing
+def parse_statements_block(text):
+    # Extract lines between 'Statements:' and 'Conclusion:'
+    m = re.search(r'Statements:\n(.*?)\nConclusion:', text, re.S)
+    if not m:
+        return [], ''
+    stmts_block = m.group(1).strip()
+    stmts = [s.strip() for s in stmts_block.split('\n') if s.strip()]
+    concl_m = re.search(r'Conclusion:\s*(.*)', text)
+    concl = concl_m.group(1).strip() if concl_m else ''
+    return stmts, concl
+
+def build_relationships(stmts):
+    all_map = {}    # All X are Y -> all_map[X] = Y
+    some_map = defaultdict(list)  # Some X are Y -> some_map[X].append(Y)
+    no_map = defaultdict(list)    # No X are Y -> no_map[X].append(Y)
+    for s in stmts:
+        s = s.rstrip('.')
+        if s.startswith('All '):
+            m = re.match(r'All\s+(\w)\s+are\s+(\w)', s)
+            if m:
+                a,b = m.groups()
+                all_map[a]=b
+        elif s.startswith('Some '):
+            m = re.match(r'Some\s+(\w)\s+are\s+(\w)', s)
+            if m:
+                a,b = m.groups()
+                some_map[a].append(b)
+        elif s.startswith('No '):
+            m = re.match(r'No\s+(\w)\s+are\s+(\w)', s)
+            if m:
+                a,b = m.groups()
+                no_map[a].append(b)
+    return all_map, some_map, no_map
+
+def explain_syllogism(question_text, expected):
+    stmts, concl = parse_statements_block(question_text)
+    if not stmts:
+        return 'Translate the premises into set relationships and apply syllogistic rules to test the conclusion.'
+    all_map, some_map, no_map = build_relationships(stmts)
+    # Build text explanation heuristically
+    explanation_lines = []
+    explanation_lines.append('Translate premises:')
+    for s in stmts:
+        explanation_lines.append('- ' + s)
+    explanation_lines.append('Derive consequences:')
+    # try simple patterns
+    # Example pattern: if concl is 'Some G are not D' and we have 'Some G are E' and 'No E are D'
+    m = re.match(r'Some\s+(\w)\s+are\s+not\s+(\w)', concl)
+    if m:
+        x,y = m.groups()
+        # search for Some x are z and No z are y
+        for z, zs in some_map.items():
+            pass
+        # check direct pattern
+        for z, zs in some_map.items():
+            if z == x:
+                for ztarget in zs:
+                    if y in no_map and ztarget in no_map and ztarget in no_map[y]:
+                        pass
+        # more straightforward: find any 'Some X are Z' where 'No Z are Y'
+        found = False
+        for z in some_map.get(x,[]):
+            if z in no_map and y in no_map[z]:
+                explanation_lines.append(f"- We know 'Some {x} are {z}' and 'No {z} are {y}', so those {x} that are {z} cannot be {y}.")
+                explanation_lines.append(f"Hence 'Some {x} are not {y}' holds, so the conclusion follows.")
+                found = True
+                break
+        # Check alternative: Some X are Z and No Z are Y (written as 'No Z are Y' or 'No Y are Z')
+        if not found:
+            for z in some_map.get(x,[]):
+                if z in no_map and y in no_map[z]:
+                    explanation_lines.append(f"- {x} that are {z} are not {y}; hence some {x} are not {y}.")
+                    found = True
+                    break
+        if not found:
+            # try chain: All Y are X and Some X are Z and No Z are Y -> some X are not Y
+            # generic fallback
+            explanation_lines.append('Apply Venn-diagram/set reasoning to verify existence of an X that is not Y using the premises; the conclusion follows from the contradictions between the relevant sets.')
+        return ' '.join(explanation_lines)
+    # fallback
+    return ' '.join(explanation_lines)
+
+# Mixed series
+
+def explain_mixed_series(question_text, choices, expected):
+    m = re.search(r'Find next term:\n(.*)', question_text, re.S)
+    if not m:
+        return 'Identify the letter pattern and numeric pattern in the sequence to predict the next term.'
+    raw_tokens = [t.strip() for t in m.group(1).split(',')]
+    # remove tokens that are just placeholders like '?' and keep only real terms
+    seq = [t for t in raw_tokens if t and '?' not in t]
+    # letters and numbers (defensive parsing)
+    letters = []
+    nums = []
+    for s in seq:
+        mo_letter = re.search(r'([A-Z])', s)
+        mo_num = re.search(r'(\d+)', s)
+        if mo_letter:
+            letters.append(mo_letter.group(1))
+        if mo_num:
+            nums.append(int(mo_num.group(1)))
+    # detect letter step
+    letter_diffs = [(ord(letters[i+1])-ord(letters[i])) for i in range(len(letters)-1)]
+    common_diff = max(set(letter_diffs), key=letter_diffs.count) if letter_diffs else 0
+    next_letter = chr(ord(letters[-1]) + common_diff)
+    # detect numeric pattern: try squares mod 10
+    # compute expected sequence of n^2 mod 10 for n starting 0
+    candidates = []
+    # try to align with k^2 % 10 for some start k
+    for start in range(0,10):
+        cand = [( (start+i)**2 ) % 10 for i in range(len(nums)+1)]
+        if cand[:len(nums)] == nums:
+            candidates.append(('square_mod_10', start, cand))
+    if candidates:
+        _, start, cand = candidates[0]
+        next_num = cand[len(nums)]
+        pattern_desc = f"The letters increase by {common_diff} each term (e.g. {', '.join(letters[:3])} -> +{common_diff}). The numbers follow k^2 mod 10 starting from k={start}, giving {nums} so next is {next_num}."
+    else:
+        # fallback: try polynomial fit for small degree
+        # simplest: observe repeating pattern
+        next_num = None
+        # try repeating period
+        for p in range(2,6):
+            if all(nums[i]==nums[i%p] for i in range(len(nums))):
+                next_num = nums[len(nums)%p]
+                break
+        if next_num is None:
+            # default to difference pattern
+            diffs = [(nums[i+1]-nums[i]) for i in range(len(nums)-1)]
+            next_num = nums[-1] + (diffs[-1] if diffs else 0)
+        pattern_desc = f"Letters increment by {common_diff} each step; numeric pattern detected heuristically, next number is {next_num}."
+    next_term = f"{next_letter}{next_num}"
+    explanation = pattern_desc + f" Therefore the next term is {next_term}."
+    # confirm with choices
+    chosen_text = None
+    for c in choices:
+        if c.startswith(expected):
+            # choice line like 'A) S4' or choices is list of strings
+            try:
+                chosen_text = c.split(')',1)[1].strip()
+            except:
+                chosen_text = c
+            break
+    if chosen_text and chosen_text != next_term:
+        explanation += f" The computed next term {next_term} differs from the provided choice {chosen_text}; however the best-fit pattern is explained above."
+    else:
+        explanation += f" This matches choice {expected}: {chosen_text or next_term}."
+    return explanation
+
+# Blood relations
+
+def explain_blood_relations(question_text, choices, expected):
+    # parse sentences
+    sents = [s.strip() for s in question_text.split('.') if s.strip()]
+    parent = {}
+    gender = {}
+    siblings = defaultdict(list)
+    for s in sents:
+        # A is the father/mother of B
+        m = re.match(r'([A-Z]) is the (father|mother) of ([A-Z])', s)
+        if m:
+            a,role,b = m.groups()
+            parent[b]=a
+            gender[a] = 'M' if role=='father' else 'F'
+            continue
+        # B is the sister/brother of C
+        m = re.match(r'([A-Z]) is the (sister|brother) of ([A-Z])', s)
+        if m:
+            a,role,b = m.groups()
+            gender[a] = 'F' if role=='sister' else 'M'
+            siblings[a].append(b)
+            siblings[b].append(a)
+            continue
+        # C is the son/daughter of D
+        m = re.match(r'([A-Z]) is the (son|daughter) of ([A-Z])', s)
+        if m:
+            a,role,b = m.groups()
+            parent[a]=b
+            gender[a] = 'M' if role=='son' else 'F'
+            continue
+        # D is the wife/husband of E
+        m = re.match(r'([A-Z]) is the (wife|husband) of ([A-Z])', s)
+        if m:
+            a,role,b = m.groups()
+            gender[a] = 'F' if role=='wife' else 'M'
+            gender[b] = 'M' if role=='wife' else 'F'
+            # spouse relationship not stored except genders
+            continue
+    # try to compute relation A to F (example in dataset)
+    # find the letters asked about in question: last sentence often 'How is A related to F?'
+    qm = re.search(r'How is ([A-Z]) related to ([A-Z])', question_text)
+    if not qm:
+        qm = re.search(r'How is ([A-Z]) related to ([A-Z])\?', question_text)
+    if qm:
+        x,y = qm.groups()
+    else:
+        # fallback use common letters A and F
+        x,y = 'A','F'
+    # Build path from y up parents to ancestors; check if x is parent/grandparent/uncle/brother-in-law etc.
+    steps = []
+    # If x is parent of y
+    if parent.get(y)==x:
+        rel = 'Father' if gender.get(x)=='M' else 'Mother'
+        steps.append(f"{x} is the parent of {y}, so {x} is {rel} of {y}.")
+    else:
+        # check: x is parent of parent of y -> grandparent
+        p = parent.get(y)
+        if p and parent.get(p)==x:
+            rel = 'Grandfather' if gender.get(x)=='M' else 'Grandmother'
+            steps.append(f"{x} is the parent of {p}, who is parent of {y}; hence {x} is {rel} of {y}.")
+        else:
+            # siblings and spouse cases to detect uncle/brother-in-law
+            # find if x is sibling of y's parent -> uncle/aunt
+            if p and x in siblings.get(p,[]):
+                rel = 'Uncle' if gender.get(x)=='M' else 'Aunt'
+                steps.append(f"{x} is sibling of {p}, who is parent of {y}; so {x} is {rel} of {y}.")
+            else:
+                # brother-in-law: if x is spouse of sibling or sibling of spouse
+                # check siblings of y
+                sibs = siblings.get(y, [])
+                for s in sibs:
+                    # if x is spouse of s -> brother/sister-in-law
+                    # we don't have spouse mapping, but some sentences give 'D is the wife of E'
+                    # check if gender relation indicates x is spouse of someone
+                    pass
+                steps.append('Derived relation by composing the given parent/sibling/spouse facts.')
+    if not steps:
+        steps.append('Compose the given relations step-by-step (parent, sibling, spouse) to reach the final relation.')
+    explanation = ' '.join(['Given relations:'] + [f"{s}." for s in sents] + ['Steps:'] + steps)
+    return explanation
+
+# Seating arrangements
+
+def explain_seating(question_text, choices, expected):
+    # find asked person and target
+    m = re.search(r'What is the position of ([A-Z]) from the left\?', question_text)
+    if m:
+        person = m.group(1)
+    else:
+        person = None
+    chosen_text = None
+    for c in choices:
+        if c.startswith(expected):
+            try:
+                chosen_text = c.split(')',1)[1].strip()
+            except:
+                chosen_text = c
+            break
+    explanation = 'Use the given pairwise constraints to construct the unique linear arrangement (place anchors from explicit left/right clues, then deduce remaining positions).'
+    if person and chosen_text:
+        explanation += f" After building the arrangement the position of {person} from the left is {chosen_text} (choice {expected})."
+    else:
+        explanation += ' The full constraint set produces a unique placement; the stated choice is the result.'
+    return explanation
+
+# Generic fallback
+
+def explain_generic(qtext, choices, expected, short_expl):
+    chosen_text = None
+    for c in choices:
+        if c.startswith(expected):
+            try:
+                chosen_text = c.split(')',1)[1].strip()
+            except:
+                chosen_text = c
+            break
+    explanation = f"{short_expl}. The correct choice is {expected} ({chosen_text}) if applicable."
+    return explanation
+
+
+def generate_explanation(q, a):
+    """Same contract as expand_dataset_explanations.generate_explanation."""
+    topic = q.get('topic','')
+    qtext = q.get('question','')
+    expected = q.get('expected_answer') or a.get('answer') or ''
+    choices = q.get('choices', [])
+    if 'Syllog' in topic or 'Syllogisms' in topic:
+        generated = explain_syllogism(qtext, expected)
+    elif 'Mixed Series' in topic:
+        generated = explain_mixed_series(qtext, choices, expected)
+    elif 'Blood Relation' in topic or 'Blood Relations' in topic:
+        generated = explain_blood_relations(qtext, choices, expected)
+    elif 'Seating' in topic:
+        generated = explain_seating(qtext, choices, expected)
+    else:
+        generated = explain_generic(qtext, choices, expected, q.get('explanation','') or 'Apply domain-specific reasoning')
+    return expected, generated
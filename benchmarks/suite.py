@@ -0,0 +1,319 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_explainers import synthetic_corpus
+
+# Offline CPU benchmark suite.
+#
+#   python benchmarks/suite.py run --size 10k [--output results.json] [--save-baseline]
+#   python benchmarks/suite.py compare benchmarks/baselines/10k.json results.json
+#
+# Every stage runs in a fresh interpreter and is repeated with the fastest
+# run kept to damp scheduler noise. Stages work on a synthetic corpus of
+# --size records built from a fixed seed (a cycled pool of generated
+# records, as in bench_explainers.py). The corpus is built once, in its own
+# process, and written to questions.json/answers.json in a temp directory;
+# each stage then loads what it needs in an untimed setup step. Memory is
+# reported as the stage's RSS growth: the peak while it runs minus the RSS
+# when it starts, so setup does not mask a stage that holds a whole file in
+# memory. Generator stages draw fresh items and are capped at GENERATOR_CAP
+# items, since the slowest generators would otherwise dominate the 1M tier.
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+GENERATOR_CAP = 20_000
+DEFAULT_THRESHOLD = 0.10
+# RSS growth within this many MiB of the baseline is noise, whatever the ratio
+MEMORY_SLACK_MB = 2.0
+
+
+def write_corpus(n, seed, corpus_dir):
+    from core.file_manager import write_json_array
+    records = list(synthetic_corpus(n, seed))
+    write_json_array(os.path.join(corpus_dir, "questions.json"), (q for q, _ in records))
+    write_json_array(os.path.join(corpus_dir, "answers.json"), (a for _, a in records))
+
+
+def corpus_paths(corpus_dir):
+    return os.path.join(corpus_dir, "questions.json"), os.path.join(corpus_dir, "answers.json")
+
+
+def load_corpus(corpus_dir):
+    from core.file_manager import iter_json_array
+    qpath, apath = corpus_paths(corpus_dir)
+    return list(zip(iter_json_array(qpath), iter_json_array(apath)))
+
+
+def timed_loop(items, fn, repeats=3):
+    """Best of `repeats` passes, so short stages are not dominated by noise."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# A stage is setup(n, seed, corpus_dir) -> run, or None to skip; run() does
+# the measured work and returns (records, seconds).
+
+def bench_generator(kind):
+    def setup(n, seed, corpus_dir):
+        from generate_dataset import TOPIC_GENERATORS
+        gen = TOPIC_GENERATORS[kind]
+        n = min(n, GENERATOR_CAP)
+        rng = random.Random(seed)
+
+        def run():
+            start = time.perf_counter()
+            for _ in range(n):
+                gen(rng)
+            return n, time.perf_counter() - start
+        return run
+    return setup
+
+
+def bench_series_batch(n, seed, corpus_dir):
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    from generators import mixed_series
+    rng = np.random.default_rng(seed)
+
+    def run():
+        start = time.perf_counter()
+        for i in range(0, n, 10_000):
+            mixed_series.generate_batch(min(10_000, n - i), rng)
+        return n, time.perf_counter() - start
+    return run
+
+
+def bench_formatter(n, seed, corpus_dir):
+    from core.formatter import build_question
+    rng = random.Random(seed)
+    # a mix of full, short and duplicated distractor lists
+    cases = [
+        ("Syllogisms", "Statements: ...", "Follows", ["Does not follow", "Possibly follows", "None"], "x"),
+        ("Seating", "Eight persons ...", "4", ["1", "2"], "x"),
+        ("Blood Relations", "A is ...", "Uncle", ["Aunt", "Aunt", "Father", "Cousin"], "x"),
+    ]
+    items = [cases[i % len(cases)] for i in range(n)]
+    return lambda: (n, timed_loop(items, lambda c: build_question(*c, rng=rng)))
+
+
+def bench_export(n, seed, corpus_dir):
+    from prepare_training_data import export
+
+    def run():
+        # streams the corpus files; its memory should not grow with n
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            count, _, _ = export(os.path.join(tmp, "train.json"), sources=corpus_paths(corpus_dir))
+            return count, time.perf_counter() - start
+    return run
+
+
+def bench_explain(n, seed, corpus_dir):
+    from expand_dataset_explanations import generate_explanation
+    records = load_corpus(corpus_dir)
+    return lambda: (n, timed_loop(records, lambda r: generate_explanation(*r)))
+
+
+def bench_verify(n, seed, corpus_dir):
+    from verify_dataset import verify_record
+    records = load_corpus(corpus_dir)
+    return lambda: (n, timed_loop(records, lambda r: verify_record(r[0])))
+
+
+STAGES = {
+    "generate.series": bench_generator("series"),
+    "generate.syllogism": bench_generator("syllogism"),
+    "generate.kinship": bench_generator("kinship"),
+    "generate.seating": bench_generator("seating"),
+    "generate.series_batch": bench_series_batch,
+    "formatter": bench_formatter,
+    "export": bench_export,
+    "explain": bench_explain,
+    "verify": bench_verify,
+}
+
+
+def run_stage(name, n, seed, corpus_dir):
+    """Run one stage in this process; returns its result dict (None if skipped)."""
+    from core.instrument import peak_rss_mb, rss_mb, reset_peak_rss, peak_rss_since_reset_mb
+    run = STAGES[name](n, seed, corpus_dir)
+    if run is None:
+        return None
+    gc.collect()
+    base = rss_mb()
+    tracked = reset_peak_rss()
+    records, seconds = run()
+    peak = peak_rss_since_reset_mb() if tracked else None
+    return {
+        "records": records,
+        "seconds": round(seconds, 4),
+        "records_per_sec": round(records / seconds, 1) if seconds else None,
+        "rss_growth_mb": round(peak - base, 1) if peak is not None and base is not None else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_subprocess(*args):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *map(str, args)],
+        cwd=ROOT, capture_output=True, text=True,
+        # string hashing affects dict/set layout and, measurably, timings
+        env=dict(os.environ, PYTHONHASHSEED=str(args[-1]))
+    )
+    if proc.returncode:
+        raise SystemExit(f"{' '.join(map(str, args[:2]))} failed:\n{proc.stderr}")
+    return proc.stdout
+
+
+def run_suite(size, seed=0, stages=None, repeat=3):
+    """Run each stage `repeat` times in fresh processes and keep its fastest run."""
+    n = SIZES[size]
+    results = {}
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        run_subprocess("corpus", n, corpus_dir, seed)
+        for name in stages or STAGES:
+            best = None
+            for _ in range(repeat):
+                result = json.loads(run_subprocess("stage", name, n, corpus_dir, seed).strip().splitlines()[-1])
+                if result is None:
+                    break
+                if best is None or result["records_per_sec"] > best["records_per_sec"]:
+                    best = result
+            if best is not None:
+                results[name] = best
+                print(f"{name:<24}{best['records_per_sec']:>14} rec/s{best['rss_growth_mb']!s:>10} MiB",
+                      file=sys.stderr)
+            else:
+                print(f"{name:<24}{'skipped':>14}", file=sys.stderr)
+    return {
+        "meta": {
+            "size": size,
+            "records": n,
+            "seed": seed,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%d"),
+        },
+        "stages": results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Per-stage throughput and RSS-growth ratios of current vs baseline.
+    A stage regresses when throughput drops, or RSS growth rises (beyond
+    MEMORY_SLACK_MB), by more than threshold, or when it is missing from
+    current, e.g. renamed, crashed or skipped. Returns (rows, regressed
+    stage names); a missing stage's row has None for current and ratios.
+    """
+    rows = []
+    regressed = []
+    for name, base in baseline["stages"].items():
+        cur = current["stages"].get(name)
+        if cur is None:
+            rows.append((name, base["records_per_sec"], None, None, None, True))
+            regressed.append(name)
+            continue
+        speed = cur["records_per_sec"] / base["records_per_sec"] if base["records_per_sec"] else 1.0
+        memory = 1.0
+        base_mb, cur_mb = base.get("rss_growth_mb"), cur.get("rss_growth_mb")
+        if base_mb is not None and cur_mb is not None:
+            memory = (cur_mb + MEMORY_SLACK_MB) / (base_mb + MEMORY_SLACK_MB)
+        bad = speed < 1 - threshold or memory > 1 + threshold
+        rows.append((name, base["records_per_sec"], cur["records_per_sec"], speed, memory, bad))
+        if bad:
+            regressed.append(name)
+    return rows, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the suite")
+    p_run.add_argument("--size", choices=SIZES, default="10k")
+    p_run.add_argument("--seed", type=int, default=0)
+    p_run.add_argument("--repeat", type=int, default=3,
+                       help="runs per stage; the fastest is kept (default 3)")
+    p_run.add_argument("--stage", action="append", choices=STAGES, default=None,
+                       help="run only this stage (repeatable)")
+    p_run.add_argument("--output", default=None, help="write results JSON here (default: stdout)")
+    p_run.add_argument("--save-baseline", action="store_true",
+                       help="also store the results as benchmarks/baselines/<size>.json")
+
+    p_cmp = sub.add_parser("compare", help="compare results against a baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="allowed relative slowdown / RSS growth (default 0.10)")
+
+    p_corpus = sub.add_parser("corpus")  # internal: write the corpus files
+    p_corpus.add_argument("n", type=int)
+    p_corpus.add_argument("corpus_dir")
+    p_corpus.add_argument("seed", type=int)
+
+    p_stage = sub.add_parser("stage")  # internal: one stage in a fresh process
+    p_stage.add_argument("name", choices=STAGES)
+    p_stage.add_argument("n", type=int)
+    p_stage.add_argument("corpus_dir")
+    p_stage.add_argument("seed", type=int)
+
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        write_corpus(args.n, args.seed, args.corpus_dir)
+    elif args.command == "stage":
+        print(json.dumps(run_stage(args.name, args.n, args.seed, args.corpus_dir)))
+    elif args.command == "run":
+        results = run_suite(args.size, args.seed, args.stage, args.repeat)
+        text = json.dumps(results, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        if args.save_baseline:
+            os.makedirs(BASELINE_DIR, exist_ok=True)
+            with open(os.path.join(BASELINE_DIR, f"{args.size}.json"), "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        rows, regressed = compare(baseline, current, args.threshold)
+        print(f"{'stage':<24}{'baseline':>12}{'current':>12}{'speed':>8}{'memory':>8}")
+        for name, base, cur, speed, memory, bad in rows:
+            if cur is None:
+                print(f"{name:<24}{base:>12}{'missing':>12}{'':>8}{'':>8}  REGRESSION")
+                continue
+            print(f"{name:<24}{base:>12}{cur:>12}{speed:>8.2f}{memory:>8.2f}{'  REGRESSION' if bad else ''}")
+        if regressed:
+            print(f"{len(regressed)} stage(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from core.file_manager import read_manifest, open_store
+from core.question_parser import record_difficulty
+from core.instrument import peak_rss_mb
+
+# Lazy, memory-mapped access to a JSONL record store.
+#
+# Every shard gets an index file under <store>/index/ holding, as native
+# 8-byte integers, the byte offset of each record (plus the end of the
+# shard) followed, for each grouping, by the shard's record numbers grouped
+# by key. The groupings are by topic and by stratum, a (topic, difficulty
+# score) pair. index.json lists the keys of each grouping and, per shard,
+# the size and mtime it was indexed at and its per-key record counts.
+# Opening a store reads only that metadata; a shard is indexed the first
+# time it is seen, and again after rewrite_shard changes it. Shards and
+# index arrays are mapped, not read, and records are decoded only when
+# accessed, so start-up time and resident memory do not grow with the store.
+
+INDEX_DIR = "index"
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 2
+GROUPINGS = ("topic", "stratum")
+TOPIC, STRATUM = range(len(GROUPINGS))
+
+QUESTIONS_STORE = "store/questions"
+ANSWERS_STORE = "store/answers"
+
+# difficulty buckets per topic for stratified sampling
+DIFFICULTY_BUCKETS = 3
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def record_keys(record):
+    """The record's key in each grouping."""
+    topic = record.get("topic", "")
+    return topic, (topic, record_difficulty(record))
+
+
+def index_shard(path, key_codes):
+    """
+    (offsets, grouped, counts) for one shard. offsets has one more entry
+    than there are records; per grouping, grouped[g] lists record numbers
+    key by key and counts[g][code] is the number of records with each key.
+    New keys are added to key_codes[g] (key -> code).
+    """
+    offsets = array("Q", [0])
+    codes = [[] for _ in GROUPINGS]
+    with open(path, "rb") as f:
+        for line in f:
+            offsets.append(offsets[-1] + len(line))
+            for g, key in enumerate(record_keys(json.loads(line))):
+                codes[g].append(key_codes[g].setdefault(key, len(key_codes[g])))
+    grouped, counts = [], []
+    for g, c in enumerate(codes):
+        n = [0] * len(key_codes[g])
+        for x in c:
+            n[x] += 1
+        counts.append(n)
+        grouped.append(array("Q", sorted(range(len(c)), key=c.__getitem__)))
+    return offsets, grouped, counts
+
+
+def _key(k):
+    # JSON turns stratum tuples into lists
+    return tuple(k) if isinstance(k, list) else k
+
+
+class Store:
+    """The mapped shards of one store and their index arrays."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.manifest = read_manifest(store_dir)
+        shards = self.manifest["shards"]
+        self.starts = [s["start"] for s in shards]
+        self.sizes = [s["records"] for s in shards]
+        self._maps = [None] * len(shards)
+        self._offsets = [None] * len(shards)
+        self._grouped = [None] * len(shards)
+        self._load_index()
+
+    def __len__(self):
+        return self.manifest["records"]
+
+    def _index_dir(self):
+        return os.path.join(self.store_dir, INDEX_DIR)
+
+    def _load_index(self):
+        path = os.path.join(self._index_dir(), INDEX_FILE)
+        meta = {"format": INDEX_FORMAT, "keys": [[] for _ in GROUPINGS], "shards": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if loaded.get("format") == INDEX_FORMAT:
+                meta = loaded
+        key_codes = [{_key(k): c for c, k in enumerate(keys)} for keys in meta["keys"]]
+
+        stale = False
+        for shard in self.manifest["shards"]:
+            st = os.stat(os.path.join(self.store_dir, shard["file"]))
+            entry = meta["shards"].get(shard["file"])
+            if entry and entry["bytes"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                continue
+            offsets, grouped, counts = index_shard(os.path.join(self.store_dir, shard["file"]), key_codes)
+            os.makedirs(self._index_dir(), exist_ok=True)
+            idx_path = os.path.join(self._index_dir(), shard["file"] + ".idx")
+            with open(idx_path + ".tmp", "wb") as f:
+                offsets.tofile(f)
+                for g in grouped:
+                    g.tofile(f)
+            os.replace(idx_path + ".tmp", idx_path)
+            meta["shards"][shard["file"]] = {"bytes": st.st_size, "mtime_ns": st.st_mtime_ns, "counts": counts}
+            stale = True
+
+        meta["keys"] = [sorted(codes, key=codes.get) for codes in key_codes]
+        if stale:
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, path)
+
+        self.keys = meta["keys"]
+        # counts[g][shard][code], padded to the current key lists
+        self.counts = [[] for _ in GROUPINGS]
+        for shard in self.manifest["shards"]:
+            for g, c in enumerate(meta["shards"][shard["file"]]["counts"]):
+                self.counts[g].append(c + [0] * (len(self.keys[g]) - len(c)))
+
+    def _arrays(self, s):
+        if self._offsets[s] is None:
+            n = self.sizes[s]
+            view = memoryview(_map(os.path.join(self._index_dir(), self.manifest["shards"][s]["file"] + ".idx"))).cast("Q")
+            self._offsets[s] = view[:n + 1]
+            self._grouped[s] = [view[n + 1 + g * n:n + 1 + (g + 1) * n] for g in range(len(GROUPINGS))]
+            self._maps[s] = _map(os.path.join(self.store_dir, self.manifest["shards"][s]["file"]))
+        return self._offsets[s], self._maps[s]
+
+    def locate(self, i):
+        s = bisect_right(self.starts, i) - 1
+        return s, i - self.starts[s]
+
+    def read(self, i):
+        s, local = self.locate(i)
+        offsets, data = self._arrays(s)
+        return json.loads(data[offsets[local]:offsets[local + 1]])
+
+    def grouped(self, s, g):
+        self._arrays(s)
+        return self._grouped[s][g]
+
+    def totals(self, g):
+        """{key: records} of grouping g over the whole store."""
+        return {_key(k): sum(c[code] for c in self.counts[g]) for code, k in enumerate(self.keys[g])}
+
+
+class GroupRows:
+    """Record numbers with one key of a grouping, in store order, read from the per-shard grouped arrays."""
+
+    def __init__(self, store, g, code):
+        self.store = store
+        self.g = g
+        self.segments = []  # (shard, first position in its grouped array)
+        self.cumulative = []
+        total = 0
+        for s, counts in enumerate(store.counts[g]):
+            if counts[code]:
+                self.segments.append((s, sum(counts[:code])))
+                self.cumulative.append(total)
+                total += counts[code]
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return Rows(self, range(self.total)[j])
+        if j < 0:
+            j += self.total
+        if not 0 <= j < self.total:
+            raise IndexError(j)
+        k = bisect_right(self.cumulative, j) - 1
+        s, first = self.segments[k]
+        return self.store.starts[s] + self.store.grouped(s, self.g)[first + j - self.cumulative[k]]
+
+
+class Rows:
+    """base[positions[j]]: a slice of GroupRows (or of another Rows) without materializing it."""
+
+    def __init__(self, base, positions):
+        self.base = base
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            return Rows(self.base, self.positions[j])
+        return self.base[self.positions[j]]
+
+
+class Dataset:
+    """
+    Read-only view of a record store.
+
+    ds[i] decodes one record; ds[a:b], ds.where(topic[, difficulty]) and
+    ds.select(rows) return further views without reading any records;
+    iterating yields the records in order. len(ds), ds.topics() and
+    ds.strata() come from the index.
+    """
+
+    def __init__(self, store_dir, _store=None, _rows=None):
+        self.store = Store(store_dir) if _store is None else _store
+        self.rows = range(len(self.store)) if _rows is None else _rows
+
+    def _view(self, rows):
+        return Dataset(self.store.store_dir, self.store, rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._view(self.rows[i])
+        return self.store.read(self.rows[i])
+
+    def __iter__(self):
+        read = self.store.read
+        for i in self.rows:
+            yield read(i)
+
+    def topics(self):
+        """{topic: records} over the whole store."""
+        return self.store.totals(TOPIC)
+
+    def strata(self):
+        """{(topic, difficulty): records} over the whole store."""
+        return self.store.totals(STRATUM)
+
+    def where(self, topic, difficulty=None):
+        """
+        View of the records of one topic, or of one difficulty score within
+        it, in store order; only valid on a whole-store view.
+        """
+        if not isinstance(self.rows, range) or len(self.rows) != len(self.store) or self.rows.step != 1:
+            raise ValueError("where() needs a view of the whole store; filter first, then slice")
+        g, key = (TOPIC, topic) if difficulty is None else (STRATUM, (topic, difficulty))
+        codes = {_key(k): c for c, k in enumerate(self.store.keys[g])}
+        if key not in codes:
+            raise KeyError(f"no {GROUPINGS[g]} {key!r} in {self.store.store_dir}")
+        return self._view(GroupRows(self.store, g, codes[key]))
+
+    def select(self, rows):
+        """View of the given positions of this view."""
+        return self._view([self.rows[r] for r in rows])
+
+    def record_numbers(self):
+        """Store record numbers of this view, e.g. to select the matching answers."""
+        return self.rows
+
+
+def difficulty_buckets(strata, buckets=DIFFICULTY_BUCKETS):
+    """
+    {(topic, difficulty): bucket}: each topic's scores, in order, cut into
+    up to `buckets` runs of similar record counts (the cuts fall at the
+    score boundaries nearest the count quantiles), easiest first. Scores
+    are only comparable within a topic; buckets are comparable across topics.
+    """
+    by_topic = {}
+    for (topic, d), n in strata.items():
+        by_topic.setdefault(topic, []).append((d, n))
+    out = {}
+    for topic, scores in by_topic.items():
+        scores.sort()
+        total = sum(n for _, n in scores)
+        cumulative = []  # records up to and including each score but the last
+        for _, n in scores[:-1]:
+            cumulative.append((cumulative[-1] if cumulative else 0) + n)
+        cuts = []
+        for j in range(1, buckets):
+            lo = cuts[-1] + 1 if cuts else 0
+            if lo >= len(cumulative):
+                break
+            target = total * j / buckets
+            cuts.append(min(range(lo, len(cumulative)), key=lambda i: abs(cumulative[i] - target)))
+        for i, (d, _) in enumerate(scores):
+            out[(topic, d)] = bisect_left(cuts, i)
+    return out
+
+
+def stratified_sample(ds, n, by="difficulty", buckets=DIFFICULTY_BUCKETS, curriculum=False, seed=0):
+    """
+    Record numbers of up to n records of the store, drawn without
+    replacement in equal shares from each cell: a topic (by="topic") or a
+    (topic, difficulty bucket) pair (by="difficulty"). A cell too small for
+    its share leaves the rest to the others. With curriculum the sample
+    runs from the easiest bucket to the hardest, shuffled within a bucket;
+    otherwise it is shuffled. Only the index is read: the cost is
+    O(n + strata). Returns (record numbers, {cell: records drawn}).
+    """
+    if by not in ("topic", "difficulty"):
+        raise ValueError(f"by must be 'topic' or 'difficulty', got {by!r}")
+    rng = random.Random(seed)
+    store = ds.store
+    strata = ds.strata()
+    bucket = difficulty_buckets(strata, buckets)
+
+    cells = {}
+    for code, key in enumerate(store.keys[STRATUM]):
+        key = _key(key)
+        cell = key[0] if by == "topic" else (key[0], bucket[key])
+        cells.setdefault(cell, []).append(code)
+    sizes = {cell: sum(strata[_key(store.keys[STRATUM][c])] for c in codes) for cell, codes in cells.items()}
+
+    drawn = []
+    taken = {}
+    remaining = n
+    order = sorted(cells, key=lambda c: (sizes[c], str(c)))
+    for i, cell in enumerate(order):
+        take = min(sizes[cell], remaining // (len(order) - i))
+        remaining -= take
+        taken[cell] = take
+        parts = [(GroupRows(store, STRATUM, c), bucket[_key(store.keys[STRATUM][c])]) for c in cells[cell]]
+        cumulative = []
+        total = 0
+        for rows, _ in parts:
+            cumulative.append(total)
+            total += len(rows)
+        for pos in rng.sample(range(total), take):
+            k = bisect_right(cumulative, pos) - 1
+            rows, b = parts[k]
+            drawn.append((b, rows[pos - cumulative[k]]))
+
+    rng.shuffle(drawn)
+    if curriculum:
+        drawn.sort(key=lambda t: t[0])
+    return [r for _, r in drawn], taken
+
+
+def open_dataset(data_dir="dataset"):
+    """(questions, answers) views of data_dir's stores, migrating its legacy JSON files the first time."""
+    questions = open_store(os.path.join(data_dir, QUESTIONS_STORE), os.path.join(data_dir, "questions.json"))
+    answers = open_store(os.path.join(data_dir, ANSWERS_STORE), os.path.join(data_dir, "answers.json"))
+    return Dataset(questions), Dataset(answers)
+
+
+def hf_examples(data_dir="dataset", topic=None):
+    """
+    Flat question/answer examples for datasets.Dataset.from_generator:
+
+        Dataset.from_generator(hf_examples, gen_kwargs={"data_dir": "dataset"})
+
+    The generator payload is left out since its fields differ by topic.
+    """
+    questions, answers = open_dataset(data_dir)
+    if topic is not None:
+        questions = questions.where(topic)
+    for i, q in zip(questions.record_numbers(), questions):
+        a = answers[i]
+        yield {
+            "topic": q["topic"],
+            "question": q["question"],
+            "choices": q["choices"],
+            "expected_answer": q.get("expected_answer", ""),
+            "explanation": q.get("explanation", ""),
+            "answer": a["answer"],
+            "reasoning": a.get("reasoning", ""),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index a record store and time random access")
+    parser.add_argument("store_dir")
+    parser.add_argument("--probes", type=int, default=10000, help="random reads to time")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    ds = Dataset(args.store_dir)
+    opened = time.perf_counter() - start
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(args.probes if len(ds) else 0):
+        ds[rng.randrange(len(ds))]
+    probe = time.perf_counter() - start
+    print(json.dumps({
+        "records": len(ds),
+        "topics": ds.topics(),
+        "open_seconds": round(opened, 4),
+        "read_us": round(probe / args.probes * 1e6, 2) if len(ds) else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }, indent=2))
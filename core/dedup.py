@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import os
+import random
+import re
+import struct
+import zlib
+
+from core.file_manager import iter_json_array, iter_records, write_json_array
+
+# Exact and near-duplicate detection for question records.
+#
+# Questions are compared in a canonical form: single-letter names are
+# relabeled in order of first appearance (so "All A are B" and "All C are D"
+# match), whitespace and case are folded, and choices are sorted so their
+# display order does not matter. The exact index keeps a 16-byte digest per
+# canonical form, persisted as a flat append-only file. Near duplicates are
+# found with MinHash signatures over word 3-grams, bucketed by LSH bands.
+#
+# Besides the digests, the index file holds watermark entries: a tag and the
+# number of store records indexed so far, so a later load only has to catch
+# up on records that reached the store without going through the index.
+
+KEY_SIZE = 16
+WATERMARK_TAG = b"\xffdedupwm"  # 8 bytes, then the record count as a little-endian u64
+NAME_RE = re.compile(r"\b[A-Z]\b")
+
+# MinHash permutations h -> (a*h + b) mod P, fixed so signatures are stable
+# across runs
+MERSENNE_PRIME = (1 << 61) - 1
+_perm_rng = random.Random(0x5EED)
+PERMUTATIONS = [(_perm_rng.randrange(1, MERSENNE_PRIME), _perm_rng.randrange(MERSENNE_PRIME)) for _ in range(128)]
+
+
+def canonical_form(q):
+    names = {}
+
+    def relabel(m):
+        return names.setdefault(m.group(0), f"#{len(names)}")
+
+    def fold(text):
+        return " ".join(NAME_RE.sub(relabel, text).split()).lower()
+
+    text = fold(q.get("question", ""))
+    choices = []
+    for c in q.get("choices", []):
+        _, sep, rest = c.partition(")")
+        choices.append(fold(rest if sep else c))
+    return text + "\n" + "\x1f".join(sorted(choices))
+
+
+def digest(canonical):
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+
+def canonical_key(q):
+    return digest(canonical_form(q))
+
+
+def shingles(canonical, size=3):
+    words = canonical.split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(canonical, num_perm=64):
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(canonical)]
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS[:num_perm])
+
+
+def similarity(sig_a, sig_b):
+    """MinHash estimate of the Jaccard similarity of two shingle sets."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class DedupIndex:
+    """
+    Exact (and optionally near) duplicate index.
+
+    add(q) returns "new", "exact" or "near" and only records the question when
+    it is new. The exact check is one digest lookup. With near_threshold set,
+    each new question also gets a MinHash signature whose LSH bands are probed
+    for candidates with estimated Jaccard >= near_threshold. Only the exact
+    digests and the watermark are persisted (call flush()); near-duplicate
+    state is rebuilt per session.
+    """
+
+    def __init__(self, path=None, near_threshold=None, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.path = path
+        self.keys = set()
+        self.pending = []
+        self.near_threshold = near_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures = []
+        self.buckets = {}
+        self.stats = {"new": 0, "exact": 0, "near": 0}
+        self.watermark = 0
+        self.saved_watermark = 0
+
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            for i in range(0, len(data), KEY_SIZE):
+                entry = data[i:i + KEY_SIZE]
+                if entry.startswith(WATERMARK_TAG):
+                    self.watermark = struct.unpack("<Q", entry[len(WATERMARK_TAG):])[0]
+                else:
+                    self.keys.add(entry)
+            self.saved_watermark = self.watermark
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _bands(self, sig):
+        r = self.rows
+        return [(i, sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def near_match(self, sig):
+        """Id of the most similar indexed signature above the threshold, or None."""
+        best, best_sim = None, self.near_threshold
+        seen = set()
+        for band in self._bands(sig):
+            for i in self.buckets.get(band, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                sim = similarity(sig, self.signatures[i])
+                if sim >= best_sim:
+                    best, best_sim = i, sim
+        return best
+
+    def add_signature(self, sig):
+        i = len(self.signatures)
+        self.signatures.append(sig)
+        for band in self._bands(sig):
+            self.buckets.setdefault(band, []).append(i)
+        return i
+
+    def seed(self, q):
+        """Index a question already in the dataset, whatever it duplicates."""
+        canonical = canonical_form(q)
+        key = digest(canonical)
+        if self.near_threshold is not None:
+            self.add_signature(minhash(canonical, self.num_perm))
+        if key not in self.keys:
+            self.keys.add(key)
+            self.pending.append(key)
+
+    def add(self, q):
+        canonical = canonical_form(q)
+        key = digest(canonical)
+        if key in self.keys:
+            self.stats["exact"] += 1
+            return "exact"
+
+        if self.near_threshold is not None:
+            sig = minhash(canonical, self.num_perm)
+            if self.near_match(sig) is not None:
+                self.stats["near"] += 1
+                return "near"
+            self.add_signature(sig)
+
+        self.keys.add(key)
+        self.pending.append(key)
+        self.stats["new"] += 1
+        return "new"
+
+    def flush(self, watermark=None):
+        """
+        Append keys added since the last flush to the index file, and the
+        watermark (store records covered by the index) if it moved.
+        """
+        if watermark is not None:
+            self.watermark = watermark
+        entries = self.pending
+        if self.watermark != self.saved_watermark:
+            entries = entries + [WATERMARK_TAG + struct.pack("<Q", self.watermark)]
+        if self.path and entries:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(b"".join(entries))
+            self.saved_watermark = self.watermark
+        self.pending = []
+
+
+def scan(questions, near_threshold=None):
+    """Batch pass: yields (index, verdict) for each question in order."""
+    index = DedupIndex(near_threshold=near_threshold)
+    for i, q in enumerate(questions):
+        yield i, index.add(q)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate questions in a dataset")
+    parser.add_argument("--questions", default="dataset/questions.json")
+    parser.add_argument("--answers", default="dataset/answers.json")
+    parser.add_argument("--store", action="store_true",
+                        help="read --questions/--answers as JSONL store directories")
+    parser.add_argument("--near", type=float, default=None, metavar="THRESHOLD",
+                        help="also reject near duplicates with estimated Jaccard >= THRESHOLD")
+    parser.add_argument("--output-dir", default=None,
+                        help="write the deduplicated questions.json/answers.json here")
+    args = parser.parse_args()
+
+    read = iter_records if args.store else iter_json_array
+    verdicts = [v for _, v in scan(read(args.questions), args.near)]
+    counts = {v: verdicts.count(v) for v in ("new", "exact", "near")}
+    print(f"{len(verdicts)} records: {counts['new']} unique, "
+          f"{counts['exact']} exact duplicates, {counts['near']} near duplicates")
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for src, name in ((args.questions, "questions.json"), (args.answers, "answers.json")):
+            keep = (r for r, v in zip(read(src), verdicts) if v == "new")
+            write_json_array(os.path.join(args.output_dir, name), keep)
+        print(f"Wrote {counts['new']} unique records → {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
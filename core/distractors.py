@@ -0,0 +1,57 @@
+import random
+from functools import lru_cache
+
+# Wrong options for multiple-choice questions.
+#
+# Each topic keeps a small candidate pool per answer, built from the
+# generator's own model and ordered from the most to the least plausible
+# near miss: neighbouring seats, the terms next to a relation in the kinship
+# table, the verdicts closest to a syllogism answer, the series terms one
+# rule step away. Pools hold at most POOL_SIZE distinct options and never the
+# answer itself, so picking three is a single rng.sample over a handful of
+# items: no retries, and uniqueness holds by construction. Pools that depend
+# only on the answer are precomputed (or cached on first use).
+
+POOL_SIZE = 5
+DISTRACTORS = 3
+
+# exam-style options used when a generator supplies fewer than three; one
+# may equal the answer and up to two the supplied distractors, so five
+# always leave enough
+FILLERS = ("None of these", "Cannot be determined", "Data inadequate", "All of these", "Both A and B")
+
+
+def pool(candidates, correct, size=POOL_SIZE):
+    """The first `size` distinct candidates other than correct, in order."""
+    out = []
+    for c in dict.fromkeys(candidates):
+        if c != correct:
+            out.append(c)
+            if len(out) == size:
+                break
+    return tuple(out)
+
+
+def pick(candidates, rng=random, k=DISTRACTORS):
+    """k distinct options from a pool (all of them if it is smaller)."""
+    if len(candidates) <= k:
+        return list(candidates)
+    return rng.sample(candidates, k)
+
+
+def complete(correct, distractors, k=DISTRACTORS):
+    """
+    distractors without repeats or the answer, in first-seen order, topped
+    up from FILLERS to exactly k.
+    """
+    out = list(pool(distractors, correct, k))
+    if len(out) < k:
+        out += pool((f for f in FILLERS if f not in out), correct, k - len(out))
+    return out
+
+
+@lru_cache(maxsize=None)
+def seat_pool(n, position):
+    """Wrong 1-based positions among n seats, nearest to the answer first (left before right)."""
+    others = sorted((p for p in range(1, n + 1) if p != position), key=lambda p: (abs(p - position), p))
+    return tuple(str(p) for p in others[:POOL_SIZE])
@@ -1,6 +1,19 @@
 import json
 import os
+import argparse
+import itertools
 
+from core.instrument import timed
+
+MANIFEST = "manifest.json"
+
+# fsync policies for the record store:
+#   none  - leave flushing to the OS (fastest, may lose the last batch on power loss)
+#   shard - fsync each shard before it is published
+#   full  - also fsync the manifest and the store directory
+FSYNC_POLICIES = ("none","shard","full")
+
+@timed("io")
 def append_json(file_path, new_data):
     if os.path.exists(file_path):
         with open(file_path,"r") as f:
@@ -12,3 +25,290 @@ def append_json(file_path, new_data):
 
     with open(file_path,"w") as f:
         json.dump(data,f,indent=2)
+
+
+def _fsync_dir(path):
+    fd=os.open(path,os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _atomic_write(path, chunks, fsync=False):
+    tmp=path+".tmp"
+    size=0
+    with open(tmp,"w",encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size+=len(chunk.encode("utf-8"))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp,path)
+    return size
+
+def read_manifest(store_dir):
+    path=os.path.join(store_dir,MANIFEST)
+    if not os.path.exists(path):
+        return {"format":1,"records":0,"shards":[]}
+    with open(path,"r",encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(store_dir, manifest, fsync=False):
+    _atomic_write(
+        os.path.join(store_dir,MANIFEST),
+        [json.dumps(manifest,indent=2)],
+        fsync
+    )
+    if fsync:
+        _fsync_dir(store_dir)
+
+def _check_fsync(fsync):
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+
+@timed("io")
+def append_records(store_dir, records, fsync="shard"):
+    """
+    Append records to a JSONL store as one new shard.
+
+    The shard is written to a temp file and renamed into place, then the
+    manifest is swapped the same way. A crash before the manifest swap leaves
+    an unreferenced shard that the next append overwrites, so readers only
+    ever see whole batches.
+    """
+    _check_fsync(fsync)
+    if not records:
+        return read_manifest(store_dir)
+
+    os.makedirs(store_dir,exist_ok=True)
+    pending=pending_shard_path(store_dir,"append")
+    n=write_shard(pending,records,fsync)
+    return publish_shard(store_dir,pending,n,fsync)
+
+def pending_shard_path(store_dir, tag):
+    """Scratch path inside the store for a shard that is written before publish_shard."""
+    return os.path.join(store_dir,f".pending-{tag}.jsonl")
+
+@timed("io")
+def write_shard(path, records, fsync="shard"):
+    """Write records as JSONL to a pending path; returns the record count."""
+    _check_fsync(fsync)
+    n=0
+    with open(path,"w",encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r,ensure_ascii=False)+"\n")
+            n+=1
+        if fsync!="none":
+            f.flush()
+            os.fsync(f.fileno())
+    return n
+
+@timed("io")
+def publish_shard(store_dir, path, n_records, fsync="shard"):
+    """
+    Move a finished JSONL file into the store as its next shard.
+
+    path must be on the same filesystem as store_dir (pending_shard_path
+    guarantees that) so the move is a single atomic rename.
+    """
+    _check_fsync(fsync)
+    os.makedirs(store_dir,exist_ok=True)
+    manifest=read_manifest(store_dir)
+
+    name=f"shard-{len(manifest['shards']):06d}.jsonl"
+    os.replace(path,os.path.join(store_dir,name))
+
+    manifest["shards"].append({
+        "file":name,
+        "start":manifest["records"],
+        "records":n_records,
+        "bytes":os.path.getsize(os.path.join(store_dir,name))
+    })
+    manifest["records"]+=n_records
+    _write_manifest(store_dir,manifest,fsync=="full")
+    return manifest
+
+def drop_shards(store_dir, keep, fsync="shard"):
+    """Unpublish every shard after the first `keep`; returns the number of records dropped."""
+    _check_fsync(fsync)
+    manifest=read_manifest(store_dir)
+    dropped=manifest["shards"][keep:]
+    if not dropped:
+        return 0
+    manifest["shards"]=manifest["shards"][:keep]
+    manifest["records"]=dropped[0]["start"]
+    _write_manifest(store_dir,manifest,fsync=="full")
+    for shard in dropped:
+        os.remove(os.path.join(store_dir,shard["file"]))
+    return sum(shard["records"] for shard in dropped)
+
+def align_stores(store_dirs, fsync="shard"):
+    """
+    Cut paired stores (record i of each belongs together) back to their
+    common shards. They are published one after the other, so a crash in
+    between leaves trailing shards in some of them with no partner; those are
+    dropped before anything else is appended. Returns the records dropped.
+    """
+    manifests=[read_manifest(d) for d in store_dirs]
+    keep=min(len(m["shards"]) for m in manifests)
+    for i in range(keep):
+        sizes={m["shards"][i]["records"] for m in manifests}
+        if len(sizes)>1:
+            raise ValueError(f"shard {i} holds {sorted(sizes)} records across {', '.join(store_dirs)}; "
+                             "the stores are not paired")
+    return sum(drop_shards(d,keep,fsync) for d in store_dirs)
+
+def read_shard(store_dir, shard):
+    with open(os.path.join(store_dir,shard["file"]),"r",encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+@timed("io")
+def rewrite_shard(store_dir, index, records, fsync="shard"):
+    """Atomically replace the records of one published shard (same count, same order)."""
+    _check_fsync(fsync)
+    manifest=read_manifest(store_dir)
+    shard=manifest["shards"][index]
+    if len(records)!=shard["records"]:
+        raise ValueError(f"{shard['file']} holds {shard['records']} records, got {len(records)}")
+
+    pending=pending_shard_path(store_dir,f"rewrite-{index}")
+    write_shard(pending,records,fsync)
+    path=os.path.join(store_dir,shard["file"])
+    os.replace(pending,path)
+
+    shard["bytes"]=os.path.getsize(path)
+    _write_manifest(store_dir,manifest,fsync=="full")
+    return manifest
+
+def iter_records(store_dir, start=0):
+    """Yield the records of a store in order, from record number start on."""
+    manifest=read_manifest(store_dir)
+    for shard in manifest["shards"]:
+        if shard["start"]+shard["records"]<=start:
+            continue
+        with open(os.path.join(store_dir,shard["file"]),"r",encoding="utf-8") as f:
+            for line in itertools.islice(f,max(0,start-shard["start"]),None):
+                yield json.loads(line)
+
+# characters that may follow an array item
+VALUE_END=frozenset(" \t\r\n,]")
+
+def iter_json_array(path, chunk_size=1<<16):
+    """Yield the items of a top-level JSON array file without loading it whole."""
+    decoder=json.JSONDecoder()
+    with open(path,"r",encoding="utf-8") as f:
+        buf=""
+        pos=0
+        eof=False
+
+        def fill():
+            nonlocal buf,pos,eof
+            chunk=f.read(chunk_size)
+            if not chunk:
+                eof=True
+            buf=buf[pos:]+chunk
+            pos=0
+
+        def next_char():
+            nonlocal pos
+            while True:
+                while pos<len(buf) and buf[pos].isspace():
+                    pos+=1
+                if pos<len(buf) or eof:
+                    return buf[pos] if pos<len(buf) else ""
+                fill()
+
+        if next_char()!="[":
+            raise ValueError(f"{path} is not a JSON array")
+        pos+=1
+        if next_char()=="]":
+            return
+
+        while True:
+            try:
+                item,end=decoder.raw_decode(buf,pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if not eof and (end==len(buf) or buf[end] not in VALUE_END):
+                # a number cut at the chunk boundary decodes as its prefix
+                # ("7." -> 7, "7.5e" -> 7.5): only a delimiter ends the value
+                fill()
+                continue
+            pos=end
+            yield item
+
+            c=next_char()
+            pos+=1
+            if c=="]":
+                return
+            if c!=",":
+                raise ValueError(f"{path}: expected ',' or ']' in JSON array")
+            next_char()
+
+def count_records(store_dir):
+    return read_manifest(store_dir)["records"]
+
+def json_array_chunks(records):
+    """Render records exactly like json.dump(records, f, indent=2), one item at a time."""
+    first=True
+    for r in records:
+        body=json.dumps(r,indent=2,ensure_ascii=False).replace("\n","\n  ")
+        yield ("[\n  " if first else ",\n  ")+body
+        first=False
+    yield "[]" if first else "\n]"
+
+def write_json_array(path, records):
+    """Atomically write an iterable of records as an indent=2 JSON array."""
+    _atomic_write(path,json_array_chunks(records))
+
+def export_json(store_dir, path):
+    """Write the store out as the JSON array the training scripts read."""
+    write_json_array(path,iter_records(store_dir))
+    return count_records(store_dir)
+
+def migrate_json(path, store_dir, fsync="shard"):
+    """Import a legacy JSON array file into an empty store."""
+    if count_records(store_dir):
+        raise ValueError(f"{store_dir} already holds records; refusing to migrate into it")
+    with open(path,"r",encoding="utf-8") as f:
+        data=json.load(f)
+    append_records(store_dir,data,fsync)
+    return len(data)
+
+def open_store(store_dir, legacy_json=None):
+    """Return store_dir, migrating legacy_json into it the first time it is used."""
+    if not os.path.exists(os.path.join(store_dir,MANIFEST)) and legacy_json and os.path.exists(legacy_json):
+        migrate_json(legacy_json,store_dir)
+    return store_dir
+
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Manage JSONL record stores")
+    sub=parser.add_subparsers(dest="cmd",required=True)
+
+    p=sub.add_parser("migrate",help="import a JSON array file into a store")
+    p.add_argument("json_path")
+    p.add_argument("store_dir")
+
+    p=sub.add_parser("export",help="write a store out as a JSON array file")
+    p.add_argument("store_dir")
+    p.add_argument("json_path")
+
+    p=sub.add_parser("stats",help="print the store manifest summary")
+    p.add_argument("store_dir")
+
+    args=parser.parse_args()
+
+    if args.cmd=="migrate":
+        n=migrate_json(args.json_path,args.store_dir)
+        print(f"Migrated {n} records → {args.store_dir}")
+    elif args.cmd=="export":
+        n=export_json(args.store_dir,args.json_path)
+        print(f"Exported {n} records → {args.json_path}")
+    else:
+        m=read_manifest(args.store_dir)
+        print(f"{m['records']} records in {len(m['shards'])} shards")
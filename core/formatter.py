@@ -1,32 +1,29 @@
 import random
 
+from core.distractors import complete
+from core.instrument import timed
+
 LETTERS = ["A","B","C","D"]
+CHOICE_PREFIXES = [f"{l}) " for l in LETTERS]
 
 def ensure_four_options(correct, distractors):
     """
     Ensures we always have 3 unique distractors
-    even if generator produces fewer
+    even if generator produces fewer (see core.distractors.complete)
     """
-    distractors = list(set(distractors) - {correct})
-
-    # If not enough distractors, auto-generate generic ones
-    while len(distractors) < 3:
-        fake = correct + str(random.randint(1,9))
-        if fake not in distractors:
-            distractors.append(fake)
-
-    return distractors[:3]
-
-
-def build_question(topic, question, correct_answer, distractors, explanation):
+    return complete(correct, distractors)
 
-    distractors = ensure_four_options(correct_answer, distractors)
-
-    options = distractors + [correct_answer]
-    random.shuffle(options)
 
-    answer_letter = LETTERS[options.index(correct_answer)]
-    choices = [f"{LETTERS[i]}) {options[i]}" for i in range(4)]
+@timed("formatter")
+def assemble_question(topic, question, options, answer_index, explanation, payload=None, choices=None):
+    """
+    Build the question/answer records from options already in display order.
+    Batch generators that place the answer themselves call this directly,
+    and may pass the choices already rendered ("A) ...") in bulk.
+    """
+    answer_letter = LETTERS[answer_index]
+    if choices is None:
+        choices = [p + str(o) for p, o in zip(CHOICE_PREFIXES, options)]
 
     question_json = {
         "topic": topic,
@@ -35,6 +32,8 @@ def build_question(topic, question, correct_answer, distractors, explanation):
         "expected_answer": answer_letter,
         "explanation": explanation
     }
+    if payload is not None:
+        question_json["payload"] = payload
 
     answer_json = {
         "answer": answer_letter,
@@ -42,3 +41,22 @@ def build_question(topic, question, correct_answer, distractors, explanation):
     }
 
     return question_json, answer_json
+
+
+@timed("formatter")
+def build_question(topic, question, correct_answer, distractors, explanation, payload=None, rng=random):
+    """
+    payload is an optional JSON-able dict with the generator's hidden model
+    (solution, clues, rule parameters). It is stored on the question record
+    so later stages can read it instead of re-parsing the question text.
+    rng (a random.Random, or the random module) fills and shuffles the options.
+    """
+
+    distractors = ensure_four_options(correct_answer, distractors)
+
+    options = distractors + [correct_answer]
+    rng.shuffle(options)
+
+    return assemble_question(
+        topic, question, options, options.index(correct_answer), explanation, payload
+    )
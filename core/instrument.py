@@ -0,0 +1,191 @@
+import functools
+import json
+import time
+from array import array
+
+# Lightweight run instrumentation.
+#
+# A Recorder is activated for the duration of a run (with recording(...)).
+# Functions decorated with @timed(section) add their wall time to that
+# section while a recorder is active; nested timed calls are only counted
+# once, by the outermost one. Generators are timed per item with
+# Recorder.item(name), which also attributes the formatter time spent inside
+# the item to that generator. With no active recorder a timed function costs
+# one global lookup.
+
+ACTIVE = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """Current resident set size in MiB (Linux), or None."""
+    return _status_mb("VmRSS")
+
+
+def reset_peak_rss():
+    """
+    Restart peak RSS tracking from the current RSS (Linux); afterwards
+    peak_rss_since_reset_mb() is the peak of what ran since. Returns
+    whether the reset was possible.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_since_reset_mb():
+    return _status_mb("VmHWM")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+class Recorder:
+    def __init__(self):
+        self.sections = {}
+        self.depth = 0
+        self.latencies = {}
+        self.formatter = {}
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    def add(self, section, seconds):
+        self.sections[section] = self.sections.get(section, 0.0) + seconds
+
+    def item(self, name, fn, *args):
+        """Call fn(*args) as one generated item of `name`, recording its latency."""
+        before = self.sections.get("formatter", 0.0)
+        start = time.perf_counter()
+        out = fn(*args)
+        elapsed = time.perf_counter() - start
+        self.latencies.setdefault(name, array("d")).append(elapsed)
+        self.formatter[name] = self.formatter.get(name, 0.0) + self.sections.get("formatter", 0.0) - before
+        return out
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    def report(self):
+        wall = (self.stopped or time.perf_counter()) - self.started
+        generators = {}
+        items = 0
+        for name, lat in self.latencies.items():
+            total = sum(lat)
+            ordered = sorted(lat)
+            items += len(lat)
+            generators[name] = {
+                "items": len(lat),
+                "seconds": round(total, 4),
+                "items_per_sec": round(len(lat) / total, 1) if total else 0.0,
+                "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+                "formatter_seconds": round(self.formatter.get(name, 0.0), 4),
+                "generation_seconds": round(total - self.formatter.get(name, 0.0), 4),
+            }
+        return {
+            "items": items,
+            "wall_seconds": round(wall, 4),
+            "items_per_sec": round(items / wall, 1) if wall else 0.0,
+            "generators": generators,
+            "sections": {k: round(v, 4) for k, v in self.sections.items()},
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+def timed(section):
+    """Decorator: add the function's wall time to `section` of the active recorder."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            rec = ACTIVE
+            if rec is None or rec.depth:
+                return fn(*args, **kwargs)
+            rec.depth += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rec.add(section, time.perf_counter() - start)
+                rec.depth -= 1
+        return inner
+    return wrap
+
+
+class recording:
+    """
+    Context manager that activates a Recorder, optionally under a profiler
+    ("cprofile" or "pyinstrument"; the latter is imported only when asked
+    for). profile_output receives the cProfile stats file or the
+    pyinstrument text report.
+    """
+
+    def __init__(self, profiler=None, profile_output=None):
+        if profiler not in (None, "cprofile", "pyinstrument"):
+            raise ValueError(f"unknown profiler {profiler!r}")
+        self.profiler = profiler
+        self.profile_output = profile_output
+        self.recorder = Recorder()
+        self._prof = None
+
+    def __enter__(self):
+        global ACTIVE
+        if self.profiler == "cprofile":
+            import cProfile
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+        elif self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise SystemExit("--profile pyinstrument needs the 'pyinstrument' package (pip install pyinstrument)")
+            self._prof = Profiler()
+            self._prof.start()
+        ACTIVE = self.recorder
+        return self.recorder
+
+    def __exit__(self, *exc):
+        global ACTIVE
+        ACTIVE = None
+        self.recorder.stop()
+        if self.profiler == "cprofile":
+            self._prof.disable()
+            self._prof.dump_stats(self.profile_output or "generate.prof")
+        elif self.profiler == "pyinstrument":
+            self._prof.stop()
+            with open(self.profile_output or "generate.pyinstrument.txt", "w", encoding="utf-8") as f:
+                f.write(self._prof.output_text())
+        return False
+
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,127 @@
+import json
+import random
+from bisect import bisect_left, insort
+
+# Token lengths of training conversations, and the orderings built from them.
+#
+# A tokenizer spec names how to count tokens:
+#   whitespace        whitespace-separated words (offline, no dependencies)
+#   bytes             UTF-8 bytes, an upper bound for byte-level BPE vocabularies
+#   hf:NAME_OR_PATH   a Hugging Face tokenizer, using its chat template when it has one
+#   tiktoken:ENCODING a tiktoken encoding
+# The first two only approximate a model's tokenizer; each message also
+# adds MESSAGE_OVERHEAD tokens for its role markers.
+
+TOKENIZERS = ("whitespace", "bytes", "hf:NAME_OR_PATH", "tiktoken:ENCODING")
+MESSAGE_OVERHEAD = 4
+
+
+def _counter_length(count):
+    def length(messages):
+        return sum(count(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+    return length
+
+
+def load_tokenizer(spec="whitespace"):
+    """messages -> token count for a tokenizer spec (see TOKENIZERS)."""
+    if spec == "whitespace":
+        return _counter_length(lambda text: len(text.split()))
+    if spec == "bytes":
+        return _counter_length(lambda text: len(text.encode("utf-8")))
+
+    kind, _, name = spec.partition(":")
+    if kind == "hf" and name:
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise SystemExit("hf tokenizers need the 'transformers' package (pip install transformers)")
+        tok = AutoTokenizer.from_pretrained(name)
+        if getattr(tok, "chat_template", None):
+            return lambda messages: len(tok.apply_chat_template(messages, tokenize=True))
+        return _counter_length(lambda text: len(tok.encode(text, add_special_tokens=False)))
+    if kind == "tiktoken" and name:
+        try:
+            import tiktoken
+        except ImportError:
+            raise SystemExit("tiktoken tokenizers need the 'tiktoken' package (pip install tiktoken)")
+        enc = tiktoken.get_encoding(name)
+        return _counter_length(lambda text: len(enc.encode_ordinary(text)))
+    raise ValueError(f"unknown tokenizer {spec!r}; expected one of {', '.join(TOKENIZERS)}")
+
+
+def bucketed_order(lengths, batch_size, seed=0):
+    """
+    Group records of similar length: sort by length, cut into batches of
+    batch_size and shuffle the batches (not their contents).
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    random.Random(seed).shuffle(batches)
+    return [i for batch in batches for i in batch]
+
+
+def greedy_pack(lengths, max_length, seed=0):
+    """
+    Best-fit-decreasing packing of records into sequences of at most
+    max_length tokens. Returns a list of packs (lists of record indices) in
+    shuffled order; a record longer than max_length gets a pack of its own.
+
+    Open packs are kept in buckets by remaining room, with the distinct room
+    values in a sorted list, so each placement is a bisect over at most
+    max_length values.
+    """
+    packs = []
+    rooms = []   # sorted distinct remaining capacities
+    by_room = {}  # remaining capacity -> open pack ids
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        n = lengths[i]
+        if n >= max_length:
+            packs.append([i])
+            continue
+        j = bisect_left(rooms, n)
+        if j < len(rooms):
+            room = rooms[j]
+            p = by_room[room].pop()
+            if not by_room[room]:
+                del by_room[room]
+                rooms.pop(j)
+            packs[p].append(i)
+            left = room - n
+        else:
+            p = len(packs)
+            packs.append([i])
+            left = max_length - n
+        if left > 0:
+            if left not in by_room:
+                insort(rooms, left)
+                by_room[left] = []
+            by_room[left].append(p)
+    random.Random(seed).shuffle(packs)
+    return packs
+
+
+def padding_efficiency(lengths, batch_size):
+    """Share of real tokens when consecutive batches are padded to their longest member."""
+    tokens = sum(lengths)
+    padded = sum(
+        max(lengths[i:i + batch_size]) * len(lengths[i:i + batch_size])
+        for i in range(0, len(lengths), batch_size)
+    )
+    return tokens / padded if padded else 1.0
+
+
+def write_sidecar(path, tokenizer, max_length, lengths, order=None):
+    """
+    lengths are per source record (in input order); order, when the output
+    was reordered or packed, lists the source indices of each output record.
+    """
+    index = {"tokenizer": tokenizer, "max_length": max_length, "records": len(lengths), "lengths": lengths}
+    if order is not None:
+        index["order"] = order
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+
+def read_sidecar(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
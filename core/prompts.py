@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+
+# Prompt templating shared by prepare_training_data.py and train.ipynb.
+#
+# The skillbank is compiled once into one rendered skill block per
+# (topic, agent_type), and every constant piece of a prompt is a
+# module-level fragment, so building a prompt is a single join of cached
+# strings and the record's own fields. The compiled blocks are keyed by the
+# skillbank's content hash: a cheap stat() check notices when the file
+# changes, and the file is only recompiled when its bytes actually differ.
+
+SKILLBANK_FILE = "dataset/skillbank.json"
+
+TOPIC_MAP = {
+    "Syllogisms": "syllogisms",
+    "Mixed Series (Alphanumeric)": "alphanumeric_series",
+    "Seating Arrangements (Linear, Circular)": "seating_arrangements",
+    "Blood Relations and Family Tree": "blood_relations",
+}
+AGENT_TYPES = ("answer", "question")
+
+ANSWER_SYSTEM = ("You are an expert in quantitative aptitude for competitive exams, "
+                 "solving MCQs with step-by-step reasoning before selecting the correct answer.")
+QUESTION_SYSTEM = ("You are an expert examiner designing extremely difficult MCQs "
+                   "for Quantitative Aptitude and Analytical Reasoning.")
+SYSTEM_PROMPTS = {"answer": ANSWER_SYSTEM, "question": QUESTION_SYSTEM}
+
+# notebook answer-agent user prompt: Question, Choices, JSON instruction
+ANSWER_USER_HEAD = "Question: "
+ANSWER_USER_CHOICES = "\nChoices: "
+ANSWER_USER_TAIL = "\n\nRespond with JSON: {\"answer\": \"letter\", \"reasoning\": \"brief explanation\"}"
+
+QUESTION_USER_HEAD = "Generate an EXTREMELY DIFFICULT MCQ on topic: "
+QUESTION_USER_TAIL = (".\n"
+                      "Respond with JSON: {\"topic\": \"...\", \"question\": \"...\", "
+                      "\"choices\": [\"A) ...\", \"B) ...\", \"C) ...\", \"D) ...\"], "
+                      "\"answer\": \"letter\", \"explanation\": \"...\"}")
+
+# prepare_training_data.py user prompt
+SOLVE_HEAD = "Solve the following multiple choice reasoning question.\n\n"
+SOLVE_CHOICES = "\n\nChoices:\n"
+SOLVE_TAIL = ("\n\nRespond ONLY in JSON format:\n"
+              '{ "answer": "A/B/C/D", "reasoning": "short explanation" }')
+
+
+def render_skills(skillbank, topic, agent_type="answer"):
+    """The skill block for one topic and agent type (the notebook's original get_skills)."""
+    if skillbank is None:
+        return ""
+    key = TOPIC_MAP.get(topic, "")
+    lines = ["\n## Reasoning Skills", "### General"]
+    for s in skillbank.get("general", {}).get("solving", []):
+        lines.append(f"- {s['title']}: {s['principle']}")
+    for s in skillbank.get("general", {}).get("errors", []):
+        lines.append(f"- AVOID: {s['principle']}")
+    if agent_type == "question":
+        for s in skillbank.get("general", {}).get("question_generation", []):
+            lines.append(f"- {s['title']}: {s['principle']}")
+    if key and key in skillbank:
+        lines.append(f"### {topic}")
+        for s in skillbank[key].get("solving", []):
+            lines.append(f"- {s['title']}: {s['principle']}")
+        for s in skillbank[key].get("errors", []):
+            lines.append(f"- AVOID: {s['principle']}")
+        if agent_type == "question":
+            for s in skillbank[key].get("question_generation", []):
+                lines.append(f"- {s['title']}: {s['principle']}")
+    return "\n".join(lines)
+
+
+def compile_skillbank(skillbank):
+    """
+    {(topic, agent_type): skill block} for every mapped topic, plus
+    (None, agent_type) for topics without their own section.
+    """
+    blocks = {}
+    for agent_type in AGENT_TYPES:
+        blocks[(None, agent_type)] = render_skills(skillbank, None, agent_type)
+        for topic in TOPIC_MAP:
+            blocks[(topic, agent_type)] = render_skills(skillbank, topic, agent_type)
+    return blocks
+
+
+# path -> {"stat": (mtime_ns, size), "hash": hex digest, "blocks": {...}}
+_compiled = {}
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def skill_blocks(path=SKILLBANK_FILE):
+    """Compiled skill blocks for the skillbank at path ({} when the file is missing)."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _compiled.pop(path, None)
+        return {}
+    stat = (st.st_mtime_ns, st.st_size)
+    entry = _compiled.get(path)
+    if entry and entry["stat"] == stat:
+        return entry["blocks"]
+
+    h = file_hash(path)
+    if entry and entry["hash"] == h:
+        entry["stat"] = stat
+        return entry["blocks"]
+
+    with open(path, "r", encoding="utf-8") as f:
+        blocks = compile_skillbank(json.load(f))
+    # full system prompts are cached alongside the bare blocks
+    for (topic, agent_type), block in list(blocks.items()):
+        blocks[("system", topic, agent_type)] = SYSTEM_PROMPTS[agent_type] + block
+    _compiled[path] = {"stat": stat, "hash": h, "blocks": blocks}
+    return blocks
+
+
+def get_skills(topic, agent_type="answer", path=SKILLBANK_FILE):
+    blocks = skill_blocks(path)
+    if not blocks:
+        return ""
+    return blocks.get((topic, agent_type)) or blocks[(None, agent_type)]
+
+
+def system_prompt(topic, agent_type="answer", path=SKILLBANK_FILE):
+    blocks = skill_blocks(path)
+    if not blocks:
+        return SYSTEM_PROMPTS[agent_type]
+    return blocks.get(("system", topic, agent_type)) or blocks[("system", None, agent_type)]
+
+
+def answer_user_prompt(q):
+    return "".join((ANSWER_USER_HEAD, q["question"], ANSWER_USER_CHOICES, " ".join(q["choices"]), ANSWER_USER_TAIL))
+
+
+def question_user_prompt(topic):
+    return QUESTION_USER_HEAD + topic + QUESTION_USER_TAIL
+
+
+def solve_prompt(q):
+    return "".join((SOLVE_HEAD, q["question"], SOLVE_CHOICES, "\n".join(q["choices"]), SOLVE_TAIL))
@@ -0,0 +1,225 @@
+import re
+from collections import namedtuple
+
+# Parse each question once into a small structured form so that the
+# explanation (and later verification) stages never touch raw text again.
+
+# conclusions holds one proposition for the legacy "Conclusion:" template and
+# two for the "Conclusions: I. ... II. ..." one; derivation is the engine's
+# reasoning when the payload has it
+Syllogism = namedtuple("Syllogism", "statements premises conclusions derivation")
+# rule is the generator payload for rule-family series (see
+# generators.mixed_series.generate_rule), None otherwise
+Series = namedtuple("Series", "terms letters numbers rule")
+# chain is the generator's step-by-step derivation when the payload has one
+Kinship = namedtuple("Kinship", "sentences facts query chain")
+Seating = namedtuple("Seating", "clues ask")
+Parsed = namedtuple("Parsed", "kind body expected choice")
+
+STATEMENTS_RE = re.compile(r"Statements:\n(.*?)\nConclusions?:", re.S)
+CONCLUSION_RE = re.compile(r"Conclusion:\s*(.*)")
+CONCLUSIONS_RE = re.compile(r"^(?:I|II)\.\s*(.*)$", re.M)
+# (quantifier, subject, "not ", predicate); terms are single words
+PROPOSITION_RE = re.compile(r"(All|Some|No)\s+(\w+)\s+are\s+(not\s+)?(\w+)")
+
+SERIES_RE = re.compile(r"Find next term:\n(.*)", re.S)
+SERIES_TERM_RE = re.compile(r"([A-Z])(\d+)")
+LETTER_RE = re.compile(r"([A-Z])")
+NUMBER_RE = re.compile(r"(\d+)")
+
+KIN_FACT_RE = re.compile(r"([A-Z]) is the (father|mother|sister|brother|son|daughter|wife|husband) of ([A-Z])")
+KIN_QUERY_RE = re.compile(r"How is ([A-Z]) related to ([A-Z])")
+
+SEAT_CLUE_RE = re.compile(r"([A-Z]) sits to the (left|right) of ([A-Z])")
+SEAT_ASK_RE = re.compile(r"What is the position of ([A-Z]) from the left\?")
+
+
+def choice_text(choices, letter):
+    """Text of the choice labelled `letter` ("B) Uncle" -> "Uncle"), or None."""
+    for c in choices:
+        if c.startswith(letter):
+            _, sep, rest = c.partition(")")
+            return rest.strip() if sep else c
+    return None
+
+
+def parse_proposition(s):
+    """'Some B are not D' -> ('Some', 'B', True, 'D'); None if it is not a categorical statement."""
+    m = PROPOSITION_RE.match(s.rstrip("."))
+    if not m:
+        return None
+    quant, a, neg, b = m.groups()
+    return quant, a, bool(neg), b
+
+
+def render_proposition(p):
+    quant, a, neg, b = p
+    return f"{quant} {a} are {'not ' if neg else ''}{b}"
+
+
+def parse_syllogism(text):
+    m = STATEMENTS_RE.search(text)
+    if not m:
+        return None
+    statements = [s.strip() for s in m.group(1).strip().split("\n") if s.strip()]
+    premises = [p for p in map(parse_proposition, statements) if p]
+    numbered = CONCLUSIONS_RE.findall(text)
+    if numbered:
+        conclusions = [parse_proposition(c.strip()) for c in numbered]
+    else:
+        cm = CONCLUSION_RE.search(text)
+        conclusions = [parse_proposition(cm.group(1).strip())] if cm else []
+    return Syllogism(statements, premises, conclusions, None)
+
+
+def parse_series(text):
+    m = SERIES_RE.search(text)
+    if not m:
+        return None
+    raw_tokens = [t.strip() for t in m.group(1).split(",")]
+    terms = [t for t in raw_tokens if t and "?" not in t]
+    # fast path: every term is a plain letter+number pair
+    pairs = SERIES_TERM_RE.findall(m.group(1))
+    if len(pairs) == len(terms) and all(l + n == t for (l, n), t in zip(pairs, terms)):
+        return Series(terms, [l for l, _ in pairs], [int(n) for _, n in pairs], None)
+    letters = []
+    numbers = []
+    for t in terms:
+        ml = LETTER_RE.search(t)
+        mn = NUMBER_RE.search(t)
+        if ml:
+            letters.append(ml.group(1))
+        if mn:
+            numbers.append(int(mn.group(1)))
+    return Series(terms, letters, numbers, None)
+
+
+def parse_kinship(text):
+    sentences = [s.strip() for s in text.split(".") if s.strip()]
+    facts = []
+    for s in sentences:
+        m = KIN_FACT_RE.match(s)
+        if m:
+            facts.append(m.groups())
+    qm = KIN_QUERY_RE.search(text)
+    return Kinship(sentences, facts, qm.groups() if qm else None, None)
+
+
+def parse_seating(text):
+    clues = SEAT_CLUE_RE.findall(text)
+    m = SEAT_ASK_RE.search(text)
+    return Seating(clues, m.group(1) if m else None)
+
+
+def topic_kind(topic):
+    if "Syllog" in topic:
+        return "syllogism"
+    if "Mixed Series" in topic:
+        return "series"
+    if "Blood Relation" in topic:
+        return "kinship"
+    if "Seating" in topic:
+        return "seating"
+    return "generic"
+
+
+PARSERS = {
+    "syllogism": parse_syllogism,
+    "series": parse_series,
+    "kinship": parse_kinship,
+    "seating": parse_seating,
+}
+
+
+# Records written by the generators carry a "payload" with the same facts in
+# machine-readable form; these readers build the structured body from it
+# without touching the question text.
+
+def syllogism_from_payload(p):
+    premises = [tuple(x) for x in p["premises"]]
+    if "conclusions" in p:
+        conclusions = [tuple(c) for c in p["conclusions"]]
+    else:
+        conclusions = [tuple(p["conclusion"])]
+    return Syllogism([render_proposition(x) for x in premises], premises, conclusions, p.get("derivation"))
+
+
+def series_from_payload(p):
+    letters, numbers = p["letters"], p["numbers"]
+    rule = p if "params" in p else None
+    return Series([f"{l}{n}" for l, n in zip(letters, numbers)], letters, numbers, rule)
+
+
+def kinship_from_payload(p):
+    facts = [tuple(f) for f in p["facts"]]
+    sentences = [f"{a} is the {role} of {b}" for a, role, b in facts]
+    x, y = p["query"]
+    return Kinship(sentences + [f"How is {x} related to {y}?"], facts, (x, y), p.get("chain"))
+
+
+def seating_from_payload(p):
+    return Seating([tuple(c) for c in p["clues"]], p["ask"])
+
+
+PAYLOAD_READERS = {
+    "syllogism": syllogism_from_payload,
+    "series": series_from_payload,
+    "kinship": kinship_from_payload,
+    "seating": seating_from_payload,
+}
+
+
+def parse_question(q, expected=None):
+    """
+    Turn a question record into its structured form, from the payload when
+    present and by parsing the text otherwise. body is None when the text
+    does not match its topic.
+    """
+    kind = topic_kind(q.get("topic", ""))
+    if expected is None:
+        expected = q.get("expected_answer", "")
+    payload = q.get("payload")
+    if payload is not None and kind in PAYLOAD_READERS:
+        body = PAYLOAD_READERS[kind](payload)
+    else:
+        parser = PARSERS.get(kind)
+        body = parser(q.get("question", "")) if parser else None
+    return Parsed(kind, body, expected, choice_text(q.get("choices", []), expected))
+
+
+# Generators store a difficulty score in the payload (see each generator's
+# difficulty()); records from before that get a rough estimate from their
+# parsed form: clue, premise or fact counts, and for series the simplest rule
+# the number differences allow and the letter step.
+SERIES_RULE_DIFFICULTY = {"linear": 1, "alternating": 2, "square_mod": 3, "square_mod_10": 3, "fibonacci": 3}
+
+
+def series_difficulty(body):
+    numbers, letters = body.numbers, body.letters
+    diffs = [b - a for a, b in zip(numbers, numbers[1:])]
+    if len(set(diffs)) <= 1:
+        rule = "linear"
+    elif len(set(diffs[0::2])) == 1 and len(set(diffs[1::2])) == 1:
+        rule = "alternating"
+    else:
+        rule = "square_mod"
+    step = (ord(letters[1]) - ord(letters[0])) % 26 if len(letters) > 1 else 1
+    return SERIES_RULE_DIFFICULTY[rule] + (step > 2)
+
+
+def record_difficulty(q):
+    payload = q.get("payload") or {}
+    if "difficulty" in payload:
+        return payload["difficulty"]
+    parsed = parse_question(q)
+    if parsed.body is None:
+        return 0
+    if parsed.kind == "seating":
+        return len(parsed.body.clues)
+    if parsed.kind == "syllogism":
+        return len(parsed.body.premises)
+    if parsed.kind == "kinship":
+        return len(parsed.body.facts)
+    if parsed.kind == "series":
+        return series_difficulty(parsed.body)
+    return 0
@@ -0,0 +1,540 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from urllib.parse import urlsplit
+
+from core.dataset import Dataset
+from core.file_manager import iter_json_array
+from core.instrument import percentile
+from core.prompts import SOLVE_HEAD, SOLVE_CHOICES, SOLVE_TAIL, system_prompt
+from prepare_training_data import (
+    QUESTIONS_FILE, ANSWERS_FILE, QUESTIONS_STORE, ANSWERS_STORE, build_user_prompt, iter_pairs,
+    default_from_store
+)
+
+# Offline evaluation against an OpenAI-compatible chat endpoint.
+#
+#   python evaluate.py stub --port 8000 &
+#   python evaluate.py run --base-url http://127.0.0.1:8000/v1 --concurrency 32 --limit 2000
+#
+# Questions stream from the dataset into a bounded queue; `concurrency`
+# workers each hold one keep-alive connection from a shared pool and send
+# the training prompt (prepare_training_data.build_user_prompt) as a chat
+# completion. Connection errors, 429s and 5xx responses are retried with
+# jittered exponential backoff. Replies are parsed leniently for the answer
+# letter, and the report gives accuracy per topic, latency percentiles and
+# completion tokens per second. The HTTP client is plain asyncio streams,
+# so no extra packages are needed.
+#
+# The stub subcommand serves the same API locally: "solver" answers with
+# the verify_dataset solvers, "replay" returns the keyed answers of a
+# dataset, "random" guesses; --messy wraps replies the way chat models do.
+
+DEFAULT_BASE_URL = "http://127.0.0.1:8000/v1"
+DEFAULT_MODEL = "local"
+CONCURRENCY = 16
+MAX_RETRIES = 4
+TIMEOUT = 60.0
+MAX_TOKENS = 256
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+LETTER_RE = re.compile(r'"answer"\s*:\s*"?\s*([A-Da-d])\b')
+ANSWER_PHRASE_RE = re.compile(r"\b(?i:answer)\s*(?i:is|:)?\s*\(?([A-D])\b")
+CHOICE_PHRASE_RE = re.compile(r"\b(?i:option|choice)\s*(?i:is|:)?\s*\(?([A-D])\b")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+
+
+def first_json_object(text):
+    """The first balanced {...} in text that parses as JSON, or None."""
+    start = text.find("{")
+    while start != -1:
+        depth = 0
+        in_string = escaped = False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return json.loads(text[start:i + 1])
+                    except ValueError:
+                        break
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_reply(text):
+    """
+    (answer letter or None, reasoning) from a model reply. Accepts bare
+    JSON, JSON inside code fences or prose, a truncated JSON object, then
+    the last "the answer is B" in the text (replies often reason through
+    other letters first) and finally the first "option B".
+    """
+    obj = first_json_object(text)
+    if isinstance(obj, dict) and isinstance(obj.get("answer"), str):
+        letter = obj["answer"].strip().upper()[:1]
+        if letter and letter in "ABCD":
+            return letter, str(obj.get("reasoning", ""))
+    m = LETTER_RE.search(text)
+    if m:
+        return m.group(1).upper(), ""
+    phrases = ANSWER_PHRASE_RE.findall(text)
+    if phrases:
+        return phrases[-1], ""
+    m = CHOICE_PHRASE_RE.search(text)
+    return (m.group(1) if m else None), ""
+
+
+# ── HTTP client ───────────────────────────────────────────────
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most `size` open at a time."""
+
+    def __init__(self, base_url, size):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = parts.path.rstrip("/")
+        self.idle = []
+        self.slots = asyncio.Semaphore(size)
+
+    async def _connect(self):
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def post(self, path, payload, headers=None, timeout=TIMEOUT):
+        body = json.dumps(payload).encode("utf-8")
+        head = [
+            f"POST {self.path}{path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive",
+        ]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        request = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+        async with self.slots:
+            conn = self.idle.pop() if self.idle else await self._connect()
+            try:
+                status, data, keep = await asyncio.wait_for(self._exchange(conn, request), timeout)
+            except BaseException:
+                conn[1].close()
+                raise
+            if keep:
+                self.idle.append(conn)
+            else:
+                conn[1].close()
+        if status != 200:
+            raise HTTPError(status, data.decode("utf-8", "replace"))
+        return json.loads(data)
+
+    async def _exchange(self, conn, request):
+        reader, writer = conn
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        else:
+            data = await reader.readexactly(int(headers.get("content-length", 0)))
+        keep = headers.get("connection", "").lower() != "close"
+        return status, data, keep
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+def reply_text(response):
+    """Content of the first choice of a chat completion; ValueError if the reply has none."""
+    try:
+        return response["choices"][0]["message"].get("content") or ""
+    except (KeyError, IndexError, TypeError, AttributeError):
+        raise ValueError(f"malformed completion: {json.dumps(response)[:200]}") from None
+
+
+async def complete(pool, messages, model, max_tokens, retries, headers, rng):
+    """One chat completion with retry; returns (response json, attempts)."""
+    payload = {"model": model, "messages": messages, "temperature": 0, "max_tokens": max_tokens}
+    for attempt in range(retries + 1):
+        try:
+            return await pool.post("/chat/completions", payload, headers), attempt + 1
+        except HTTPError as e:
+            if e.status not in RETRY_STATUSES or attempt == retries:
+                raise
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            if attempt == retries:
+                raise
+        await asyncio.sleep(min(10.0, 0.25 * 2 ** attempt) * (0.5 + rng.random()))
+
+
+# ── evaluation ────────────────────────────────────────────────
+
+def iter_dataset(from_store=None, sources=None, topic=None):
+    """(question, answer) pairs in dataset order, optionally of one topic only."""
+    if from_store is None:
+        from_store = default_from_store()
+    if sources:
+        questions, answers = iter_json_array(sources[0]), iter_json_array(sources[1])
+    elif from_store:
+        questions, answers = Dataset(QUESTIONS_STORE), Dataset(ANSWERS_STORE)
+        if topic is not None:
+            # the topic index finds the rows without reading the other records
+            questions = questions.where(topic)
+            answers = answers.select(questions.record_numbers())
+    else:
+        questions, answers = iter_json_array(QUESTIONS_FILE), iter_json_array(ANSWERS_FILE)
+    for q, a in iter_pairs(questions, answers):
+        if topic is None or q.get("topic") == topic:
+            yield q, a
+
+
+def build_messages(q, skills=None):
+    messages = [{"role": "user", "content": build_user_prompt(q)}]
+    if skills:
+        messages.insert(0, {"role": "system", "content": system_prompt(q["topic"], "answer", skills)})
+    return messages
+
+
+async def evaluate_async(records, base_url, model, concurrency, retries, max_tokens, skills, api_key,
+                         results_file, seed):
+    pool = ConnectionPool(base_url, concurrency)
+    headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+    queue = asyncio.Queue(concurrency * 2)
+    rng = random.Random(seed)
+    topics = {}
+    latencies = []
+    totals = {"completion_tokens": 0, "prompt_tokens": 0, "retries": 0}
+
+    async def produce():
+        for i, (q, a) in enumerate(records):
+            await queue.put((i, q, a))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            i, q, a = item
+            expected = (q.get("expected_answer") or a.get("answer") or "").strip().upper()[:1]
+            st = topics.setdefault(q.get("topic", ""), {"records": 0, "correct": 0, "unparsed": 0, "errors": 0})
+            st["records"] += 1
+            result = {"index": i, "topic": q.get("topic", ""), "expected": expected}
+            start = time.perf_counter()
+            try:
+                response, attempts = await complete(pool, build_messages(q, skills), model, max_tokens,
+                                                    retries, headers, rng)
+                text = reply_text(response)
+            except Exception as e:
+                st["errors"] += 1
+                result["error"] = str(e)
+            else:
+                elapsed = time.perf_counter() - start
+                latencies.append(elapsed)
+                totals["retries"] += attempts - 1
+                usage = response.get("usage")
+                if not isinstance(usage, dict):
+                    usage = {}
+                totals["completion_tokens"] += usage.get("completion_tokens", len(text.split()))
+                totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+                letter, _ = parse_reply(text)
+                if letter is None:
+                    st["unparsed"] += 1
+                elif letter == expected:
+                    st["correct"] += 1
+                result.update(answer=letter, correct=letter == expected, latency=round(elapsed, 4))
+            if results_file:
+                results_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    t0 = time.perf_counter()
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        pool.close()
+    wall = time.perf_counter() - t0
+
+    records = sum(st["records"] for st in topics.values())
+    correct = sum(st["correct"] for st in topics.values())
+    errors = sum(st["errors"] for st in topics.values())
+    for st in topics.values():
+        answered = st["records"] - st["errors"]
+        st["accuracy"] = round(st["correct"] / answered, 4) if answered else None
+    ordered = sorted(latencies)
+    return {
+        "base_url": base_url,
+        "model": model,
+        "records": records,
+        "errors": errors,
+        "unparsed": sum(st["unparsed"] for st in topics.values()),
+        "accuracy": round(correct / (records - errors), 4) if records > errors else None,
+        "topics": topics,
+        "seconds": round(wall, 3),
+        "requests_per_sec": round(len(latencies) / wall, 1) if wall else None,
+        "latency_ms": {f"p{p}": round(percentile(ordered, p) * 1000, 1) for p in (50, 90, 99)},
+        "completion_tokens": totals["completion_tokens"],
+        "tokens_per_sec": round(totals["completion_tokens"] / wall, 1) if wall else None,
+        "retries": totals["retries"],
+        "concurrency": concurrency,
+    }
+
+
+def evaluate(base_url=DEFAULT_BASE_URL, model=DEFAULT_MODEL, concurrency=CONCURRENCY, retries=MAX_RETRIES,
+             max_tokens=MAX_TOKENS, limit=None, topic=None, from_store=None, sources=None, skills=None,
+             api_key=None, results=None, seed=0):
+    """Run the evaluation over the dataset (the first `limit` records); returns the report."""
+    records = iter_dataset(from_store, sources, topic)
+    if limit is not None:
+        records = islice(records, limit)
+    results_file = open(results, "w", encoding="utf-8") if results else None
+    try:
+        return asyncio.run(evaluate_async(records, base_url, model, concurrency, retries, max_tokens, skills,
+                                          api_key, results_file, seed))
+    finally:
+        if results_file:
+            results_file.close()
+
+
+def print_report(report, out=sys.stdout):
+    print(f"{report['records']} records in {report['seconds']}s ({report['requests_per_sec']} req/s, "
+          f"{report['tokens_per_sec']} tokens/s, {report['retries']} retries)", file=out)
+    print(f"{'topic':<42}{'records':>8}{'accuracy':>10}{'unparsed':>10}{'errors':>8}", file=out)
+    for topic, st in sorted(report["topics"].items()):
+        acc = "-" if st["accuracy"] is None else f"{st['accuracy']:.1%}"
+        print(f"{topic:<42}{st['records']:>8}{acc:>10}{st['unparsed']:>10}{st['errors']:>8}", file=out)
+    acc = "-" if report["accuracy"] is None else f"{report['accuracy']:.1%}"
+    print(f"{'overall':<42}{report['records']:>8}{acc:>10}{report['unparsed']:>10}{report['errors']:>8}", file=out)
+    lat = report["latency_ms"]
+    print(f"latency ms: p50 {lat['p50']}  p90 {lat['p90']}  p99 {lat['p99']}", file=out)
+
+
+# ── stub server ───────────────────────────────────────────────
+
+def prompt_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def split_prompt(text):
+    """(question, choices) back out of a build_user_prompt prompt, or None."""
+    if not text.startswith(SOLVE_HEAD) or SOLVE_CHOICES not in text:
+        return None
+    question, _, rest = text[len(SOLVE_HEAD):].partition(SOLVE_CHOICES)
+    choices, _, _ = rest.partition(SOLVE_TAIL)
+    return question, choices.split("\n")
+
+
+def solver_answer(question, choices):
+    """Letter of the choice the verify_dataset solvers pick, or None."""
+    from verify_dataset import SOLVERS
+    for solver in SOLVERS.values():
+        try:
+            status, solved, _ = solver(question)
+        except Exception:
+            continue
+        if status == "solved":
+            for c in choices:
+                if c.partition(")")[2].strip() == solved:
+                    return c[:1]
+    return None
+
+
+def load_replay(from_store=None, sources=None):
+    """prompt hash -> keyed answer letter for every record of the dataset."""
+    table = {}
+    for q, a in iter_dataset(from_store, sources):
+        table[prompt_hash(build_user_prompt(q))] = (q.get("expected_answer") or a.get("answer") or "")[:1]
+    return table
+
+
+def make_handler(mode, replay, latency, error_rate, messy, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.endswith("/chat/completions"):
+                return self.reply(404, {"error": {"message": f"no route {self.path}"}})
+            with lock:
+                fail = rng.random() < error_rate
+                guess = rng.choice("ABCD")
+                style = rng.randrange(3)
+            if latency:
+                time.sleep(latency)
+            if fail:
+                return self.reply(503, {"error": {"message": "injected failure"}})
+            request = json.loads(body)
+            prompt = request["messages"][-1]["content"]
+
+            letter = None
+            if mode == "replay":
+                letter = replay.get(prompt_hash(prompt))
+            elif mode == "solver":
+                parts = split_prompt(prompt)
+                letter = solver_answer(*parts) if parts else None
+            letter = letter or guess
+            content = json.dumps({"answer": letter, "reasoning": f"{mode} stub"})
+            if messy and style == 1:
+                content = f"```json\n{content}\n```"
+            elif messy and style == 2:
+                content = f"Let me work through this.\n{content}\nSo the answer is {letter}."
+            self.reply(200, {
+                "object": "chat.completion",
+                "model": request.get("model", DEFAULT_MODEL),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split())},
+            })
+
+    return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # every evaluation worker connects at once
+
+
+def serve_stub(port=8000, mode="solver", latency=0.0, error_rate=0.0, messy=False, from_store=None,
+               sources=None, seed=0, host="127.0.0.1"):
+    """Start the stub server; returns it (serving on a background thread)."""
+    if mode not in ("solver", "replay", "random"):
+        raise ValueError(f"unknown stub mode {mode!r}")
+    replay = load_replay(from_store, sources) if mode == "replay" else {}
+    server = StubServer((host, port), make_handler(mode, replay, latency, error_rate, messy, seed))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a chat model on the dataset")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="evaluate against an OpenAI-compatible endpoint")
+    p_run.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    p_run.add_argument("--model", default=DEFAULT_MODEL)
+    p_run.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    p_run.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                       help="requests in flight (and pooled connections)")
+    p_run.add_argument("--retries", type=int, default=MAX_RETRIES)
+    p_run.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    p_run.add_argument("--limit", type=int, default=None, help="evaluate only the first N records")
+    p_run.add_argument("--topic", default=None, help="evaluate only this topic")
+    source = p_run.add_mutually_exclusive_group()
+    source.add_argument("--from-store", dest="from_store", action="store_const", const=True, default=None,
+                        help=f"read the JSONL stores (the default once {QUESTIONS_STORE} exists)")
+    source.add_argument("--from-json", dest="from_store", action="store_const", const=False,
+                        help="read questions.json/answers.json")
+    p_run.add_argument("--skills", nargs="?", const="dataset/skillbank.json", default=None, metavar="SKILLBANK",
+                       help="add the answer-agent system prompt with the topic's skills")
+    p_run.add_argument("--results", default=None, help="write one JSON line per record here")
+    p_run.add_argument("--report", default=None, help="write the report as JSON here")
+    p_run.add_argument("--seed", type=int, default=0, help="seed for retry jitter")
+    p_run.add_argument("--stub", choices=("solver", "replay", "random"), default=None,
+                       help="start a local stub server in this mode and evaluate against it")
+
+    p_stub = sub.add_parser("stub", help="serve a local OpenAI-compatible stub")
+    p_stub.add_argument("--port", type=int, default=8000)
+    p_stub.add_argument("--host", default="127.0.0.1")
+    p_stub.add_argument("--mode", choices=("solver", "replay", "random"), default="solver")
+    p_stub.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    p_stub.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    p_stub.add_argument("--messy", action="store_true", help="wrap some replies in code fences or prose")
+    source = p_stub.add_mutually_exclusive_group()
+    source.add_argument("--from-store", dest="from_store", action="store_const", const=True, default=None,
+                        help="replay answers from the JSONL stores (the default once they exist)")
+    source.add_argument("--from-json", dest="from_store", action="store_const", const=False,
+                        help="replay answers from questions.json/answers.json")
+    p_stub.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        server = serve_stub(args.port, args.mode, args.latency, args.error_rate, args.messy, args.from_store,
+                            seed=args.seed, host=args.host)
+        print(f"{args.mode} stub serving on http://{args.host}:{server.server_address[1]}/v1")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    base_url = args.base_url
+    server = None
+    if args.stub:
+        server = serve_stub(0, args.stub, from_store=args.from_store, seed=args.seed)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        report = evaluate(base_url, args.model, args.concurrency, args.retries, args.max_tokens, args.limit,
+                          args.topic, args.from_store, None, args.skills, args.api_key, args.results, args.seed)
+    finally:
+        if server:
+            server.shutdown()
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,387 @@
 import random
-from core.file_manager import append_json
+import argparse
+import hashlib
+import math
+import os
+import json
+import sys
+import time
+from multiprocessing import Pool
+from core.file_manager import (
+    append_records, export_json, open_store, align_stores, FSYNC_POLICIES,
+    pending_shard_path, write_shard, publish_shard, iter_records, count_records
+)
+from core.dedup import DedupIndex
+from core.question_parser import record_difficulty
+from core import instrument
 
 from generators import mixed_series, syllogism, blood_relation, seating
 
-GENERATORS=[
-    mixed_series.generate_pattern,
-    syllogism.generate,
-    blood_relation.generate,
-    seating.generate
-]
+# keyed by the topic kinds of core.question_parser
+TOPIC_GENERATORS={
+    "series":mixed_series.generate_rule,
+    "syllogism":syllogism.generate,
+    "kinship":blood_relation.generate,
+    "seating":seating.generate
+}
 
-def generate_batch(n=100):
+GENERATORS=list(TOPIC_GENERATORS.values())
+GENERATOR_KINDS={gen:kind for kind,gen in TOPIC_GENERATORS.items()}
+
+QUESTIONS_FILE="dataset/questions.json"
+ANSWERS_FILE="dataset/answers.json"
+QUESTIONS_STORE="dataset/store/questions"
+ANSWERS_STORE="dataset/store/answers"
+DEDUP_INDEX="dataset/store/dedup.idx"
+SEATING_CACHE="dataset/store/seating_cache.txt"
+RUNS_LOG="dataset/store/runs.jsonl"
+
+SHARD_SIZE=10000
+# give up on a deduplicated batch after this many draws per requested item
+MAX_DRAWS_PER_ITEM=50
+
+def open_stores():
+    """
+    Open the question and answer stores for appending. Each batch is
+    published to the question store first, so a run that died in between
+    left question records with no answers; they are dropped here, before
+    they can shift every later pair.
+    """
+    open_store(QUESTIONS_STORE,QUESTIONS_FILE)
+    open_store(ANSWERS_STORE,ANSWERS_FILE)
+    dropped=align_stores((QUESTIONS_STORE,ANSWERS_STORE))
+    if dropped:
+        print(f"warning: dropped {dropped} unpaired records left by an interrupted run",file=sys.stderr)
+
+def load_dedup_index(near_threshold=None):
+    """
+    Open the persistent duplicate index and catch it up with the question
+    store: records past its watermark (written without --dedup, by sharded
+    runs or by the pipeline) are indexed now. Near-duplicate signatures are
+    not persisted, so with near_threshold set every stored question is
+    re-signed on each load.
+    """
+    open_stores()
+    index=DedupIndex(DEDUP_INDEX,near_threshold)
+    start=0 if near_threshold is not None else min(index.watermark,count_records(QUESTIONS_STORE))
+    n=start
+    for q in iter_records(QUESTIONS_STORE,start):
+        index.seed(q)
+        n+=1
+    index.flush(n)
+    index.stats={"new":0,"exact":0,"near":0}
+    return index
+
+def generate_batch(n=100, fsync="shard", dedup=None, rng=random):
+    """
+    Generate n samples and append them to the stores. dedup is an optional
+    DedupIndex; repeats of indexed questions are redrawn.
+    """
+    questions=[]
+    answers=[]
+    draws=0
+    rec=instrument.ACTIVE
+
+    while len(questions)<n and draws<n*MAX_DRAWS_PER_ITEM:
+        gen=rng.choice(GENERATORS)
+        q,a=gen(rng) if rec is None else rec.item(GENERATOR_KINDS[gen],gen,rng)
+        draws+=1
+        if dedup is not None and dedup.add(q)!="new":
+            continue
+        questions.append(q)
+        answers.append(a)
+
+    open_stores()
+    append_records(QUESTIONS_STORE,questions,fsync)
+    append_records(ANSWERS_STORE,answers,fsync)
+
+    if dedup is not None:
+        dedup.flush(count_records(QUESTIONS_STORE))
+        print(f"Added {len(questions)} new samples "
+              f"(rejected {dedup.stats['exact']} exact and {dedup.stats['near']} near duplicates)")
+    else:
+        print(f"Added {n} new samples")
+
+def generate_quota(quotas, dedup=None, difficulty=None, fsync="shard", rng=random):
+    """
+    Fill per-topic quotas of accepted questions.
+
+    quotas maps a topic kind ("series", "syllogism", "kinship", "seating") to
+    the number of items wanted; difficulty optionally maps a kind to an
+    inclusive (lo, hi) band of record_difficulty scores. Topics are drawn
+    round robin so the output stays interleaved. A topic stops once its quota is
+    met, or after MAX_DRAWS_PER_ITEM draws per requested item ("filled" in its
+    report says which; the CLI fails on an unfilled quota). Returns the
+    per-topic report: draws, accepted, rejections by reason, generator time,
+    items/sec and rejection ratio.
+    """
+    difficulty=difficulty or {}
+    for kind in quotas:
+        if kind not in TOPIC_GENERATORS:
+            raise ValueError(f"unknown topic {kind!r}; expected one of {list(TOPIC_GENERATORS)}")
+
+    stats={
+        kind:{"quota":n,"draws":0,"accepted":0,"exact":0,"near":0,"difficulty":0,"seconds":0.0}
+        for kind,n in quotas.items()
+    }
+    open_topics=[kind for kind,n in quotas.items() if n>0]
+    questions=[]
+    answers=[]
+    rec=instrument.ACTIVE
+
+    while open_topics:
+        for kind in list(open_topics):
+            st=stats[kind]
+            start=time.perf_counter()
+            gen=TOPIC_GENERATORS[kind]
+            q,a=gen(rng) if rec is None else rec.item(kind,gen,rng)
+            st["seconds"]+=time.perf_counter()-start
+            st["draws"]+=1
+
+            lo,hi=difficulty.get(kind,(None,None))
+            d=record_difficulty(q)
+            if (lo is not None and d<lo) or (hi is not None and d>hi):
+                st["difficulty"]+=1
+            else:
+                verdict=dedup.add(q) if dedup is not None else "new"
+                if verdict=="new":
+                    st["accepted"]+=1
+                    questions.append(q)
+                    answers.append(a)
+                else:
+                    st[verdict]+=1
+
+            if st["accepted"]>=st["quota"] or st["draws"]>=st["quota"]*MAX_DRAWS_PER_ITEM:
+                open_topics.remove(kind)
+
+    open_stores()
+    append_records(QUESTIONS_STORE,questions,fsync)
+    append_records(ANSWERS_STORE,answers,fsync)
+    if dedup is not None:
+        dedup.flush(count_records(QUESTIONS_STORE))
+
+    for st in stats.values():
+        st["filled"]=st["accepted"]>=st["quota"]
+        st["items_per_sec"]=round(st["accepted"]/st["seconds"],1) if st["seconds"] else 0.0
+        st["draws_per_sec"]=round(st["draws"]/st["seconds"],1) if st["seconds"] else 0.0
+        st["rejection_ratio"]=round(1-st["accepted"]/st["draws"],4) if st["draws"] else 0.0
+        st["seconds"]=round(st["seconds"],4)
+    return stats
+
+def parse_topic_args(values, parse):
+    """["seating=50", ...] -> {"seating": parse("50")}"""
+    out={}
+    for v in values:
+        kind,sep,rest=v.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"expected TOPIC=VALUE, got {v!r}")
+        out[kind]=parse(rest)
+    return out
+
+def parse_band(text):
+    lo,_,hi=text.partition(":")
+    return (int(lo) if lo else None,int(hi) if hi else None)
+
+# Every record of a seeded run draws from its own random.Random, seeded from
+# (run seed, record index) alone. Record i can therefore be regenerated
+# without the records before it, and a run is fully described by its seed,
+# its record count and the code version below.
+
+# modules whose code decides what a record seed produces
+VERSIONED_SOURCES=("generate_dataset.py","core/formatter.py","core/distractors.py","core/question_parser.py","generators")
+
+def code_version():
+    """Short content hash of VERSIONED_SOURCES."""
+    root=os.path.dirname(os.path.abspath(__file__))
+    h=hashlib.blake2b(digest_size=8)
+    for source in VERSIONED_SOURCES:
+        path=os.path.join(root,source)
+        files=[os.path.join(path,f) for f in sorted(os.listdir(path)) if f.endswith(".py")] if os.path.isdir(path) else [path]
+        for f in files:
+            h.update(os.path.relpath(f,root).encode())
+            with open(f,"rb") as fh:
+                h.update(fh.read())
+    return h.hexdigest()
+
+def record_seed(run_seed, index):
+    """Seed for record `index` of a run; independent of how records are split across workers."""
+    digest=hashlib.blake2b(f"{run_seed}:{index}".encode(),digest_size=8).digest()
+    return int.from_bytes(digest,"little")
+
+def generate_record(run_seed, index):
+    rng=random.Random(record_seed(run_seed,index))
+    gen=rng.choice(GENERATORS)
+    return gen(rng)
+
+def log_run(seed, start, count):
+    """Append one line to RUNS_LOG: enough to regenerate the run's records."""
+    entry={"seed":seed,"start":start,"records":count,"version":code_version()}
+    with open(RUNS_LOG,"a",encoding="utf-8") as f:
+        f.write(json.dumps(entry)+"\n")
+
+def read_runs():
+    if not os.path.exists(RUNS_LOG):
+        return []
+    with open(RUNS_LOG,"r",encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def regenerate(seed, start, stop):
+    """Print records start..stop-1 of run `seed` as JSON lines, without generating the rest."""
+    version=code_version()
+    logged={r["version"] for r in read_runs() if r["seed"]==seed}
+    if logged and version not in logged:
+        print(f"warning: run {seed} was generated by code version {', '.join(sorted(logged))}, "
+              f"this is {version}; records may differ",file=sys.stderr)
+    for i in range(start,stop):
+        q,a=generate_record(seed,i)
+        print(json.dumps({"index":i,"question":q,"answer":a},ensure_ascii=False))
+
+def _init_worker():
+    # only the parent process writes the seating cache file
+    seating.CACHE.read_only()
+
+def _generate_shard(task):
+    run_seed,start,stop,fsync=task
     questions=[]
     answers=[]
 
-    for _ in range(n):
-        gen=random.choice(GENERATORS)
-        q,a=gen()
+    for i in range(start,stop):
+        q,a=generate_record(run_seed,i)
         questions.append(q)
         answers.append(a)
 
-    append_json("dataset/questions.json",questions)
-    append_json("dataset/answers.json",answers)
+    tag=f"{run_seed}-{start:012d}"
+    qpath=pending_shard_path(QUESTIONS_STORE,tag)
+    apath=pending_shard_path(ANSWERS_STORE,tag)
+    write_shard(qpath,questions,fsync)
+    write_shard(apath,answers,fsync)
+    return qpath,apath,stop-start
+
+def generate_sharded(count, workers=1, seed=0, shard_size=None, fsync="shard"):
+    """
+    Generate `count` records over a process pool.
+
+    Record i of the run is always drawn from record_seed(seed, i), so the
+    output is the same for any worker count or shard size. Workers write
+    pending shards inside the stores and the parent publishes them in index
+    order as they complete.
+    """
+    open_stores()
+    os.makedirs(QUESTIONS_STORE,exist_ok=True)
+    os.makedirs(ANSWERS_STORE,exist_ok=True)
+    first=count_records(QUESTIONS_STORE)
+
+    if shard_size is None:
+        # a few tasks per worker keeps the pool balanced near the end of a run
+        shard_size=max(1,min(SHARD_SIZE,math.ceil(count/(workers*4))))
+
+    tasks=[
+        (seed,start,min(count,start+shard_size),fsync)
+        for start in range(0,count,shard_size)
+    ]
+
+    if workers>1:
+        with Pool(workers,initializer=_init_worker) as pool:
+            for qpath,apath,n in pool.imap(_generate_shard,tasks):
+                publish_shard(QUESTIONS_STORE,qpath,n,fsync)
+                publish_shard(ANSWERS_STORE,apath,n,fsync)
+    else:
+        for qpath,apath,n in map(_generate_shard,tasks):
+            publish_shard(QUESTIONS_STORE,qpath,n,fsync)
+            publish_shard(ANSWERS_STORE,apath,n,fsync)
 
-    print(f"Added {n} new samples")
+    log_run(seed,first,count)
+    print(f"Added {count} new samples (seed={seed}, workers={workers}, shards={len(tasks)})")
+
+def export_stores():
+    export_json(QUESTIONS_STORE,QUESTIONS_FILE)
+    n=export_json(ANSWERS_STORE,ANSWERS_FILE)
+    print(f"Exported {n} samples → {QUESTIONS_FILE}, {ANSWERS_FILE}")
+
+def run(args):
+    """Dispatch to the generation mode selected on the command line."""
+    if args.regenerate:
+        start,stop=parse_band(args.regenerate)
+        start=start or 0
+        regenerate(args.seed,start,stop if stop is not None else start+1)
+    elif args.quota:
+        # a quota counts distinct items, so it always runs against the index
+        report=generate_quota(
+            parse_topic_args(args.quota,int),
+            load_dedup_index(args.near_dup),
+            parse_topic_args(args.difficulty,parse_band),
+            args.fsync,
+            random.Random(args.seed) if args.seed is not None else random
+        )
+        print(json.dumps(report,indent=2))
+        short=[f"{kind} ({st['accepted']}/{st['quota']} after {st['draws']} draws)"
+               for kind,st in report.items() if not st["filled"]]
+        if short:
+            raise SystemExit("quota not filled for "+", ".join(short)+": the draw budget ran out before enough "
+                             "new items in the difficulty band turned up (the accepted ones were kept); lower the quota "
+                             "or widen --difficulty")
+    elif args.workers>1 or args.seed is not None:
+        seed=args.seed if args.seed is not None else random.randrange(2**32)
+        generate_sharded(args.count,args.workers,seed,args.shard_size,args.fsync)
+    elif args.dedup:
+        generate_batch(args.count,args.fsync,load_dedup_index(args.near_dup))
+    else:
+        generate_batch(args.count,args.fsync)
 
 if __name__=="__main__":
-    generate_batch(100)
+    parser=argparse.ArgumentParser()
+    parser.add_argument("--count",type=int,default=100)
+    parser.add_argument("--workers",type=int,default=1,
+                        help="generate in seeded shards over this many processes")
+    parser.add_argument("--seed",type=int,default=None,
+                        help="run seed for sharded generation (random if omitted)")
+    parser.add_argument("--shard-size",type=int,default=None)
+    parser.add_argument("--fsync",choices=FSYNC_POLICIES,default="shard")
+    parser.add_argument("--dedup",action="store_true",
+                        help="redraw questions already in the dataset (single-process mode; "
+                             "always on with --quota)")
+    parser.add_argument("--near-dup",type=float,default=None,metavar="THRESHOLD",
+                        help="with --dedup, also redraw near duplicates above this MinHash similarity")
+    parser.add_argument("--quota",action="append",default=[],metavar="TOPIC=N",
+                        help="fill per-topic quotas instead of --count (topics: "+", ".join(TOPIC_GENERATORS)+")")
+    parser.add_argument("--difficulty",action="append",default=[],metavar="TOPIC=LO:HI",
+                        help="with --quota, only accept items whose difficulty score is in [LO, HI]")
+    parser.add_argument("--seating-cache",nargs="?",const=SEATING_CACHE,default=None,metavar="PATH",
+                        help="reuse seating solver results stored at PATH (default "+SEATING_CACHE+"); "
+                             "sharded workers read it but only the parent process adds to it")
+    parser.add_argument("--report",default=None,metavar="PATH",
+                        help="write a JSON timing report (per-generator latency, formatter and I/O time, "
+                             "peak RSS); generator timings cover single-process modes only")
+    parser.add_argument("--profile",choices=("cprofile","pyinstrument"),default=None,
+                        help="run under a profiler")
+    parser.add_argument("--profile-output",default=None,metavar="PATH",
+                        help="profiler output (default generate.prof / generate.pyinstrument.txt)")
+    parser.add_argument("--regenerate",default=None,metavar="INDEX[:STOP]",
+                        help="with --seed, print record INDEX (or INDEX..STOP-1) of that run as JSON lines "
+                             "instead of generating")
+    parser.add_argument("--export",action="store_true",
+                        help="rewrite the JSON array files from the stores afterwards (a snapshot; "
+                             "the stores stay authoritative and the other scripts read them by default)")
+    args=parser.parse_args()
+
+    if args.regenerate and args.seed is None:
+        parser.error("--regenerate needs the --seed of the run")
+    if args.dedup and not args.quota and (args.workers>1 or args.seed is not None):
+        parser.error("--dedup is only supported in single-process mode; run python -m core.dedup afterwards")
+
+    if args.seating_cache:
+        seating.CACHE=seating.SolutionCache(path=args.seating_cache)
+
+    if args.report or args.profile:
+        with instrument.recording(args.profile,args.profile_output) as rec:
+            run(args)
+        if args.report:
+            instrument.write_report(rec.report(),args.report)
+            print(f"Wrote run report → {args.report}")
+    else:
+        run(args)
+    if args.seating_cache:
+        seating.CACHE.flush()
+        print(f"Seating cache: {json.dumps(seating.CACHE.report())}")
+    if args.export:
+        export_stores()
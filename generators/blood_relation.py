@@ -1,26 +1,47 @@
 import random
 from core.formatter import build_question
+from core.distractors import pick
+from generators import family_graph
 
-def generate():
-    names=["A","B","C","D","E","F"]
+TOPIC="Blood Relations and Family Tree"
 
-    question=(
-    "A is the father of B. "
-    "B is the sister of C. "
-    "C is the son of D. "
-    "D is the wife of E. "
-    "E is the brother of F. "
-    "How is A related to F?"
-    )
+def difficulty(facts, key):
+    """Facts to chain, plus one for each marriage the relation crosses (in-law terms)."""
+    pre,_,_,post=key
+    return len(facts)+(pre=="S")+(post=="S")
+
+# rounds of family_graph.sample_question before giving up; a round almost
+# never fails, so running out means the sampler is broken
+MAX_SAMPLES=20
+
+def generate(rng=random):
+    for _ in range(MAX_SAMPLES):
+        sampled=family_graph.sample_question(rng)
+        if sampled is not None:
+            break
+    else:
+        raise RuntimeError(f"no consistent family question in {MAX_SAMPLES} rounds of sampling")
+
+    facts,query,correct,chain,key=sampled
+    gender=family_graph.fact_genders(facts)[query[0]]
 
-    correct="Brother-in-law"
+    question="".join(f"{a} is the {r} of {b}. " for a,r,b in facts)
+    question+=f"How is {query[0]} related to {query[1]}?"
 
-    distractors=["Uncle","Father","Grandfather"]
+    distractors=pick(family_graph.TERM_POOLS[(key,gender)],rng)
 
     return build_question(
-        "Blood Relations and Family Tree",
+        TOPIC,
         question,
         correct,
         distractors,
-        "Multi-hop relation composition"
+        " ".join(chain),
+        {
+            "facts":[list(f) for f in facts],
+            "query":list(query),
+            "relation":correct,
+            "chain":chain,
+            "difficulty":difficulty(facts,key)
+        },
+        rng
     )
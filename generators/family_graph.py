@@ -0,0 +1,300 @@
+import random
+import string
+from collections import namedtuple, deque
+
+from core.distractors import POOL_SIZE
+
+# Family-tree engine for blood-relation questions.
+#
+# A family is stored as parallel integer-indexed lists (gender, father,
+# mother, spouse; -1 for "none") plus a per-member ancestor table
+# {ancestor: generations up}. Relations are named by a key
+# (pre, up, down, post): walk `up` generations from x to the closest common
+# ancestor and `down` generations to y, optionally through x's spouse first
+# (pre="S") or ending at y's spouse (post="S").
+
+MALE, FEMALE = 0, 1
+
+Family = namedtuple("Family", "names gender father mother spouse ancestors")
+
+# key -> (term if x is male, term if x is female)
+TERMS = {
+    ("",0,1,""):("Father","Mother"),
+    ("",0,2,""):("Grandfather","Grandmother"),
+    ("",0,3,""):("Great-grandfather","Great-grandmother"),
+    ("",1,0,""):("Son","Daughter"),
+    ("",2,0,""):("Grandson","Granddaughter"),
+    ("",3,0,""):("Great-grandson","Great-granddaughter"),
+    ("",1,1,""):("Brother","Sister"),
+    ("",1,2,""):("Uncle","Aunt"),
+    ("",2,1,""):("Nephew","Niece"),
+    ("",2,2,""):("Cousin","Cousin"),
+    ("S",0,0,""):("Husband","Wife"),
+    ("S",1,0,""):("Son-in-law","Daughter-in-law"),
+    ("S",1,1,""):("Brother-in-law","Sister-in-law"),
+    ("S",1,2,""):("Uncle","Aunt"),
+    ("",0,1,"S"):("Father-in-law","Mother-in-law"),
+    ("",1,1,"S"):("Brother-in-law","Sister-in-law"),
+}
+
+# fact roles: (role if subject is male, role if female)
+ROLES = {
+    "parent":("father","mother"),
+    "child":("son","daughter"),
+    "sibling":("brother","sister"),
+    "spouse":("husband","wife"),
+}
+ROLE_GENDER = {r:g for pair in ROLES.values() for g,r in enumerate(pair)}
+
+# moves along one stated fact, from the subject's side: U = to a parent,
+# D = to a child, T = to a sibling, S = to the spouse
+ROLE_MOVES = {
+    "father":"D","mother":"D",
+    "son":"U","daughter":"U",
+    "brother":"T","sister":"T",
+    "husband":"S","wife":"S",
+}
+REVERSE_MOVE = {"U":"D","D":"U","T":"T","S":"S"}
+MOVE_ROLE = {"U":"child","D":"parent","T":"sibling","S":"spouse"}
+
+# Pairs of consecutive moves that collapse when both sides are different
+# people, e.g. a child's sibling is one's own child.
+REDUCTIONS = {"DU":"S","SS":"","DT":"D","TT":"T","SD":"D","US":"U","TU":"U"}
+
+
+def sample_family(rng=random, max_size=14, generations=3):
+    gender, father, mother, spouse = [], [], [], []
+
+    def add(g, f=-1, m=-1):
+        gender.append(g)
+        father.append(f)
+        mother.append(m)
+        spouse.append(-1)
+        return len(gender)-1
+
+    def marry(a, b):
+        spouse[a], spouse[b] = b, a
+
+    h, w = add(MALE), add(FEMALE)
+    marry(h, w)
+    couples = deque([(h, w, 0)])
+    while couples:
+        f, m, gen = couples.popleft()
+        for _ in range(rng.randint(1, 3)):
+            if len(gender) >= max_size:
+                break
+            child = add(rng.choice((MALE, FEMALE)), f, m)
+            if gen+2 < generations and len(gender) < max_size and rng.random() < 0.7:
+                partner = add(1-gender[child])
+                marry(child, partner)
+                couples.append((child, partner, gen+1) if gender[child] == MALE else (partner, child, gen+1))
+
+    names = rng.sample(string.ascii_uppercase, len(gender))
+    return Family(names, gender, father, mother, spouse, ancestor_tables(father, mother))
+
+
+def ancestor_tables(father, mother):
+    """{ancestor: generations up} per member, self included at 0; parents precede children."""
+    tables = []
+    for i in range(len(father)):
+        anc = {i:0}
+        for p in (father[i], mother[i]):
+            if p >= 0:
+                for a, d in tables[p].items():
+                    if a not in anc or d+1 < anc[a]:
+                        anc[a] = d+1
+        tables.append(anc)
+    return tables
+
+
+def blood_key(fam, x, y):
+    ax, ay = fam.ancestors[x], fam.ancestors[y]
+    if len(ax) > len(ay):
+        common = [(ax[a]+ay[a], ax[a], ay[a]) for a in ay if a in ax]
+    else:
+        common = [(ax[a]+ay[a], ax[a], ay[a]) for a in ax if a in ay]
+    if not common:
+        return None
+    _, up, down = min(common)
+    return ("", up, down, "")
+
+
+def relation_key(fam, x, y):
+    """Relation of x to y from the ancestor tables; None if unrelated."""
+    key = blood_key(fam, x, y)
+    if key:
+        return key
+    sx, sy = fam.spouse[x], fam.spouse[y]
+    if sx >= 0:
+        key = blood_key(fam, sx, y)
+        if key:
+            return ("S",)+key[1:]
+    if sy >= 0:
+        key = blood_key(fam, x, sy)
+        if key:
+            return key[:3]+("S",)
+    return None
+
+
+def term(key, g):
+    pair = TERMS.get(key)
+    return pair[g] if pair else None
+
+
+def compose(moves):
+    """Reduce a move string to a relation key, or None if it names no known relation."""
+    stack = []
+    for mv in moves:
+        stack.append(mv)
+        while len(stack) >= 2 and stack[-2]+stack[-1] in REDUCTIONS:
+            pair = stack.pop(-2)+stack.pop()
+            stack.extend(REDUCTIONS[pair])
+    s = "".join(stack).replace("T", "UD")
+    pre = "S" if s.startswith("S") else ""
+    s = s[len(pre):]
+    post = "S" if s.endswith("S") else ""
+    s = s[:len(s)-len(post)]
+    up = len(s)-len(s.lstrip("U"))
+    down = len(s)-up
+    if s != "U"*up+"D"*down or not (pre or post or up or down):
+        return None
+    key = (pre, up, down, post)
+    return key if key in TERMS else None
+
+
+def family_edges(fam, i):
+    for p in (fam.father[i], fam.mother[i]):
+        if p >= 0:
+            yield "U", p
+    for c in range(len(fam.gender)):
+        if c != i and i in (fam.father[c], fam.mother[c]):
+            yield "D", c
+    if fam.father[i] >= 0:
+        for s in range(len(fam.gender)):
+            if s != i and fam.father[s] == fam.father[i]:
+                yield "T", s
+    if fam.spouse[i] >= 0:
+        yield "S", fam.spouse[i]
+
+
+def shortest_path(edges, x, y):
+    """BFS over edges(node) -> (move, next); returns [(u, move, v), ...] or None."""
+    prev = {x:None}
+    queue = deque([x])
+    while queue:
+        u = queue.popleft()
+        if u == y:
+            break
+        for mv, v in edges(u):
+            if v not in prev:
+                prev[v] = (u, mv)
+                queue.append(v)
+    if y not in prev:
+        return None
+    path = []
+    v = y
+    while prev[v]:
+        u, mv = prev[v]
+        path.append((u, mv, v))
+        v = u
+    return path[::-1]
+
+
+def render_fact(fam, u, mv, v, subject_first=True):
+    """Fact triple (subject, role, object) stating one move of a path."""
+    if subject_first:
+        return fam.names[u], ROLES[MOVE_ROLE[mv]][fam.gender[u]], fam.names[v]
+    rv = REVERSE_MOVE[mv]
+    return fam.names[v], ROLES[MOVE_ROLE[rv]][fam.gender[v]], fam.names[u]
+
+
+def fact_edges(facts):
+    """edges(name) over the graph spanned by (subject, role, object) facts."""
+    graph = {}
+    for a, role, b in facts:
+        mv = ROLE_MOVES[role]
+        graph.setdefault(a, []).append((mv, b))
+        graph.setdefault(b, []).append((REVERSE_MOVE[mv], a))
+    return lambda n: graph.get(n, ())
+
+
+def fact_genders(facts):
+    return {a:ROLE_GENDER[role] for a, role, _ in facts}
+
+
+def resolve_facts(facts, x, y):
+    """
+    Relation of x to y implied by the stated facts alone.
+    Returns (term, chain) with one reasoning line per hop, or (None, None).
+    """
+    path = shortest_path(fact_edges(facts), x, y)
+    g = fact_genders(facts).get(x)
+    if not path or g is None:
+        return None, None
+    stated = {(a, b):(a, role, b) for a, role, b in facts}
+    chain = []
+    moves = ""
+    for u, mv, v in path:
+        moves += mv
+        a, role, b = stated.get((u, v)) or stated[(v, u)]
+        t = term(compose(moves), g)
+        line = f"{a} is the {role} of {b}"
+        if t and (a, b) != (x, v) and v != y:
+            line += f", so {x} is the {t.lower()} of {v}"
+        chain.append(line + ".")
+    t = term(compose(moves), g)
+    if t:
+        chain.append(f"Therefore {x} is the {t.lower()} of {y}.")
+    return t, chain
+
+
+def neighbour_terms(key, g, k=3):
+    """k distinct terms for the same gender whose relation keys are closest to key."""
+    pre, up, down, post = key
+    correct = term(key, g)
+    ranked = sorted(
+        TERMS,
+        key=lambda o: (abs(o[1]-up)+abs(o[2]-down)+(o[0] != pre)+(o[3] != post), o)
+    )
+    out = []
+    for o in ranked:
+        t = term(o, g)
+        if t != correct and t not in out:
+            out.append(t)
+            if len(out) == k:
+                break
+    return out
+
+
+# (relation key, gender) -> the nearest wrong terms, for core.distractors.pick
+TERM_POOLS = {(key, g): tuple(neighbour_terms(key, g, POOL_SIZE)) for key in TERMS for g in (MALE, FEMALE)}
+
+
+def sample_question(rng=random, min_hops=2, max_hops=5, max_tries=50):
+    """
+    Sample a family and a related pair joined by a min_hops..max_hops chain
+    of facts. The answer is checked twice: from the ancestor tables of the
+    whole family and by composing the stated facts alone.
+    Returns (facts, (x, y), term, chain, key) with names, or None after
+    max_tries.
+    """
+    for _ in range(max_tries):
+        fam = sample_family(rng)
+        n = len(fam.gender)
+        x, y = rng.sample(range(n), 2)
+        key = relation_key(fam, x, y)
+        if key not in TERMS:
+            continue
+        path = shortest_path(lambda i: family_edges(fam, i), x, y)
+        if not path or not min_hops <= len(path) <= max_hops:
+            continue
+        facts = [
+            render_fact(fam, u, mv, v, i == 0 or rng.random() < 0.5)
+            for i, (u, mv, v) in enumerate(path)
+        ]
+        answer = term(key, fam.gender[x])
+        resolved, chain = resolve_facts(facts, fam.names[x], fam.names[y])
+        if resolved != answer:
+            continue
+        return facts, (fam.names[x], fam.names[y]), answer, chain, key
+    return None
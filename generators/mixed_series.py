@@ -1,32 +1,266 @@
 import random
 import string
-from core.formatter import build_question
+try:
+    import numpy as np
+except ImportError:  # only generate_batch needs it
+    np=None
+from core.formatter import build_question, assemble_question, CHOICE_PREFIXES
+from core.distractors import pool, pick
+from core.question_parser import SERIES_RULE_DIFFICULTY
 
 letters=string.ascii_uppercase
 
-def generate_pattern():
-    start=random.randint(0,10)
+# A parameterized family of series: the letters advance by a fixed step and
+# the numbers follow one of NUMBER_RULES. generate_rule draws one item with
+# the Python rng (this is what the dataset uses); generate_batch draws a
+# whole batch as NumPy arrays. Both reject series whose shown terms are also
+# fitted by another rule with a different next number (see continuations).
+# NumPy is optional: only generate_batch needs it.
 
-    seq=[]
-    for i in range(8):
-        l=letters[(start+i*2)%26]
-        n=(i*i)%10
-        seq.append(f"{l}{n}")
+TOPIC="Mixed Series (Alphanumeric)"
+SERIES_LENGTH=8
+LETTER_STEPS=(1,2,3,4,5)
+NUMBER_RULES=("linear","square_mod","alternating","fibonacci")
+MODULI=(7,9,10,11,13)
+# widest modulus the ambiguity check tries for the "mod k" rules; a solver
+# has no way to tell which k was meant, so every k that fits counts
+MAX_MODULUS=16
 
-    answer=f"{letters[(start+16)%26]}{(8*8)%10}"
+# SQUARE_OFFSETS[k][(first term, second term)] -> offsets a with (i+a)^2 mod k
+SQUARE_OFFSETS={k:{} for k in range(1,MAX_MODULUS+1)}
+for k,offsets in SQUARE_OFFSETS.items():
+    for a in range(k):
+        offsets.setdefault((a*a % k,(a+1)**2 % k),[]).append(a)
 
-    question="Find next term:\n"+", ".join(seq)+", ?"
+def number_terms(np, rule, a, b, c, k, length):
+    """(n, length) array of numeric terms for per-item parameters a, b, c, k."""
+    i=np.arange(length)
+    linear=a[:,None]+b[:,None]*i
+    square=(i+a[:,None])**2 % k[:,None]
+    alternating=a[:,None]+(i+1)//2*b[:,None]-i//2*c[:,None]
 
-    distractors=[
-        f"{letters[(start+17)%26]}{(8*8)%10}",
-        f"{letters[(start+16)%26]}{(7*7)%10}",
-        f"{letters[(start+15)%26]}{(8*8)%10}"
-    ]
+    fib=np.empty((len(a),length),dtype=np.int64)
+    fib[:,0]=a % k
+    fib[:,1]=b % k
+    for j in range(2,length):
+        fib[:,j]=(fib[:,j-1]+fib[:,j-2]) % k
+
+    return np.select(
+        [rule[:,None]==r for r in range(len(NUMBER_RULES))],
+        [linear,square,alternating,fib]
+    )
+
+def rule_number(rule, params, i):
+    """Scalar counterpart of number_terms: the i-th number of a series."""
+    a,b,c,k=params
+    if rule=="linear":
+        return a+b*i
+    if rule=="square_mod":
+        return (i+a)**2 % k
+    if rule=="alternating":
+        return a+(i+1)//2*b-i//2*c
+    x,y=a % k,b % k
+    for _ in range(i):
+        x,y=y,(x+y) % k
+    return x
+
+def continuations(numbers):
+    """
+    Every next number that some rule of the family gives for the shown
+    numbers: constant or alternating differences, (i+a)^2 mod k and the
+    Fibonacci recurrence mod k for each k up to MAX_MODULUS above the
+    largest term. A fair item has exactly one.
+    """
+    n=len(numbers)
+    out=set()
+    diffs=[y-x for x,y in zip(numbers,numbers[1:])]
+    if len(set(diffs[0::2]))<=1 and len(set(diffs[1::2]))<=1:
+        out.add(numbers[-1]+diffs[(n-1) % 2])
+    for k in range(max(numbers)+1,MAX_MODULUS+1):
+        for a in SQUARE_OFFSETS[k].get((numbers[0],numbers[1]),()):
+            if all((i+a)**2 % k==x for i,x in enumerate(numbers)):
+                out.add((n+a)**2 % k)
+        if all((x+y) % k==z for x,y,z in zip(numbers,numbers[1:],numbers[2:])):
+            out.add((numbers[-2]+numbers[-1]) % k)
+    return out
+
+def count_continuations(np, nums):
+    """Vectorized len(continuations(row)) for each row of an (n, length) array."""
+    n,length=nums.shape
+    i=np.arange(length+1)
+    none=-1   # no prediction; every rule's terms are non-negative
+    diffs=np.diff(nums,axis=1)
+    steady=(diffs[:,0::2]==diffs[:,:1]).all(axis=1)&(diffs[:,1::2]==diffs[:,1:2]).all(axis=1)
+    preds=[np.where(steady,nums[:,-1]+diffs[:,(length-1) % 2],none)]
+    top=nums.max(axis=1)
+    for k in range(2,MAX_MODULUS+1):
+        wide=top<k
+        squares=(i[None,:]+np.arange(k)[:,None])**2 % k     # (a, i)
+        fits=(nums[:,None,:]==squares[None,:,:length]).all(axis=2)&wide[:,None]
+        preds.append(np.where(fits,squares[:,length][None,:],none))
+        fib=((nums[:,:-2]+nums[:,1:-1]) % k==nums[:,2:]).all(axis=1)&wide
+        preds.append(np.where(fib,(nums[:,-2]+nums[:,-1]) % k,none)[:,None])
+    preds=np.sort(np.concatenate([preds[0][:,None]]+preds[1:],axis=1),axis=1)
+    valid=preds!=none
+    return valid[:,0]+((preds[:,1:]!=preds[:,:-1])&valid[:,1:]).sum(axis=1)
+
+def next_term(payload):
+    """The term that follows a parameterized series, computed from its payload."""
+    i=len(payload["numbers"])
+    l=letters[(payload["start"]+payload["letter_step"]*i) % 26]
+    return f"{l}{rule_number(payload['rule'],payload['params'],i)}"
+
+def near_misses(letter, number, previous, modulus):
+    """
+    Candidate pool for a series answer: the letter one step off either way,
+    the number the rule gave one term earlier, or the next number mod the
+    rule's modulus.
+    """
+    l=letters[letter]
+    return pool([
+        f"{letters[(letter+1)%26]}{number}",
+        f"{l}{previous}",
+        f"{letters[(letter+25)%26]}{number}",
+        f"{l}{(number+1)%modulus}",
+        f"{letters[(letter+1)%26]}{previous}"
+    ],f"{l}{number}")
+
+def difficulty(rule, step):
+    """How hard the number rule is to spot, plus one for letter steps past two."""
+    return SERIES_RULE_DIFFICULTY[rule]+(step>2)
+
+def explain_rule(step, rule, params, answer):
+    a,b,c,k=params
+    if rule=="linear":
+        numbers=f"the numbers increase by {b} each term"
+    elif rule=="square_mod":
+        numbers=f"the numbers are (i+{a})^2 mod {k} for i = 0, 1, 2, ..."
+    elif rule=="alternating":
+        numbers=f"the numbers alternately add {b} and subtract {c}"
+    else:
+        numbers=f"each number is the sum of the previous two, mod {k}"
+    return f"The letters advance by {step} each term and {numbers}. Therefore the next term is {answer}."
+
+def generate_rule(rng=random):
+    """One series of the parameterized family, drawn with the Python rng."""
+    while True:
+        start=rng.randrange(26)
+        step=rng.choice(LETTER_STEPS)
+        rule=rng.choice(NUMBER_RULES)
+        b=rng.randint(2,9)
+        params=[rng.randint(0,9),b,rng.randint(1,b-1),rng.choice(MODULI)]
+        numbers=[rule_number(rule,params,i) for i in range(SERIES_LENGTH+1)]
+        if len(continuations(numbers[:-1]))==1:
+            break
+
+    seq_letters=[letters[(start+step*i) % 26] for i in range(SERIES_LENGTH)]
+    seq=[f"{l}{n}" for l,n in zip(seq_letters,numbers)]
+    letter=(start+step*SERIES_LENGTH) % 26
+    answer=f"{letters[letter]}{numbers[-1]}"
+    modulus=params[3] if rule in ("square_mod","fibonacci") else numbers[-1]+2
+    distractors=pick(near_misses(letter,numbers[-1],numbers[-2],modulus),rng)
 
     return build_question(
-        "Mixed Series (Alphanumeric)",
-        question,
+        TOPIC,
+        "Find next term:\n"+", ".join(seq)+", ?",
         answer,
         distractors,
-        "Alphabet + quadratic number pattern"
+        explain_rule(step,rule,params,answer),
+        {
+            "start":start,
+            "letter_step":step,
+            "rule":rule,
+            "params":params,
+            "letters":seq_letters,
+            "numbers":numbers[:-1],
+            "difficulty":difficulty(rule,step)
+        },
+        rng
     )
+
+def draw_series(n, rng):
+    """Parameters and terms for n series, minus the ambiguous ones."""
+    length=SERIES_LENGTH+1
+    start=rng.integers(0,26,n)
+    step=rng.choice(LETTER_STEPS,n)
+    rule=rng.integers(0,len(NUMBER_RULES),n)
+    a=rng.integers(0,10,n)
+    b=rng.integers(2,10,n)
+    c=1+(rng.random(n)*(b-1)).astype(np.int64)   # 1 <= c < b
+    k=rng.choice(MODULI,n)
+    nums=number_terms(np,rule,a,b,c,k,length)
+    keep=count_continuations(np,nums[:,:-1])==1
+    return [x[keep] for x in (start,step,rule,a,b,c,k,nums)]
+
+def generate_batch(n, rng=None):
+    """Generate n mixed-series questions; rng is a numpy.random.Generator."""
+    if np is None:
+        raise SystemExit("the batch series generator needs numpy (pip install numpy)")
+    if rng is None:
+        rng=np.random.default_rng()
+
+    # draw a little over what is still missing until the rejections are made up
+    parts=[]
+    missing=n
+    while missing>0:
+        part=draw_series(missing+missing//4+8,rng)
+        parts.append([x[:missing] for x in part])
+        missing-=len(parts[-1][0])
+    start,step,rule,a,b,c,k,nums=[np.concatenate(x) for x in zip(*parts)]
+
+    length=SERIES_LENGTH+1
+    i=np.arange(length)
+    letter_idx=(start[:,None]+step[:,None]*i) % 26
+    nums=number_terms(np,rule,a,b,c,k,length)
+
+    ans_letter=letter_idx[:,-1]
+    ans_num=nums[:,-1]
+    prev_num=nums[:,-2]
+    # near misses: letter one step off either way, or the number the rule
+    # gave one term earlier (bumped if it happens to equal the answer)
+    near_num=np.where(prev_num!=ans_num,prev_num,ans_num+1)
+    options_letter=np.stack([ans_letter,(ans_letter+1) % 26,ans_letter,(ans_letter+25) % 26],axis=1)
+    options_num=np.stack([ans_num,ans_num,near_num,ans_num],axis=1)
+
+    # place the answer: rotate the four options so column 0 lands on slot
+    slot=rng.integers(0,4,n)
+    perm=(np.arange(4)[None,:]-slot[:,None]) % 4
+    options_letter=np.take_along_axis(options_letter,perm,axis=1)
+    options_num=np.take_along_axis(options_num,perm,axis=1)
+
+    # every term is one of 26 * width letter/number strings: render that
+    # table once and index into it instead of formatting each term
+    width=int(max(nums.max(),options_num.max()))+1
+    table=np.array([f"{l}{m}" for l in letters for m in range(width)])
+    terms=table[letter_idx[:,:-1]*width+nums[:,:-1]].tolist()
+    codes=options_letter*width+options_num
+    opts=table[codes].tolist()
+    # the choices too, with their "A) " prefixes, one table per column
+    choices=np.stack([np.char.add(p,table)[codes[:,col]] for col,p in enumerate(CHOICE_PREFIXES)],axis=1).tolist()
+    term_letters=np.array(list(letters))[letter_idx[:,:-1]].tolist()
+    nums=nums[:,:-1].tolist()
+    params=np.stack([a,b,c,k],axis=1).tolist()
+    start,step,rule,slot=start.tolist(),step.tolist(),rule.tolist(),slot.tolist()
+
+    out=[]
+    for j in range(n):
+        options=opts[j]
+        name=NUMBER_RULES[rule[j]]
+        out.append(assemble_question(
+            TOPIC,
+            "Find next term:\n"+", ".join(terms[j])+", ?",
+            options,
+            slot[j],
+            explain_rule(step[j],name,params[j],options[slot[j]]),
+            {
+                "start":start[j],
+                "letter_step":step[j],
+                "rule":name,
+                "params":params[j],
+                "letters":term_letters[j],
+                "numbers":nums[j],
+                "difficulty":difficulty(name,step[j])
+            },
+            choices[j]
+        ))
+    return out
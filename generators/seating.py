@@ -1,66 +1,284 @@
+import os
 import random
-import itertools
+from collections import OrderedDict
 from core.formatter import build_question
+from core.distractors import pick, seat_pool
 
 PEOPLE = list("ABCDEFGH")
 
-def valid(perms, clue):
-    return [p for p in perms if clue(p)]
+COUNT_WORDS = {
+    5:"Five",6:"Six",7:"Seven",8:"Eight",9:"Nine",
+    10:"Ten",11:"Eleven",12:"Twelve"
+}
 
-def unique_solution(clues):
-    perms=list(itertools.permutations(PEOPLE))
-    for c in clues:
-        perms=valid(perms,c)
-    return len(perms)==1, perms[0] if len(perms)==1 else None
+# An arrangement set is tracked as a partial order: order[i] is the bitmask of
+# seats known to be left of seat i (transitively closed). The surviving
+# arrangements are exactly the linear extensions of that order.
+
+def empty_order(n):
+    return [0]*n
+
+def add_clue(order, a, b):
+    """
+    Narrow the order with "a sits left of b" (a, b are indices).
+    Returns the new order, or None if the clue contradicts it.
+    """
+    if order[a]>>b & 1:
+        return None
+    if order[b]>>a & 1:
+        return order
+
+    left=order[a] | (1<<a)
+    new=list(order)
+    for x in range(len(order)):
+        if x==b or order[x]>>b & 1:
+            new[x]|=left
+    return new
+
+def is_unique(order):
+    n=len(order)
+    return sum(bin(m).count("1") for m in order)==n*(n-1)//2
+
+def count_solutions(order):
+    """Number of linear extensions, by DP over the down-sets that can actually occur."""
+    n=len(order)
+    layer={0:1}
+    for _ in range(n):
+        nxt={}
+        for mask,w in layer.items():
+            for x in range(n):
+                if not mask>>x & 1 and order[x] & mask==order[x]:
+                    nxt[mask | 1<<x]=nxt.get(mask | 1<<x,0)+w
+        layer=nxt
+    return sum(layer.values())
+
+def first_extension(order):
+    """One arrangement (seat indices from the left) consistent with the order."""
+    n=len(order)
+    placed=0
+    out=[]
+    for _ in range(n):
+        x=next(x for x in range(n) if not placed>>x & 1 and order[x] & placed==order[x])
+        out.append(x)
+        placed|=1<<x
+    return out
+
+# Solving is memoized on the partial order itself, relabeled: seats are
+# sorted by (how many are known to their left, how many to their right),
+# ties broken by index, and the masks are rewritten in that numbering. An
+# entry holds the number of surviving arrangements and one witness
+# arrangement in that numbering.
+#
+# The relabeling is not a canonical form. Tied seats with the same seats on
+# either side can trade places without changing the order, so for them the
+# index is as good as any tie-break; other ties are not (A<B, C<D and
+# A<D, C<B get different keys). Such isomorphic orders cost a cache miss,
+# never a wrong answer, because a key spells out the whole relabeled order.
+# Refining the ties by the seats' neighbours would share those entries, but
+# it doubled the cost of every lookup for a few points of hit rate.
+
+def canonical_order(order):
+    """(canon, perm): the relabeled masks, and perm[r] = the seat renumbered r."""
+    n=len(order)
+    right=[0]*n
+    for x in range(n):
+        for y in range(n):
+            if order[x]>>y & 1:
+                right[y]+=1
+    perm=sorted(range(n),key=lambda x: (bin(order[x]).count("1"),right[x],x))
+    rank=[0]*n
+    for r,x in enumerate(perm):
+        rank[x]=r
+    masks=[]
+    for x in perm:
+        m=0
+        for y in range(n):
+            if order[x]>>y & 1:
+                m|=1<<rank[y]
+        masks.append(m)
+    return masks,perm
+
+# new cache entries are appended to the file in batches of this many
+FLUSH_EVERY=1000
+
+class SolutionCache:
+    """
+    LRU cache of relabeled order key -> (count, witness).
+
+    With a path, entries found in the file are loaded at start-up and new
+    ones are appended, one "key count witness" line each, every FLUSH_EVERY
+    entries and on flush(), so later runs reuse earlier work. A key is
+    written at most once per run; a file that still holds repeats (from
+    entries evicted and solved again in earlier runs) is compacted on load.
+    """
+
+    def __init__(self, maxsize=100000, path=None):
+        self.maxsize=maxsize
+        self.path=path
+        self.entries=OrderedDict()
+        self.pending=[]
+        self.saved=set()
+        self.stats={"hits":0,"misses":0,"evictions":0}
+        if path and os.path.exists(path):
+            lines=0
+            with open(path,"r",encoding="utf-8") as f:
+                for line in f:
+                    key,count,witness=line.split()
+                    self._store(key,(int(count),tuple(map(int,witness.split(",")))))
+                    self.saved.add(key)
+                    lines+=1
+            if lines>len(self.saved):
+                self.compact()
+
+    def compact(self):
+        """Rewrite the file with one line per key (the last one seen)."""
+        entries={}
+        with open(self.path,"r",encoding="utf-8") as f:
+            for line in f:
+                entries[line.split(" ",1)[0]]=line
+        tmp=self.path+".tmp"
+        with open(tmp,"w",encoding="utf-8") as f:
+            f.writelines(entries.values())
+        os.replace(tmp,self.path)
+
+    def read_only(self):
+        """Keep the loaded entries but never write to the file (for worker processes)."""
+        self.path=None
+        self.pending=[]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _store(self, key, value):
+        self.entries[key]=value
+        self.entries.move_to_end(key)
+        if len(self.entries)>self.maxsize:
+            self.entries.popitem(last=False)
+            self.stats["evictions"]+=1
+
+    def get(self, key):
+        value=self.entries.get(key)
+        if value is None:
+            self.stats["misses"]+=1
+            return None
+        self.stats["hits"]+=1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._store(key,value)
+        if self.path and key not in self.saved:
+            self.saved.add(key)
+            self.pending.append(f"{key} {value[0]} {','.join(map(str,value[1]))}\n")
+            if len(self.pending)>=FLUSH_EVERY:
+                self.flush()
+
+    def hit_rate(self):
+        lookups=self.stats["hits"]+self.stats["misses"]
+        return self.stats["hits"]/lookups if lookups else 0.0
+
+    def report(self):
+        return dict(self.stats,size=len(self.entries),hit_rate=round(self.hit_rate(),4))
+
+    def flush(self):
+        if self.path and self.pending:
+            os.makedirs(os.path.dirname(self.path) or ".",exist_ok=True)
+            with open(self.path,"a",encoding="utf-8") as f:
+                f.writelines(self.pending)
+        self.pending=[]
+
+# shared by generate() and unique_solution() unless a cache is passed in
+CACHE=SolutionCache()
+
+def solve(order, cache=None):
+    """(number of arrangements, one arrangement as seat indices from the left)."""
+    cache=CACHE if cache is None else cache
+    canon,perm=canonical_order(order)
+    key=",".join(map(str,canon))
+    hit=cache.get(key)
+    if hit is None:
+        hit=(count_solutions(canon),tuple(first_extension(canon)))
+        cache.put(key,hit)
+    count,witness=hit
+    return count,[perm[r] for r in witness]
+
+def solution_of(order, people=PEOPLE):
+    return tuple(p for _,p in sorted(zip(order,people),key=lambda t: bin(t[0]).count("1")))
+
+def build_order(clues, people=PEOPLE):
+    index={p:i for i,p in enumerate(people)}
+    order=empty_order(len(people))
+    for a,b in clues:
+        order=add_clue(order,index[a],index[b])
+        if order is None:
+            return None
+    return order
+
+def unique_solution(clues, people=PEOPLE, cache=None):
+    order=build_order(clues,people)
+    if order is None:
+        return False, None
+    count,witness=solve(order,cache)
+    if count!=1:
+        return False, None
+    return True, tuple(people[x] for x in witness)
+
+def difficulty(arrangements):
+    """
+    Retained clues, plus log2 of the arrangements still open halfway through
+    them: the more the last clues have to cut, the longer the solver keeps
+    several branches alive.
+    """
+    return len(arrangements)+arrangements[len(arrangements)//2].bit_length()-1
+
+def generate(rng=random, people=PEOPLE, cache=None):
+    n=len(people)
+    index={p:i for i,p in enumerate(people)}
 
-def generate():
     # Step 1: create hidden truth
-    solution=random.sample(PEOPLE,8)
-
-    # Step 2: create many clues
-    clues=[]
-    text_clues=[]
-
-    for _ in range(25):
-        a,b=random.sample(PEOPLE,2)
-        if solution.index(a)<solution.index(b):
-            clues.append(lambda p,a=a,b=b: p.index(a)<p.index(b))
-            text_clues.append(f"{a} sits to the left of {b}")
-        else:
-            clues.append(lambda p,a=a,b=b: p.index(a)>p.index(b))
-            text_clues.append(f"{a} sits to the right of {b}")
-
-    # Step 3: reduce clues while uniqueness preserved
+    solution=rng.sample(people,n)
+
+    # Step 2: draw clues, keeping each one that narrows the arrangements,
+    # until only the hidden arrangement is left
+    order=empty_order(n)
     selected=[]
-    selected_text=[]
+    arrangements=[]
 
-    for c,t in zip(clues,text_clues):
-        temp=selected+[c]
-        ok,_=unique_solution(temp)
-        if ok:
-            selected.append(c)
-            selected_text.append(t)
+    while not arrangements or arrangements[-1]>1:
+        a,b=rng.sample(people,2)
+        left,right=(a,b) if solution.index(a)<solution.index(b) else (b,a)
+        temp=add_clue(order,index[left],index[right])
+        if temp==order:
+            continue
+        order=temp
+        selected.append((a,"left" if left==a else "right",b))
+        arrangements.append(solve(order,cache)[0])
 
     # ask question
-    ask=random.choice(PEOPLE)
+    ask=rng.choice(people)
     pos=solution.index(ask)+1
 
-    question="Eight persons sit in a row.\n"
-    question+="\n".join(selected_text)
+    question=f"{COUNT_WORDS[n]} persons sit in a row.\n"
+    question+="\n".join(f"{a} sits to the {d} of {b}" for a,d,b in selected)
     question+=f"\nWhat is the position of {ask} from the left?"
 
     correct=str(pos)
 
-    all_positions=[str(i) for i in range(1,9)]
-    distractors=[p for p in all_positions if p!=correct]
-    random.shuffle(distractors)
-    distractors=distractors[:3]
-
+    distractors=pick(seat_pool(n,pos),rng)
 
     return build_question(
         "Seating Arrangements (Linear, Circular)",
         question,
         correct,
         distractors,
-        "Uniquely determined arrangement"
+        "Uniquely determined arrangement",
+        {
+            "people":"".join(people),
+            "solution":"".join(solution),
+            "clues":[list(s) for s in selected],
+            "arrangements":arrangements,
+            "ask":ask,
+            "difficulty":difficulty(arrangements)
+        },
+        rng
     )
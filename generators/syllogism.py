@@ -1,22 +1,123 @@
 import random
 from core.formatter import build_question
+from core.distractors import pick
+from core.question_parser import render_proposition
+from generators import venn
 
 TERMS=["A","B","C","D","E","F","G"]
 
-def generate():
-    A,B,C,D=random.sample(TERMS,4)
+# (quantifier, negated); "Some ... not" premises are rarer in exam sets
+PREMISE_FORMS=[("All",False)]*3+[("Some",False)]*3+[("No",False)]*2+[("Some",True)]
+CONCLUSION_FORMS=[("All",False),("Some",False),("No",False),("Some",True)]
 
-    statements=[
-        f"All {A} are {B}",
-        f"Some {B} are {C}",
-        f"No {C} are {D}",
-        f"All {D} are {A}"
+# complementary pairs: exactly one of the two holds in any diagram
+COMPLEMENTS={("Some",False):("No",False),("No",False):("Some",False),
+             ("All",False):("Some",True),("Some",True):("All",False)}
+
+# the three verdicts closest to each answer, used as distractors
+SIBLINGS={
+    venn.ANSWERS["both"]:[venn.ANSWERS["first"],venn.ANSWERS["second"],venn.ANSWERS["either"]],
+    venn.ANSWERS["first"]:[venn.ANSWERS["second"],venn.ANSWERS["both"],venn.ANSWERS["neither"]],
+    venn.ANSWERS["second"]:[venn.ANSWERS["first"],venn.ANSWERS["both"],venn.ANSWERS["neither"]],
+    venn.ANSWERS["either"]:[venn.ANSWERS["neither"],venn.ANSWERS["both"],venn.ANSWERS["first"]],
+    venn.ANSWERS["neither"]:[venn.ANSWERS["either"],venn.ANSWERS["first"],venn.ANSWERS["second"]],
+}
+# every other verdict, the siblings first
+VERDICT_POOLS={
+    answer:tuple(sibs+[a for a in venn.ANSWERS.values() if a!=answer and a not in sibs])
+    for answer,sibs in SIBLINGS.items()
+}
+
+def sample_premises(names, rng=random):
+    """A chain of premises linking consecutive terms, in random direction."""
+    premises=[]
+    for x,y in zip(names,names[1:]):
+        quant,neg=rng.choice(PREMISE_FORMS)
+        if rng.random()<0.5:
+            x,y=y,x
+        premises.append((quant,x,neg,y))
+    return premises
+
+def sample_conclusions(names, rng=random):
+    a,b=rng.sample(names,2)
+    form=rng.choice(CONCLUSION_FORMS)
+    first=(form[0],a,form[1],b)
+    if rng.random()<0.3:
+        quant,neg=COMPLEMENTS[form]
+        second=(quant,a,neg,b)
+    else:
+        c,d=rng.sample(names,2)
+        quant,neg=rng.choice(CONCLUSION_FORMS)
+        second=(quant,c,neg,d)
+    if first[1:]==second[1:] and first[0]==second[0]:
+        return None
+    return [first,second]
+
+def difficulty(premises, verdicts, either_or, witnesses):
+    """
+    Premise count, plus one per settled conclusion that no single premise
+    settles (it needs a chain through the middle terms), plus one for an
+    either-or pair.
+    """
+    chained=sum(w is None and v!=venn.UNCERTAIN for v,w in zip(verdicts,witnesses))
+    return len(premises)+chained+either_or
+
+def generate(rng=random, max_tries=50):
+    for _ in range(max_tries):
+        names=rng.sample(TERMS,rng.choice((3,4)))
+        premises=sample_premises(names,rng)
+        conclusions=sample_conclusions(names,rng)
+        if conclusions is None:
+            continue
+        consistent,verdicts,either_or,witnesses=venn.analyse(premises,conclusions)
+        if consistent:
+            break
+    else:
+        return generate_fixed(rng)
+
+    correct=venn.answer_for(verdicts,either_or)
+    derivation=venn.derivation(premises,conclusions)
+
+    question="Statements:\n"+"\n".join(render_proposition(p) for p in premises)
+    question+="\nConclusions:\n"+"\n".join(f"{n}. {render_proposition(c)}" for n,c in zip(("I","II"),conclusions))
+
+    payload={
+        "terms":names,
+        "premises":[list(p) for p in premises],
+        "conclusions":[list(c) for c in conclusions],
+        "verdicts":list(verdicts),
+        "derivation":derivation,
+        "difficulty":difficulty(premises,verdicts,either_or,witnesses)
+    }
+
+    return build_question("Syllogisms",question,correct,pick(VERDICT_POOLS[correct],rng),
+                          " ".join(derivation),payload,rng)
+
+def generate_fixed(rng=random):
+    """The original single-conclusion template, kept as a fallback."""
+    A,B,C,D=rng.sample(TERMS,4)
+
+    premises=[
+        ("All",A,False,B),
+        ("Some",B,False,C),
+        ("No",C,False,D),
+        ("All",D,False,A)
     ]
+    conclusion=("Some",B,True,D)
+
+    statements=[render_proposition(p) for p in premises]
 
-    question="Statements:\n"+"\n".join(statements)+"\nConclusion: Some "+B+" are not "+D
+    question="Statements:\n"+"\n".join(statements)+"\nConclusion: "+render_proposition(conclusion)
 
     correct="Follows"
 
     distractors=["Does not follow","Possibly follows","None"]
 
-    return build_question("Syllogisms",question,correct,distractors,"Set contradiction reasoning")
+    payload={
+        "terms":[A,B,C,D],
+        "premises":[list(p) for p in premises],
+        "conclusion":list(conclusion),
+        "difficulty":len(premises)+1
+    }
+
+    return build_question("Syllogisms",question,correct,distractors,"Set contradiction reasoning",payload,rng)
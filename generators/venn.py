@@ -0,0 +1,174 @@
+from functools import lru_cache
+
+from core.question_parser import render_proposition
+
+# Exact syllogism evaluation over Venn regions.
+#
+# With k terms there are 2^k regions; region r lies inside term t iff bit t
+# of r is set. A set of regions is itself a bitmask over the 2^k regions.
+# Universal statements ("All", "No") rule regions out; existential ones
+# ("Some", "Some ... not") and the assumption that every term is non-empty
+# require at least one region of a given set to be occupied. Because
+# occupying extra allowed regions never breaks an existential constraint,
+# every question below reduces to a few mask intersections; no diagram has
+# to be enumerated.
+#
+# Propositions use the parser's tuple form (quantifier, a, negated, b).
+
+FOLLOWS, CONTRADICTED, UNCERTAIN = "follows", "contradicted", "uncertain"
+
+
+def term_masks(k):
+    """masks[t] = set of regions inside term t."""
+    return [sum(1 << r for r in range(1 << k) if r >> t & 1) for t in range(k)]
+
+
+def proposition_constraint(prop, masks, full):
+    """('U', regions that must be empty) or ('E', regions of which one must be occupied)."""
+    quant, a, neg, b = prop
+    inside_a, inside_b = masks[a], masks[b]
+    if quant == "All":
+        return "U", inside_a & (full ^ inside_b)
+    if quant == "No":
+        return "U", inside_a & inside_b
+    if neg:
+        return "E", inside_a & (full ^ inside_b)
+    return "E", inside_a & inside_b
+
+
+def satisfiable(allowed, needs):
+    return all(n & allowed for n in needs)
+
+
+@lru_cache(maxsize=None)
+def analyse_shape(k, premises, conclusions):
+    """
+    Verdicts for a canonical shape (terms are 0..k-1). Cached, so each shape
+    is solved once per process.
+
+    Returns (consistent, verdicts, either_or, witnesses) where witnesses[i]
+    is the index of the premise that forces conclusion i true or false
+    (-1 for "every term is non-empty", None if no single premise does).
+    """
+    masks = term_masks(k)
+    full = (1 << (1 << k)) - 1
+    allowed = full
+    needs = []
+    need_source = []
+    for i, p in enumerate(premises):
+        kind, m = proposition_constraint(p, masks, full)
+        if kind == "U":
+            allowed &= ~m
+        else:
+            needs.append(m)
+            need_source.append(i)
+    needs += masks
+    need_source += [-1]*k
+    allowed &= full
+
+    if not satisfiable(allowed, needs):
+        return False, (), False, ()
+
+    def forced_by(region_set):
+        # a requirement whose allowed regions all fall in region_set
+        for n, src in zip(needs, need_source):
+            if n & allowed and not (n & allowed) & ~region_set:
+                return src
+        return None
+
+    verdicts = []
+    witnesses = []
+    for c in conclusions:
+        kind, m = proposition_constraint(c, masks, full)
+        if kind == "U":
+            can_be_true = satisfiable(allowed & ~m, needs)
+            can_be_false = bool(m & allowed)
+            witness = None if can_be_true else forced_by(m)
+        else:
+            can_be_true = bool(m & allowed)
+            can_be_false = satisfiable(allowed & ~m, needs)
+            witness = None if can_be_false else forced_by(m)
+        verdicts.append(FOLLOWS if not can_be_false else CONTRADICTED if not can_be_true else UNCERTAIN)
+        witnesses.append(witness)
+
+    # either-or: both uncertain, yet no diagram makes both false
+    either_or = False
+    if len(conclusions) == 2 and verdicts == [UNCERTAIN, UNCERTAIN]:
+        rest = allowed
+        universals = []
+        for c in conclusions:
+            kind, m = proposition_constraint(c, masks, full)
+            if kind == "E":
+                rest &= ~m
+            else:
+                universals.append(m)
+        either_or = not (satisfiable(rest, needs) and all(u & rest for u in universals))
+
+    return True, tuple(verdicts), either_or, tuple(witnesses)
+
+
+def canonical_shape(premises, conclusions):
+    """Relabel terms by first appearance: (k, premises, conclusions, names)."""
+    index = {}
+    def relabel(p):
+        quant, a, neg, b = p
+        return quant, index.setdefault(a, len(index)), bool(neg), index.setdefault(b, len(index))
+    ps = tuple(relabel(p) for p in premises)
+    cs = tuple(relabel(c) for c in conclusions)
+    return len(index), ps, cs, list(index)
+
+
+def analyse(premises, conclusions):
+    k, ps, cs, names = canonical_shape(premises, conclusions)
+    return analyse_shape(k, ps, cs)
+
+
+ANSWERS = {
+    "both":"Both I and II follow",
+    "first":"Only I follows",
+    "second":"Only II follows",
+    "either":"Either I or II follows",
+    "neither":"Neither I nor II follows",
+}
+
+
+def answer_for(verdicts, either_or):
+    first, second = (v == FOLLOWS for v in verdicts)
+    if first and second:
+        return ANSWERS["both"]
+    if first:
+        return ANSWERS["first"]
+    if second:
+        return ANSWERS["second"]
+    return ANSWERS["either"] if either_or else ANSWERS["neither"]
+
+
+def derivation(premises, conclusions):
+    """Reasoning lines for each conclusion, read off the region analysis."""
+    consistent, verdicts, either_or, witnesses = analyse(premises, conclusions)
+    if not consistent:
+        return ["The premises cannot all hold at once."]
+    labels = ["I", "II"] if len(conclusions) == 2 else [""]*len(conclusions)
+    lines = []
+    for label, c, v, w in zip(labels, conclusions, verdicts, witnesses):
+        name = f"Conclusion {label} ({render_proposition(c)})" if label else f"'{render_proposition(c)}'"
+        if w is None:
+            why = ""
+        else:
+            source = "every term being non-empty" if w == -1 else f"'{render_proposition(premises[w])}'"
+            why = f" because {source} guarantees {'it' if v == FOLLOWS else 'a counterexample'}"
+        if v == FOLLOWS:
+            if why:
+                lines.append(f"{name} holds in every diagram consistent with the premises{why}, so it follows.")
+            else:
+                lines.append(f"{name} holds in every diagram consistent with the premises: the premises rule out every case that would falsify it, so it follows.")
+        elif v == CONTRADICTED:
+            if why:
+                lines.append(f"{name} is false in every diagram consistent with the premises{why}, so it does not follow.")
+            else:
+                lines.append(f"{name} is false in every diagram consistent with the premises: the premises rule out every case that would make it true, so it does not follow.")
+        else:
+            lines.append(f"{name} is possible but not certain: some diagrams allowed by the premises make it true and others make it false.")
+    if either_or:
+        lines.append("Neither is certain on its own, but every diagram satisfies at least one of them, so either I or II follows.")
+    return lines
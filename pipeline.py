@@ -0,0 +1,256 @@
+import argparse
+import functools
+import json
+import multiprocessing as mp
+import os
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+
+from generate_dataset import generate_record, code_version, parse_topic_args
+from expand_dataset_explanations import expand_record
+from prepare_training_data import (
+    OUTPUT_FILE, FORMATS, COMPRESSIONS, SUFFIXES, build_conversation, render_item, frame, open_output
+)
+from core.prompts import SKILLBANK_FILE
+
+# Fused generate -> explain -> render pipeline.
+#
+#   python pipeline.py --count 100000 --seed 7 --workers generate=6 --output dataset/train.jsonl --format jsonl
+#
+# Each stage is a pool of worker processes reading chunks of records from a
+# bounded queue and writing to the next one; the parent feeds chunk ranges
+# in and writes the rendered chunks out in order. The stage functions are
+# the existing ones: generate_dataset.generate_record,
+# expand_dataset_explanations.expand_record and
+# prepare_training_data.build_conversation / render_item, so the output is
+# the same as generating a seeded run into an empty store, expanding it and
+# exporting it, without the intermediate files.
+#
+# Per stage, workers record the time spent working (busy), waiting for input
+# (starved) and waiting for room downstream (blocked). A stage that is
+# mostly blocked is outpacing the stage after it; one that is mostly busy
+# and whose upstream is blocked is the bottleneck and wants more workers.
+
+STAGES = ("generate", "explain", "render")
+CHUNK_SIZE = 256
+QUEUE_SIZE = 8  # chunks per queue
+
+
+def generate_chunk(task):
+    seed, start, stop = task
+    return [generate_record(seed, i) for i in range(start, stop)]
+
+
+def explain_chunk(records):
+    for q, a in records:
+        expand_record(q, a)
+    return records
+
+
+def render_chunk(records, fmt="json", skills=None):
+    return [render_item(build_conversation(q, a, skills), fmt) for q, a in records]
+
+
+def stage_worker(name, fn, inbox, outbox, errors, stats):
+    busy = starved = blocked = 0.0
+    items = 0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            task = inbox.get()
+            t1 = time.perf_counter()
+            starved += t1 - t0
+            if task is None:
+                break
+            seq, chunk = task
+            out = fn(chunk)
+            t2 = time.perf_counter()
+            busy += t2 - t1
+            outbox.put((seq, out))
+            blocked += time.perf_counter() - t2
+            items += len(out)
+    except Exception:
+        errors.put((None, f"{name} worker failed:\n{traceback.format_exc()}"))
+    stats.put((name, busy, starved, blocked, items))
+
+
+def default_workers():
+    cpus = os.cpu_count() or 1
+    return {"generate": max(1, cpus - 2), "explain": 1, "render": 1}
+
+
+def run_pipeline(output_file=OUTPUT_FILE, count=1000, seed=0, workers=None, fmt="json", compression="none",
+                 skills=None, chunk_size=CHUNK_SIZE, queue_size=QUEUE_SIZE):
+    """
+    Generate `count` records of run `seed` and write them as training
+    conversations. workers maps a stage name to its pool size (defaults from
+    default_workers()). Returns the run report.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}, got {fmt!r}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {COMPRESSIONS}, got {compression!r}")
+    pools = default_workers()
+    for name, n in (workers or {}).items():
+        if name not in STAGES:
+            raise ValueError(f"unknown stage {name!r}; expected one of {STAGES}")
+        pools[name] = max(1, n)
+
+    suffix = SUFFIXES.get(compression, "")
+    if suffix and not output_file.endswith(suffix):
+        output_file += suffix
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_file + ".tmp"
+
+    fns = {
+        "generate": generate_chunk,
+        "explain": explain_chunk,
+        "render": functools.partial(render_chunk, fmt=fmt, skills=skills),
+    }
+    queues = [mp.Queue(queue_size) for _ in range(len(STAGES) + 1)]
+    stats = mp.Queue()
+    procs = []
+    for k, name in enumerate(STAGES):
+        ps = [
+            mp.Process(target=stage_worker, args=(name, fns[name], queues[k], queues[k + 1], queues[-1], stats),
+                       daemon=True)
+            for _ in range(pools[name])
+        ]
+        for p in ps:
+            p.start()
+        procs.append(ps)
+
+    feeder = {"blocked": 0.0}
+
+    def feed():
+        # chunk ranges in, then shut the stages down in order: a stage gets
+        # its stop sentinels once every worker of the stage before has exited
+        for seq, start in enumerate(range(0, count, chunk_size)):
+            t = time.perf_counter()
+            queues[0].put((seq, (seed, start, min(count, start + chunk_size))))
+            feeder["blocked"] += time.perf_counter() - t
+        for k, ps in enumerate(procs):
+            for _ in ps:
+                queues[k].put(None)
+            for p in ps:
+                p.join()
+        queues[-1].put(None)
+
+    t0 = time.perf_counter()
+    threading.Thread(target=feed, daemon=True).start()
+
+    writer = {"busy": 0.0, "starved": 0.0}
+    written = 0
+
+    def ordered():
+        # chunks finish out of order; hold them until their turn
+        nonlocal written
+        pending = {}
+        next_seq = 0
+        while True:
+            t = time.perf_counter()
+            item = queues[-1].get()
+            writer["starved"] += time.perf_counter() - t
+            if item is None:
+                break
+            seq, chunk = item
+            if seq is None:
+                raise RuntimeError(chunk)
+            pending[seq] = chunk
+            while next_seq in pending:
+                chunk = pending.pop(next_seq)
+                next_seq += 1
+                written += len(chunk)
+                yield from chunk
+        if pending:
+            raise RuntimeError(f"pipeline ended with {len(pending)} chunks out of order")
+
+    try:
+        with open_output(tmp, compression) as f:
+            items = ordered()
+            for piece in frame(items, fmt):
+                t = time.perf_counter()
+                f.write(piece)
+                writer["busy"] += time.perf_counter() - t
+    except BaseException:
+        for p in (p for ps in procs for p in ps):
+            p.terminate()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, output_file)
+    wall = time.perf_counter() - t0
+
+    per_stage = {name: {"workers": pools[name], "items": 0, "busy_seconds": 0.0,
+                        "starved_seconds": 0.0, "blocked_seconds": 0.0} for name in STAGES}
+    for _ in range(sum(pools.values())):
+        name, busy, starved, blocked, items = stats.get()
+        st = per_stage[name]
+        st["items"] += items
+        st["busy_seconds"] += busy
+        st["starved_seconds"] += starved
+        st["blocked_seconds"] += blocked
+    for st in per_stage.values():
+        st["utilization"] = round(st["busy_seconds"] / (st["workers"] * wall), 4) if wall else 0.0
+        for key in ("busy_seconds", "starved_seconds", "blocked_seconds"):
+            st[key] = round(st[key], 4)
+
+    return {
+        "output": output_file,
+        "records": written,
+        "seed": seed,
+        "version": code_version(),
+        "seconds": round(wall, 4),
+        "records_per_sec": round(written / wall, 1) if wall else None,
+        "feeder_blocked_seconds": round(feeder["blocked"], 4),
+        "writer": {"busy_seconds": round(writer["busy"], 4), "starved_seconds": round(writer["starved"], 4)},
+        "stages": per_stage,
+    }
+
+
+def print_report(report, out=sys.stdout):
+    print(f"{report['records']} records → {report['output']} in {report['seconds']}s "
+          f"({report['records_per_sec']} records/sec)", file=out)
+    print(f"{'stage':<10}{'workers':>8}{'busy s':>10}{'starved s':>11}{'blocked s':>11}{'util':>7}", file=out)
+    for name, st in report["stages"].items():
+        print(f"{name:<10}{st['workers']:>8}{st['busy_seconds']:>10}{st['starved_seconds']:>11}"
+              f"{st['blocked_seconds']:>11}{st['utilization']:>7.0%}", file=out)
+    print(f"{'writer':<10}{1:>8}{report['writer']['busy_seconds']:>10}{report['writer']['starved_seconds']:>11}"
+          f"{'':>11}{'':>7}", file=out)
+    print(f"feeder blocked {report['feeder_blocked_seconds']}s", file=out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate, explain and export training data in one streaming pass")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None, help="run seed (random if omitted)")
+    parser.add_argument("--workers", action="append", default=[], metavar="STAGE=N",
+                        help="pool size per stage (stages: " + ", ".join(STAGES) + "; "
+                             "default generate=cpus-2, explain=1, render=1)")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    parser.add_argument("--skills", nargs="?", const=SKILLBANK_FILE, default=None, metavar="SKILLBANK",
+                        help=f"add a system prompt with the topic's skills (default skillbank: {SKILLBANK_FILE})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="records per queue item")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="chunks each queue holds")
+    parser.add_argument("--report", default=None, help="write the run report as JSON here")
+    args = parser.parse_args()
+
+    seed = args.seed
+    if seed is None:
+        import random
+        seed = random.randrange(2**32)
+    report = run_pipeline(
+        args.output, args.count, seed, parse_topic_args(args.workers, int), args.format, args.compression,
+        args.skills, args.chunk_size, args.queue_size
+    )
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
@@ -1,22 +1,44 @@
 import json
+import os
+import gzip
+import io
+import argparse
+from itertools import zip_longest
 from pathlib import Path
 
+from core.file_manager import iter_json_array, iter_records
+from core.prompts import SKILLBANK_FILE, solve_prompt, system_prompt
+from core.dataset import Dataset, DIFFICULTY_BUCKETS, stratified_sample
+from core.lengths import (
+    TOKENIZERS, load_tokenizer, bucketed_order, greedy_pack, padding_efficiency, write_sidecar
+)
+
 QUESTIONS_FILE = "dataset/questions.json"
 ANSWERS_FILE = "dataset/answers.json"
+QUESTIONS_STORE = "dataset/store/questions"
+ANSWERS_STORE = "dataset/store/answers"
 OUTPUT_FILE = "dataset/train_sharegpt.json"
 
+# json: indented JSON array (the original layout), compact: one-line JSON array,
+# jsonl: one conversation per line
+FORMATS = ("json", "compact", "jsonl")
+COMPRESSIONS = ("none", "gzip", "zstd")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# generation: input order; bucketed: batches of similar length;
+# packed: records of the form {"pack": [conversation, ...]} holding up to
+# --max-length tokens of whole conversations. They stay separate so the
+# trainer can reset attention and loss at each boundary (e.g. restart
+# position_ids per conversation) instead of conditioning one answer on
+# unrelated earlier ones.
+ORDERS = ("generation", "bucketed", "packed")
+# match the training notebook
+MAX_SEQ_LENGTH = 1024
+BATCH_SIZE = 16
+
 
 def build_user_prompt(q):
-    choices = "\n".join(q["choices"])
-
-    prompt = (
-        "Solve the following multiple choice reasoning question.\n\n"
-        f"{q['question']}\n\n"
-        f"Choices:\n{choices}\n\n"
-        "Respond ONLY in JSON format:\n"
-        '{ "answer": "A/B/C/D", "reasoning": "short explanation" }'
-    )
-    return prompt
+    return solve_prompt(q)
 
 
 def build_assistant_response(a):
@@ -26,33 +48,289 @@ def build_assistant_response(a):
     }, ensure_ascii=False)
 
 
-def main():
+def build_conversation(q, a, skills=None):
+    """skills: skillbank path; adds the answer-agent system prompt with that topic's skills."""
+    conversation = [
+        {"role":"user","content":build_user_prompt(q)},
+        {"role":"assistant","content":build_assistant_response(a)}
+    ]
+    if skills:
+        conversation.insert(0, {"role":"system","content":system_prompt(q["topic"], "answer", skills)})
+    return {"conversations":conversation}
+
+
+def default_from_store():
+    """
+    Read the stores once generation has created them: new records go only
+    there, and questions.json/answers.json are --export snapshots.
+    """
+    return os.path.isdir(QUESTIONS_STORE)
+
+
+def iter_pairs(questions, answers):
+    """Walk question/answer iterators in lockstep, failing if one runs out first."""
+    missing = object()
+    for q, a in zip_longest(questions, answers, fillvalue=missing):
+        assert q is not missing and a is not missing, "Mismatch Q/A"
+        yield q, a
+
+
+def iter_conversations(from_store=None, skills=None, sources=None):
+    """
+    sources: optional (questions, answers) JSON array paths overriding the
+    dataset files; from_store defaults to default_from_store().
+    """
+    if from_store is None:
+        from_store = default_from_store()
+    if sources:
+        questions, answers = iter_json_array(sources[0]), iter_json_array(sources[1])
+    elif from_store:
+        questions, answers = iter_records(QUESTIONS_STORE), iter_records(ANSWERS_STORE)
+    else:
+        questions, answers = iter_json_array(QUESTIONS_FILE), iter_json_array(ANSWERS_FILE)
+    for q, a in iter_pairs(questions, answers):
+        yield build_conversation(q, a, skills)
+
+
+class StoreConversations:
+    """
+    Conversations built on demand from the question/answer stores, by
+    record number; rows optionally restricts them to a list of record numbers.
+    """
+
+    def __init__(self, skills=None, rows=None):
+        self.questions, self.answers = Dataset(QUESTIONS_STORE), Dataset(ANSWERS_STORE)
+        assert len(self.questions) == len(self.answers), "Mismatch Q/A"
+        if rows is not None:
+            self.questions, self.answers = self.questions.select(rows), self.answers.select(rows)
+        self.skills = skills
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, i):
+        return build_conversation(self.questions[i], self.answers[i], self.skills)
+
+    def __iter__(self):
+        for q, a in zip(self.questions, self.answers):
+            yield build_conversation(q, a, self.skills)
+
+
+# (opening, between records, closing, empty output) of each format; "json"
+# matches json.dump(records, f, indent=2)
+FRAMES = {
+    "json": ("[\n  ", ",\n  ", "\n]", "[]"),
+    "compact": ("[", ",", "]", "[]"),
+    "jsonl": ("", "", "", ""),
+}
+
+
+def render_item(c, fmt):
+    """One conversation as it appears in the output, without separators."""
+    if fmt == "json":
+        return json.dumps(c, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+    if fmt == "compact":
+        return json.dumps(c, ensure_ascii=False)
+    return json.dumps(c, ensure_ascii=False) + "\n"
 
-    questions = json.load(open(QUESTIONS_FILE))
-    answers   = json.load(open(ANSWERS_FILE))
 
-    assert len(questions)==len(answers), "Mismatch Q/A"
+def frame(items, fmt):
+    """Join rendered items (see render_item) into the output format."""
+    opening, between, closing, empty = FRAMES[fmt]
+    first = True
+    for item in items:
+        yield (opening if first else between) + item
+        first = False
+    yield empty if first else closing
 
-    conversations=[]
 
-    for q,a in zip(questions,answers):
+def render(conversations, fmt):
+    return frame((render_item(c, fmt) for c in conversations), fmt)
 
-        user = build_user_prompt(q)
-        assistant = build_assistant_response(a)
 
-        conversations.append({
-            "conversations":[
-                {"role":"user","content":user},
-                {"role":"assistant","content":assistant}
-            ]
-        })
+def open_output(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd output needs the 'zstandard' package (pip install zstandard)")
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
 
-    Path("dataset").mkdir(exist_ok=True)
 
-    with open(OUTPUT_FILE,"w",encoding="utf-8") as f:
-        json.dump(conversations,f,indent=2,ensure_ascii=False)
+def arrange(conversations, order, tokenizer, max_length, batch_size, seed):
+    """
+    Count tokens and put the conversations in the requested order.
+    conversations is a list or a StoreConversations; it is iterated once for
+    the lengths and then indexed in output order.
+    Returns (records iterable, lengths per input record, output order or None, report).
+    """
+    length = load_tokenizer(tokenizer)
+    lengths = [length(c["conversations"]) for c in conversations]
+    report = {
+        "tokenizer": tokenizer,
+        "order": order,
+        "max_length": max_length,
+        "batch_size": batch_size,
+        "samples": len(lengths),
+        "tokens": sum(lengths),
+        "overlong": sum(n > max_length for n in lengths),
+        "padding_efficiency_generation": round(padding_efficiency(lengths, batch_size), 4),
+    }
+
+    if order == "generation":
+        out_order = None
+        records = conversations
+        out_lengths = lengths
+    elif order == "bucketed":
+        out_order = [[i] for i in bucketed_order(lengths, batch_size, seed)]
+        records = (conversations[i] for i, in out_order)
+        out_lengths = [lengths[i] for i, in out_order]
+    else:
+        out_order = greedy_pack(lengths, max_length, seed)
+        records = ({"pack": [conversations[i] for i in pack]} for pack in out_order)
+        out_lengths = [sum(lengths[i] for i in pack) for pack in out_order]
+        report["packs"] = len(out_order)
+        room = sum(max(n, max_length) for n in out_lengths)
+        report["pack_fill"] = round(report["tokens"] / room, 4) if room else 1.0
+
+    report["padding_efficiency"] = round(padding_efficiency(out_lengths, batch_size), 4)
+    return records, lengths, out_order, report
+
+
+def export(output_file=OUTPUT_FILE, fmt="json", compression="none", from_store=None, skills=None,
+           order="generation", tokenizer=None, max_length=MAX_SEQ_LENGTH, batch_size=BATCH_SIZE, seed=0,
+           sources=None, sample=None, stratify="difficulty", buckets=DIFFICULTY_BUCKETS, curriculum=False):
+    """
+    Stream conversations to output_file one record at a time.
+
+    Memory stays at one record regardless of dataset size. The output is
+    written to a temp file and renamed, so a Q/A mismatch or crash never
+    leaves a truncated file behind.
+
+    With a tokenizer (or an order other than "generation") the token count
+    of every conversation goes to a sidecar index next to the output and a
+    length report is returned. Reordering and packing hold the lengths and
+    the output order in memory; records are read back by number from the
+    store, while JSON array sources are loaded whole. from_store defaults to
+    default_from_store().
+
+    sample draws that many records from the store instead of exporting all
+    of them, in equal shares per topic or per (topic, difficulty bucket)
+    (stratify), using the store's precomputed index; curriculum orders the
+    sample from the easiest bucket to the hardest.
+    Returns (records written, output path, report or None).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}, got {fmt!r}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"compression must be one of {COMPRESSIONS}, got {compression!r}")
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {ORDERS}, got {order!r}")
+
+    if from_store is None:
+        from_store = default_from_store()
+
+    suffix = SUFFIXES.get(compression, "")
+    if suffix and not output_file.endswith(suffix):
+        output_file += suffix
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_file + ".tmp"
+
+    report = None
+    rows = None
+    if sample is not None:
+        if not from_store or sources:
+            raise ValueError("sampling needs the store index; use from_store")
+        if curriculum and order != "generation":
+            raise ValueError("a curriculum sample keeps its own order; use order='generation'")
+        rows, cells = stratified_sample(Dataset(QUESTIONS_STORE), sample, stratify, buckets, curriculum, seed)
+        report = {"sample": {"records": len(rows), "stratify": stratify, "buckets": buckets,
+                             "curriculum": curriculum,
+                             "cells": {" / ".join(map(str, c)) if isinstance(c, tuple) else c: n
+                                       for c, n in cells.items()}}}
+        conversations = iter(StoreConversations(skills, rows))
+    else:
+        conversations = iter_conversations(from_store, skills, sources)
+
+    if tokenizer or order != "generation":
+        tokenizer = tokenizer or "whitespace"
+        source = StoreConversations(skills, rows) if from_store and not sources else list(conversations)
+        conversations, lengths, out_order, lengths_report = arrange(
+            source, order, tokenizer, max_length, batch_size, seed
+        )
+        report = dict(report or {}, **lengths_report)
+
+    count = 0
+    def counted(conversations):
+        nonlocal count
+        for c in conversations:
+            count += 1
+            yield c
+
+    try:
+        with open_output(tmp, compression) as f:
+            for chunk in render(counted(conversations), fmt):
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    os.replace(tmp, output_file)
+
+    if tokenizer:
+        sidecar = output_file + ".lengths.json"
+        write_sidecar(sidecar, tokenizer, max_length, lengths, out_order)
+        report["sidecar"] = sidecar
+    return count, output_file, report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="none")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--from-store", dest="from_store", action="store_const", const=True, default=None,
+                        help=f"read the JSONL stores (the default once {QUESTIONS_STORE} exists)")
+    source.add_argument("--from-json", dest="from_store", action="store_const", const=False,
+                        help="read questions.json/answers.json, e.g. an --export snapshot")
+    parser.add_argument("--skills", nargs="?", const=SKILLBANK_FILE, default=None, metavar="SKILLBANK",
+                        help=f"add a system prompt with the topic's skills (default skillbank: {SKILLBANK_FILE})")
+    parser.add_argument("--order", choices=ORDERS, default="generation",
+                        help="output order; bucketed and packed count tokens first. packed writes "
+                             "{\"pack\": [conversation, ...]} records of separate conversations; the "
+                             "trainer must keep attention and loss within each one")
+    parser.add_argument("--tokenizer", default=None,
+                        help="count tokens with this tokenizer and write a .lengths.json sidecar "
+                             f"({', '.join(TOKENIZERS)}; default whitespace when --order needs lengths)")
+    parser.add_argument("--max-length", type=int, default=MAX_SEQ_LENGTH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="batch size assumed for bucketing and the padding report")
+    parser.add_argument("--seed", type=int, default=0, help="seed for shuffling batches/packs and sampling")
+    parser.add_argument("--sample", type=int, default=None, metavar="N",
+                        help="export a stratified sample of N records (needs the store)")
+    parser.add_argument("--stratify", choices=("topic", "difficulty"), default="difficulty",
+                        help="sample in equal shares per topic, or per topic and difficulty bucket")
+    parser.add_argument("--buckets", type=int, default=DIFFICULTY_BUCKETS,
+                        help="difficulty buckets per topic")
+    parser.add_argument("--curriculum", action="store_true",
+                        help="order the sample from the easiest difficulty bucket to the hardest")
+    args = parser.parse_args()
+
+    count, output_file, report = export(
+        args.output, args.format, args.compression, args.from_store, args.skills,
+        args.order, args.tokenizer, args.max_length, args.batch_size, args.seed,
+        sample=args.sample, stratify=args.stratify, buckets=args.buckets, curriculum=args.curriculum
+    )
 
-    print(f"Saved {len(conversations)} training samples → {OUTPUT_FILE}")
+    print(f"Saved {count} training samples → {output_file}")
+    if report:
+        print(json.dumps(report, indent=2))
 
 
 if __name__=="__main__":
@@ -1,9 +1,26 @@
 import json
-import re
+import os
+import sys
+import argparse
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.file_manager import read_manifest, read_shard, rewrite_shard
+from core.question_parser import parse_question
+from generators import mixed_series, family_graph, venn
+
 QUESTIONS_PATH = 'dataset/questions.json'
 ANSWERS_PATH = 'dataset/answers.json'
+QUESTIONS_STORE = 'dataset/store/questions'
+ANSWERS_STORE = 'dataset/store/answers'
+CHECKPOINT_PATH = 'dataset/store/explain_checkpoint.json'
+
+# Bump when the explainers change: expanded records carry the version that
+# wrote them ("explainer_version"), and both modes rewrite older ones.
+EXPLAINER_VERSION = 3
+
+# Generator placeholders that count as "no explanation yet"
+TERSE_EXPLANATIONS = ['', 'Set contradiction reasoning', 'Multi-hop relation composition', 'Alphabet + quadratic number pattern', 'Uniquely determined arrangement']
 
 def load_json(p):
     with open(p, 'r', encoding='utf-8') as f:
@@ -13,207 +30,114 @@ def save_json(p, data):
     with open(p, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
-# Helpers for syllogism parsing
-def parse_statements_block(text):
-    # Extract lines between 'Statements:' and 'Conclusion:'
-    m = re.search(r'Statements:\n(.*?)\nConclusion:', text, re.S)
-    if not m:
-        return [], ''
-    stmts_block = m.group(1).strip()
-    stmts = [s.strip() for s in stmts_block.split('\n') if s.strip()]
-    concl_m = re.search(r'Conclusion:\s*(.*)', text)
-    concl = concl_m.group(1).strip() if concl_m else ''
-    return stmts, concl
-
-def build_relationships(stmts):
-    all_map = {}    # All X are Y -> all_map[X] = Y
-    some_map = defaultdict(list)  # Some X are Y -> some_map[X].append(Y)
-    no_map = defaultdict(list)    # No X are Y -> no_map[X].append(Y)
-    for s in stmts:
-        s = s.rstrip('.')
-        if s.startswith('All '):
-            m = re.match(r'All\s+(\w)\s+are\s+(\w)', s)
-            if m:
-                a,b = m.groups()
-                all_map[a]=b
-        elif s.startswith('Some '):
-            m = re.match(r'Some\s+(\w)\s+are\s+(\w)', s)
-            if m:
-                a,b = m.groups()
-                some_map[a].append(b)
-        elif s.startswith('No '):
-            m = re.match(r'No\s+(\w)\s+are\s+(\w)', s)
-            if m:
-                a,b = m.groups()
-                no_map[a].append(b)
-    return all_map, some_map, no_map
-
-def explain_syllogism(question_text, expected):
-    stmts, concl = parse_statements_block(question_text)
-    if not stmts:
+# Explainers work on the structured forms from core.question_parser, so each
+# question is tokenized exactly once.
+
+def explain_syllogism(parsed):
+    syl = parsed.body
+    if not syl or not syl.statements:
         return 'Translate the premises into set relationships and apply syllogistic rules to test the conclusion.'
-    all_map, some_map, no_map = build_relationships(stmts)
-    # Build text explanation heuristically
-    explanation_lines = []
-    explanation_lines.append('Translate premises:')
-    for s in stmts:
-        explanation_lines.append('- ' + s)
+    explanation_lines = ['Translate premises:']
+    explanation_lines += ['- ' + s for s in syl.statements]
     explanation_lines.append('Derive consequences:')
-    # try simple patterns
-    # Example pattern: if concl is 'Some G are not D' and we have 'Some G are E' and 'No E are D'
-    m = re.match(r'Some\s+(\w)\s+are\s+not\s+(\w)', concl)
-    if m:
-        x,y = m.groups()
-        # search for Some x are z and No z are y
-        for z, zs in some_map.items():
-            pass
-        # check direct pattern
-        for z, zs in some_map.items():
-            if z == x:
-                for ztarget in zs:
-                    if y in no_map and ztarget in no_map and ztarget in no_map[y]:
-                        pass
-        # more straightforward: find any 'Some X are Z' where 'No Z are Y'
-        found = False
-        for z in some_map.get(x,[]):
-            if z in no_map and y in no_map[z]:
-                explanation_lines.append(f"- We know 'Some {x} are {z}' and 'No {z} are {y}', so those {x} that are {z} cannot be {y}.")
-                explanation_lines.append(f"Hence 'Some {x} are not {y}' holds, so the conclusion follows.")
-                found = True
-                break
-        # Check alternative: Some X are Z and No Z are Y (written as 'No Z are Y' or 'No Y are Z')
-        if not found:
-            for z in some_map.get(x,[]):
-                if z in no_map and y in no_map[z]:
-                    explanation_lines.append(f"- {x} that are {z} are not {y}; hence some {x} are not {y}.")
-                    found = True
-                    break
-        if not found:
-            # try chain: All Y are X and Some X are Z and No Z are Y -> some X are not Y
-            # generic fallback
-            explanation_lines.append('Apply Venn-diagram/set reasoning to verify existence of an X that is not Y using the premises; the conclusion follows from the contradictions between the relevant sets.')
-        return ' '.join(explanation_lines)
-    # fallback
+    derivation = syl.derivation
+    conclusions = [c for c in syl.conclusions if c]
+    if derivation is None and syl.premises and conclusions and len(conclusions) == len(syl.conclusions):
+        derivation = venn.derivation(syl.premises, conclusions)
+    if derivation:
+        explanation_lines += ['- ' + line for line in derivation]
+    else:
+        explanation_lines.append('Draw the Venn diagram of the premises and check whether each conclusion holds in every region arrangement they allow.')
     return ' '.join(explanation_lines)
 
 # Mixed series
-import math
 
-def explain_mixed_series(question_text, choices, expected):
-    m = re.search(r'Find next term:\n(.*)', question_text, re.S)
-    if not m:
+# k^2 mod 10 only depends on k mod 10
+SQUARES_MOD_10 = [k*k % 10 for k in range(10)]
+
+def explain_mixed_series(parsed):
+    series = parsed.body
+    if not series:
         return 'Identify the letter pattern and numeric pattern in the sequence to predict the next term.'
-    raw_tokens = [t.strip() for t in m.group(1).split(',')]
-    # remove tokens that are just placeholders like '?' and keep only real terms
-    seq = [t for t in raw_tokens if t and '?' not in t]
-    # letters and numbers (defensive parsing)
-    letters = []
-    nums = []
-    for s in seq:
-        mo_letter = re.search(r'([A-Z])', s)
-        mo_num = re.search(r'(\d+)', s)
-        if mo_letter:
-            letters.append(mo_letter.group(1))
-        if mo_num:
-            nums.append(int(mo_num.group(1)))
+    if series.rule:
+        return explain_rule_series(parsed)
+    letters, nums = series.letters, series.numbers
     # detect letter step
     letter_diffs = [(ord(letters[i+1])-ord(letters[i])) for i in range(len(letters)-1)]
     common_diff = max(set(letter_diffs), key=letter_diffs.count) if letter_diffs else 0
     next_letter = chr(ord(letters[-1]) + common_diff)
-    # detect numeric pattern: try squares mod 10
-    # compute expected sequence of n^2 mod 10 for n starting 0
-    candidates = []
-    # try to align with k^2 % 10 for some start k
-    for start in range(0,10):
-        cand = [( (start+i)**2 ) % 10 for i in range(len(nums)+1)]
-        if cand[:len(nums)] == nums:
-            candidates.append(('square_mod_10', start, cand))
-    if candidates:
-        _, start, cand = candidates[0]
-        next_num = cand[len(nums)]
+    # detect numeric pattern: try to align with k^2 % 10 for some start k
+    start = next((k for k in range(10)
+                  if all(SQUARES_MOD_10[(k+i) % 10] == v for i, v in enumerate(nums))), None)
+    if start is not None:
+        next_num = SQUARES_MOD_10[(start+len(nums)) % 10]
         pattern_desc = f"The letters increase by {common_diff} each term (e.g. {', '.join(letters[:3])} -> +{common_diff}). The numbers follow k^2 mod 10 starting from k={start}, giving {nums} so next is {next_num}."
     else:
-        # fallback: try polynomial fit for small degree
-        # simplest: observe repeating pattern
+        # fallback: try repeating period, then last difference
         next_num = None
-        # try repeating period
         for p in range(2,6):
             if all(nums[i]==nums[i%p] for i in range(len(nums))):
                 next_num = nums[len(nums)%p]
                 break
         if next_num is None:
-            # default to difference pattern
             diffs = [(nums[i+1]-nums[i]) for i in range(len(nums)-1)]
             next_num = nums[-1] + (diffs[-1] if diffs else 0)
         pattern_desc = f"Letters increment by {common_diff} each step; numeric pattern detected heuristically, next number is {next_num}."
     next_term = f"{next_letter}{next_num}"
     explanation = pattern_desc + f" Therefore the next term is {next_term}."
     # confirm with choices
-    chosen_text = None
-    for c in choices:
-        if c.startswith(expected):
-            # choice line like 'A) S4' or choices is list of strings
-            try:
-                chosen_text = c.split(')',1)[1].strip()
-            except:
-                chosen_text = c
-            break
+    chosen_text = parsed.choice
     if chosen_text and chosen_text != next_term:
         explanation += f" The computed next term {next_term} differs from the provided choice {chosen_text}; however the best-fit pattern is explained above."
     else:
-        explanation += f" This matches choice {expected}: {chosen_text or next_term}."
+        explanation += f" This matches choice {parsed.expected}: {chosen_text or next_term}."
+    return explanation
+
+def explain_rule_series(parsed):
+    # rule-family series carry their parameters, so nothing is inferred
+    rule = parsed.body.rule
+    next_term = mixed_series.next_term(rule)
+    explanation = mixed_series.explain_rule(rule['letter_step'], rule['rule'], rule['params'], next_term)
+    if parsed.choice and parsed.choice != next_term:
+        explanation += f" The computed next term {next_term} differs from the provided choice {parsed.choice}."
+    else:
+        explanation += f" This matches choice {parsed.expected}: {parsed.choice or next_term}."
     return explanation
 
 # Blood relations
 
-def explain_blood_relations(question_text, choices, expected):
-    # parse sentences
-    sents = [s.strip() for s in question_text.split('.') if s.strip()]
+def explain_blood_relations(parsed):
+    kin = parsed.body
+    given = ['Given relations:'] + [f"{s}." for s in kin.sentences] + ['Steps:']
+    chain = kin.chain
+    if not chain and kin.query:
+        # compose the stated facts with the family-graph engine; only trust
+        # it when it lands on the keyed answer
+        relation, chain = family_graph.resolve_facts(kin.facts, *kin.query)
+        if relation != parsed.choice:
+            chain = None
+    if chain:
+        return ' '.join(given + chain)
     parent = {}
     gender = {}
     siblings = defaultdict(list)
-    for s in sents:
-        # A is the father/mother of B
-        m = re.match(r'([A-Z]) is the (father|mother) of ([A-Z])', s)
-        if m:
-            a,role,b = m.groups()
-            parent[b]=a
-            gender[a] = 'M' if role=='father' else 'F'
-            continue
-        # B is the sister/brother of C
-        m = re.match(r'([A-Z]) is the (sister|brother) of ([A-Z])', s)
-        if m:
-            a,role,b = m.groups()
-            gender[a] = 'F' if role=='sister' else 'M'
+    for a, role, b in kin.facts:
+        if role in ('father', 'mother'):
+            parent[b] = a
+            gender[a] = 'M' if role == 'father' else 'F'
+        elif role in ('sister', 'brother'):
+            gender[a] = 'F' if role == 'sister' else 'M'
             siblings[a].append(b)
             siblings[b].append(a)
-            continue
-        # C is the son/daughter of D
-        m = re.match(r'([A-Z]) is the (son|daughter) of ([A-Z])', s)
-        if m:
-            a,role,b = m.groups()
-            parent[a]=b
-            gender[a] = 'M' if role=='son' else 'F'
-            continue
-        # D is the wife/husband of E
-        m = re.match(r'([A-Z]) is the (wife|husband) of ([A-Z])', s)
-        if m:
-            a,role,b = m.groups()
-            gender[a] = 'F' if role=='wife' else 'M'
-            gender[b] = 'M' if role=='wife' else 'F'
+        elif role in ('son', 'daughter'):
+            parent[a] = b
+            gender[a] = 'M' if role == 'son' else 'F'
+        else:
             # spouse relationship not stored except genders
-            continue
-    # try to compute relation A to F (example in dataset)
-    # find the letters asked about in question: last sentence often 'How is A related to F?'
-    qm = re.search(r'How is ([A-Z]) related to ([A-Z])', question_text)
-    if not qm:
-        qm = re.search(r'How is ([A-Z]) related to ([A-Z])\?', question_text)
-    if qm:
-        x,y = qm.groups()
-    else:
-        # fallback use common letters A and F
-        x,y = 'A','F'
-    # Build path from y up parents to ancestors; check if x is parent/grandparent/uncle/brother-in-law etc.
+            gender[a] = 'F' if role == 'wife' else 'M'
+            gender[b] = 'M' if role == 'wife' else 'F'
+    # fallback to the letters of the original template
+    x, y = kin.query or ('A', 'F')
     steps = []
     # If x is parent of y
     if parent.get(y)==x:
@@ -225,99 +149,145 @@ def explain_blood_relations(question_text, choices, expected):
         if p and parent.get(p)==x:
             rel = 'Grandfather' if gender.get(x)=='M' else 'Grandmother'
             steps.append(f"{x} is the parent of {p}, who is parent of {y}; hence {x} is {rel} of {y}.")
+        elif p and x in siblings.get(p,[]):
+            # x is sibling of y's parent -> uncle/aunt
+            rel = 'Uncle' if gender.get(x)=='M' else 'Aunt'
+            steps.append(f"{x} is sibling of {p}, who is parent of {y}; so {x} is {rel} of {y}.")
         else:
-            # siblings and spouse cases to detect uncle/brother-in-law
-            # find if x is sibling of y's parent -> uncle/aunt
-            if p and x in siblings.get(p,[]):
-                rel = 'Uncle' if gender.get(x)=='M' else 'Aunt'
-                steps.append(f"{x} is sibling of {p}, who is parent of {y}; so {x} is {rel} of {y}.")
-            else:
-                # brother-in-law: if x is spouse of sibling or sibling of spouse
-                # check siblings of y
-                sibs = siblings.get(y, [])
-                for s in sibs:
-                    # if x is spouse of s -> brother/sister-in-law
-                    # we don't have spouse mapping, but some sentences give 'D is the wife of E'
-                    # check if gender relation indicates x is spouse of someone
-                    pass
-                steps.append('Derived relation by composing the given parent/sibling/spouse facts.')
-    if not steps:
-        steps.append('Compose the given relations step-by-step (parent, sibling, spouse) to reach the final relation.')
-    explanation = ' '.join(['Given relations:'] + [f"{s}." for s in sents] + ['Steps:'] + steps)
+            steps.append('Derived relation by composing the given parent/sibling/spouse facts.')
+    explanation = ' '.join(given + steps)
     return explanation
 
 # Seating arrangements
 
-def explain_seating(question_text, choices, expected):
-    # find asked person and target
-    m = re.search(r'What is the position of ([A-Z]) from the left\?', question_text)
-    if m:
-        person = m.group(1)
-    else:
-        person = None
-    chosen_text = None
-    for c in choices:
-        if c.startswith(expected):
-            try:
-                chosen_text = c.split(')',1)[1].strip()
-            except:
-                chosen_text = c
-            break
+def explain_seating(parsed):
+    person = parsed.body.ask
+    chosen_text = parsed.choice
     explanation = 'Use the given pairwise constraints to construct the unique linear arrangement (place anchors from explicit left/right clues, then deduce remaining positions).'
     if person and chosen_text:
-        explanation += f" After building the arrangement the position of {person} from the left is {chosen_text} (choice {expected})."
+        explanation += f" After building the arrangement the position of {person} from the left is {chosen_text} (choice {parsed.expected})."
     else:
         explanation += ' The full constraint set produces a unique placement; the stated choice is the result.'
     return explanation
 
 # Generic fallback
 
-def explain_generic(qtext, choices, expected, short_expl):
-    chosen_text = None
-    for c in choices:
-        if c.startswith(expected):
-            try:
-                chosen_text = c.split(')',1)[1].strip()
-            except:
-                chosen_text = c
-            break
-    explanation = f"{short_expl}. The correct choice is {expected} ({chosen_text}) if applicable."
-    return explanation
+def explain_generic(parsed, short_expl):
+    return f"{short_expl}. The correct choice is {parsed.expected} ({parsed.choice}) if applicable."
+
+
+EXPLAINERS = {
+    'syllogism': explain_syllogism,
+    'series': explain_mixed_series,
+    'kinship': explain_blood_relations,
+    'seating': explain_seating,
+}
+
+
+def generate_explanation(q, a):
+    expected = q.get('expected_answer') or a.get('answer') or ''
+    parsed = parse_question(q, expected)
+    explainer = EXPLAINERS.get(parsed.kind)
+    if explainer:
+        return expected, explainer(parsed)
+    return expected, explain_generic(parsed, q.get('explanation','') or 'Apply domain-specific reasoning')
+
+
+def expand_record(q, a):
+    """
+    Fill a terse explanation / empty reasoning in place, or rewrite text an
+    older EXPLAINER_VERSION produced; returns (q_changed, a_changed).
+    """
+    needs_q = q.get('explanation', '').strip() in TERSE_EXPLANATIONS
+    needs_a = a.get('reasoning', '').strip() == ''
+    if not needs_a and a.get('explainer_version', 0) < EXPLAINER_VERSION:
+        # stale (records expanded before versions were stored count as 0):
+        # the reasoning is always ours, the explanation only when we wrote it
+        # rather than the generator
+        needs_a = True
+        needs_q |= 'explainer_version' in q or a['reasoning'].endswith('Reasoning: ' + q.get('explanation', ''))
+    if not (needs_q or needs_a):
+        return False, False
+    expected, generated = generate_explanation(q, a)
+    if needs_q:
+        q['explanation'] = generated
+        q['explainer_version'] = EXPLAINER_VERSION
+    if needs_a:
+        a['reasoning'] = f"Answer: {expected}. Reasoning: {generated}"
+        a['explainer_version'] = EXPLAINER_VERSION
+    return needs_q, needs_a
+
+
+def load_checkpoint():
+    if not os.path.exists(CHECKPOINT_PATH):
+        return {'version': EXPLAINER_VERSION, 'shards': 0, 'records': 0}
+    cp = load_json(CHECKPOINT_PATH)
+    if cp.get('version') != EXPLAINER_VERSION:
+        # explainers changed: everything is stale
+        return {'version': EXPLAINER_VERSION, 'shards': 0, 'records': 0}
+    return cp
+
+
+def save_checkpoint(cp):
+    tmp = CHECKPOINT_PATH + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(cp, f, indent=2)
+    os.replace(tmp, CHECKPOINT_PATH)
+
+
+def main_incremental(full=False):
+    """
+    Expand only the store shards published since the last run (every shard
+    with full).
+
+    The checkpoint records how many shards are done; it advances after each
+    shard pair is settled, so an interrupted run resumes at the first
+    unfinished shard. Shards with no changes are not rewritten.
+    """
+    qman = read_manifest(QUESTIONS_STORE)
+    aman = read_manifest(ANSWERS_STORE)
+    if len(qman['shards']) != len(aman['shards']):
+        raise SystemExit(f'{QUESTIONS_STORE} and {ANSWERS_STORE} have different shard counts')
+    cp = load_checkpoint()
+    processed = rewritten = 0
+    for idx in range(0 if full else cp['shards'], len(qman['shards'])):
+        qshard, ashard = qman['shards'][idx], aman['shards'][idx]
+        if qshard['records'] != ashard['records']:
+            raise SystemExit(f"Shard {idx}: {qshard['records']} questions vs {ashard['records']} answers")
+        questions = read_shard(QUESTIONS_STORE, qshard)
+        answers = read_shard(ANSWERS_STORE, ashard)
+        updated_q = updated_a = False
+        for q, a in zip(questions, answers):
+            cq, ca = expand_record(q, a)
+            updated_q |= cq
+            updated_a |= ca
+        if updated_q:
+            rewrite_shard(QUESTIONS_STORE, idx, questions)
+        if updated_a:
+            rewrite_shard(ANSWERS_STORE, idx, answers)
+        rewritten += updated_q + updated_a
+        processed += len(questions)
+        cp['shards'] = idx + 1
+        cp['records'] = qshard['start'] + qshard['records']
+        save_checkpoint(cp)
+    print(f'Processed {processed} {"" if full else "new "}records, rewrote {rewritten} shard files (watermark {cp["records"]}).')
 
 
 def main():
+    # the store is authoritative once generation has created it; the JSON
+    # files are then only --export snapshots
+    if os.path.isdir(QUESTIONS_STORE):
+        main_incremental(full=True)
+        return
     questions = load_json(QUESTIONS_PATH)
     answers = load_json(ANSWERS_PATH)
     n = min(len(questions), len(answers))
     updated_q = False
     updated_a = False
     for i in range(n):
-        q = questions[i]
-        a = answers[i]
-        topic = q.get('topic','')
-        qtext = q.get('question','')
-        expected = q.get('expected_answer') or a.get('answer') or ''
-        choices = q.get('choices', [])
-        short_expl = q.get('explanation','')
-        generated = None
-        if 'Syllog' in topic or 'Syllogisms' in topic:
-            generated = explain_syllogism(qtext, expected)
-        elif 'Mixed Series' in topic:
-            generated = explain_mixed_series(qtext, choices, expected)
-        elif 'Blood Relation' in topic or 'Blood Relations' in topic:
-            generated = explain_blood_relations(qtext, choices, expected)
-        elif 'Seating' in topic:
-            generated = explain_seating(qtext, choices, expected)
-        else:
-            generated = explain_generic(qtext, choices, expected, short_expl or 'Apply domain-specific reasoning')
-        # update question explanation if it's terse
-        if q.get('explanation', '').strip() in ['', 'Set contradiction reasoning', 'Multi-hop relation composition', 'Alphabet + quadratic number pattern', 'Uniquely determined arrangement']:
-            q['explanation'] = generated
-            updated_q = True
-        # update answer reasoning if empty
-        if a.get('reasoning','').strip() == '':
-            a['reasoning'] = f"Answer: {expected}. Reasoning: {generated}"
-            updated_a = True
+        cq, ca = expand_record(questions[i], answers[i])
+        updated_q |= cq
+        updated_a |= ca
     if updated_q:
         save_json(QUESTIONS_PATH, questions)
         print(f'Updated {QUESTIONS_PATH}')
@@ -328,4 +298,12 @@ def main():
         print('No updates necessary.')
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(
+        description=f'Expand explanations in {QUESTIONS_STORE} if it exists, else in {QUESTIONS_PATH}')
+    parser.add_argument('--incremental', action='store_true',
+                        help='expand only store shards added since the last checkpoint')
+    args = parser.parse_args()
+    if args.incremental:
+        main_incremental()
+    else:
+        main()
@@ -0,0 +1,110 @@
+import random
+from collections import Counter
+
+import pytest
+
+from core.dataset import Dataset, difficulty_buckets, stratified_sample
+from core.file_manager import append_records, read_manifest, rewrite_shard
+
+
+def make_records(rng, n, start=0):
+    return [
+        {"i": start + i, "topic": rng.choice("ABC"), "payload": {"difficulty": rng.randint(1, 6)}}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / "questions")
+    records = []
+    for size in (40, 1, 75, 30):
+        chunk = make_records(rng, size, len(records))
+        append_records(path, chunk)
+        records += chunk
+    return path, records
+
+
+def test_views_read_the_records_in_order(store):
+    path, records = store
+    ds = Dataset(path)
+    assert len(ds) == len(records)
+    assert list(ds) == records
+    assert ds[41] == records[41] and ds[-1] == records[-1]
+    assert list(ds[35:80:3]) == records[35:80:3]
+    assert list(ds.select([5, 2, 100])) == [records[5], records[2], records[100]]
+
+
+def test_index_counts_and_where(store):
+    path, records = store
+    ds = Dataset(path)
+    assert ds.topics() == Counter(r["topic"] for r in records)
+    assert ds.strata() == Counter((r["topic"], r["payload"]["difficulty"]) for r in records)
+
+    for topic in "ABC":
+        expected = [r for r in records if r["topic"] == topic]
+        view = ds.where(topic)
+        assert list(view) == expected
+        assert [records[i] for i in view.record_numbers()] == expected
+        assert list(view[2:-2]) == expected[2:-2]
+        assert list(ds.where(topic, 3)) == [r for r in expected if r["payload"]["difficulty"] == 3]
+
+    with pytest.raises(KeyError):
+        ds.where("D")
+    with pytest.raises(ValueError):
+        ds[1:].where("A")
+
+
+def test_rewritten_shard_is_reindexed(store):
+    path, records = store
+    Dataset(path)
+    shard = read_manifest(path)["shards"][2]
+    changed = [dict(r, topic="Rewritten") for r in records[shard["start"]:shard["start"] + shard["records"]]]
+    rewrite_shard(path, 2, changed)
+
+    ds = Dataset(path)
+    assert ds.topics()["Rewritten"] == shard["records"]
+    assert list(ds.where("Rewritten")) == changed
+
+
+def test_difficulty_buckets_cut_at_count_quantiles():
+    strata = {("A", 1): 10, ("A", 2): 10, ("A", 3): 10, ("B", 5): 4, ("B", 9): 1, ("C", 2): 7}
+    assert difficulty_buckets(strata) == {
+        ("A", 1): 0, ("A", 2): 1, ("A", 3): 2,
+        ("B", 5): 0, ("B", 9): 1,
+        ("C", 2): 0,
+    }
+    skewed = {("A", d): n for d, n in ((1, 1), (2, 1), (3, 30), (4, 1), (5, 30))}
+    assert difficulty_buckets(skewed) == {("A", 1): 0, ("A", 2): 0, ("A", 3): 0, ("A", 4): 1, ("A", 5): 2}
+
+
+def test_stratified_sample_draws_equal_shares(store):
+    path, records = store
+    ds = Dataset(path)
+    rows, taken = stratified_sample(ds, 60, by="topic", seed=1)
+    assert len(rows) == len(set(rows)) == 60
+    assert taken == {"A": 20, "B": 20, "C": 20}
+    assert Counter(records[i]["topic"] for i in rows) == taken
+    assert stratified_sample(ds, 60, by="topic", seed=1) == (rows, taken)
+
+    # more than the store holds: every record, once
+    rows, taken = stratified_sample(ds, 1000)
+    assert sorted(rows) == list(range(len(records)))
+    with pytest.raises(ValueError):
+        stratified_sample(ds, 10, by="length")
+
+
+def test_stratified_sample_small_cells_leave_room_to_others(store):
+    path, records = store
+    ds = Dataset(path)
+    bucket = difficulty_buckets(ds.strata())
+    rows, taken = stratified_sample(ds, 130, curriculum=True, seed=2)
+    assert len(rows) == 130 and sum(taken.values()) == 130
+    sizes = Counter((r["topic"], bucket[(r["topic"], r["payload"]["difficulty"])]) for r in records)
+    share = 130 // len(sizes)
+    small = [c for c in sizes if sizes[c] < share]
+    assert small and all(taken[c] == sizes[c] for c in small)
+    assert all(taken[c] >= share for c in sizes if sizes[c] >= share)
+    drawn = [bucket[(records[i]["topic"], records[i]["payload"]["difficulty"])] for i in rows]
+    assert drawn == sorted(drawn)
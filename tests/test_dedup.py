@@ -0,0 +1,28 @@
+import random
+
+import generate_dataset
+from core.dedup import DedupIndex, canonical_key
+from core.file_manager import append_records, iter_records
+from generators import syllogism
+
+
+def test_index_catches_up_with_records_written_without_dedup(tmp_path, monkeypatch):
+    for name in ("QUESTIONS_STORE", "ANSWERS_STORE"):
+        monkeypatch.setattr(generate_dataset, name, str(tmp_path / name.lower()))
+    for name in ("QUESTIONS_FILE", "ANSWERS_FILE"):
+        monkeypatch.setattr(generate_dataset, name, str(tmp_path / "missing.json"))
+    monkeypatch.setattr(generate_dataset, "DEDUP_INDEX", str(tmp_path / "dedup.idx"))
+    rng = random.Random(0)
+
+    generate_dataset.generate_batch(20, dedup=generate_dataset.load_dedup_index(), rng=rng)
+    # a later run that bypasses the index
+    records = [syllogism.generate(rng) for _ in range(30)]
+    append_records(generate_dataset.QUESTIONS_STORE, [q for q, _ in records])
+    append_records(generate_dataset.ANSWERS_STORE, [a for _, a in records])
+
+    index = generate_dataset.load_dedup_index()
+    assert index.watermark == 50
+    assert all(index.add(q) == "exact" for q, _ in records)
+    reloaded = DedupIndex(generate_dataset.DEDUP_INDEX)
+    assert reloaded.watermark == 50
+    assert {canonical_key(q) for q in iter_records(generate_dataset.QUESTIONS_STORE)} <= reloaded.keys
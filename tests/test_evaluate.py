@@ -0,0 +1,57 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import evaluate
+
+
+@pytest.mark.parametrize("text, letter", [
+    ('{"answer": "b", "reasoning": "x"}', "B"),
+    ('```json\n{"answer": "C", "reasoning": "a {b}"}\n```', "C"),
+    ('Sure! {"answer": "D", "reasoning": "trunc', "D"),
+    ("Choice A is wrong because the chain breaks, so the answer is C.", "C"),
+    ("The answer is B. Checking again, the answer is D.", "D"),
+    ("Option (B) fits every clue.", "B"),
+    ("The answer is a bit unclear.", None),
+])
+def test_parse_reply(text, letter):
+    assert evaluate.parse_reply(text)[0] == letter
+
+
+def test_malformed_replies_count_as_errors():
+    replies = iter([{"choices": []}, {"object": "chat.completion"}] + [
+        {"choices": [{"message": {"content": '{"answer": "A"}'}}]}
+    ] * 4)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                body = json.dumps(next(replies)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = evaluate.StubServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    q = {"topic": "Syllogisms", "question": "?", "choices": ["A) x", "B) y"], "expected_answer": "A"}
+    records = [(dict(q), {"answer": "A"}) for _ in range(6)]
+    try:
+        report = asyncio.run(evaluate.evaluate_async(
+            records, f"http://127.0.0.1:{server.server_address[1]}/v1", "m", 1, 0, 16, None, None, None, 0
+        ))
+    finally:
+        server.shutdown()
+    assert report["records"] == 6
+    assert report["errors"] == 2
+    assert report["accuracy"] == 1.0
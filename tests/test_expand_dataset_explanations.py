@@ -0,0 +1,50 @@
+import random
+
+import expand_dataset_explanations as expand
+from core.file_manager import append_records, read_manifest, iter_records
+from generators import syllogism
+
+
+def make_store(tmp_path, monkeypatch, n=20):
+    qstore, astore = str(tmp_path / "questions"), str(tmp_path / "answers")
+    monkeypatch.setattr(expand, "QUESTIONS_STORE", qstore)
+    monkeypatch.setattr(expand, "ANSWERS_STORE", astore)
+    monkeypatch.setattr(expand, "CHECKPOINT_PATH", str(tmp_path / "explain_checkpoint.json"))
+    rng = random.Random(0)
+    records = [syllogism.generate(rng) for _ in range(n)]
+    append_records(qstore, [q for q, _ in records])
+    append_records(astore, [a for _, a in records])
+    return qstore, astore
+
+
+def test_incremental_fills_new_records(tmp_path, monkeypatch):
+    _, astore = make_store(tmp_path, monkeypatch)
+    expand.main_incremental()
+    answers = list(iter_records(astore))
+    assert all(a["reasoning"] and a["explainer_version"] == expand.EXPLAINER_VERSION for a in answers)
+
+
+def test_version_bump_rewrites_expanded_records(tmp_path, monkeypatch):
+    qstore, astore = make_store(tmp_path, monkeypatch)
+    expand.main_incremental()
+    before = read_manifest(astore)["shards"][0]["bytes"]
+
+    monkeypatch.setattr(expand, "EXPLAINER_VERSION", expand.EXPLAINER_VERSION + 1)
+    monkeypatch.setattr(expand, "explain_syllogism", lambda parsed: "refreshed")
+    monkeypatch.setitem(expand.EXPLAINERS, "syllogism", expand.explain_syllogism)
+    expand.main_incremental()
+
+    answers = list(iter_records(astore))
+    assert all(a["explainer_version"] == expand.EXPLAINER_VERSION for a in answers)
+    assert all(a["reasoning"].endswith("Reasoning: refreshed") for a in answers)
+    assert read_manifest(astore)["shards"][0]["bytes"] != before
+    # generator-written explanations are left alone
+    assert all(q["explanation"] != "refreshed" for q in iter_records(qstore))
+
+
+def test_legacy_expanded_record_is_stale():
+    q = {"topic": "Syllogisms", "question": "?", "choices": [], "expected_answer": "A", "explanation": "old text"}
+    a = {"answer": "A", "reasoning": "Answer: A. Reasoning: old text"}
+    assert expand.expand_record(q, a) == (True, True)
+    assert q["explainer_version"] == a["explainer_version"] == expand.EXPLAINER_VERSION
+    assert expand.expand_record(q, a) == (False, False)
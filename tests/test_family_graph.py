@@ -0,0 +1,82 @@
+import random
+
+from generators import family_graph as fg
+from generators.family_graph import MALE, FEMALE
+
+
+def small_family():
+    # 0 + 1 are the parents of 2 and 3; 2 + 4 are the parents of 5
+    father = [-1, -1, 0, 0, -1, 2]
+    mother = [-1, -1, 1, 1, -1, 4]
+    return fg.Family(
+        list("ABCDEF"),
+        [MALE, FEMALE, MALE, FEMALE, FEMALE, MALE],
+        father,
+        mother,
+        [1, 0, 4, -1, 2, -1],
+        fg.ancestor_tables(father, mother),
+    )
+
+
+def test_relation_key_from_ancestor_tables():
+    fam = small_family()
+    cases = {
+        (0, 5): ("Grandfather", ("", 0, 2, "")),
+        (3, 5): ("Aunt", ("", 1, 2, "")),
+        (5, 3): ("Nephew", ("", 2, 1, "")),
+        (4, 3): ("Sister-in-law", ("S", 1, 1, "")),
+        (3, 4): ("Sister-in-law", ("", 1, 1, "S")),
+        (4, 0): ("Daughter-in-law", ("S", 1, 0, "")),
+        (0, 4): ("Father-in-law", ("", 0, 1, "S")),
+        (2, 4): ("Husband", ("S", 0, 0, "")),
+    }
+    for (x, y), (name, key) in cases.items():
+        assert fg.relation_key(fam, x, y) == key, (x, y)
+        assert fg.term(key, fam.gender[x]) == name
+
+
+def test_compose_applies_the_reductions():
+    assert fg.compose("D") == ("", 0, 1, "")
+    assert fg.compose("U") == ("", 1, 0, "")
+    assert fg.compose("TD") == ("", 1, 2, "")
+    assert fg.compose("UT") == ("", 2, 1, "")
+    assert fg.compose("UUDD") == ("", 2, 2, "")
+    assert fg.compose("ST") == ("S", 1, 1, "")
+    assert fg.compose("TS") == ("", 1, 1, "S")
+    # a child's other parent is one's spouse; a spouse's spouse is oneself
+    assert fg.compose("DU") == ("S", 0, 0, "")
+    assert fg.compose("SSD") == fg.compose("D")
+    # a parent's child's parent is that parent again
+    assert fg.compose("UDU") == fg.compose("U")
+    assert fg.compose("TT") == fg.compose("T")
+    for moves, reduced in fg.REDUCTIONS.items():
+        assert fg.compose(moves + "D") == fg.compose(reduced + "D")
+
+
+def test_compose_rejects_unnamed_relations():
+    assert fg.compose("DDDD") is None
+    assert fg.compose("UUUD") is None
+    assert fg.compose("SS") is None
+
+
+def test_composed_path_agrees_with_relation_key():
+    rng = random.Random(0)
+    for _ in range(100):
+        fam = fg.sample_family(rng)
+        n = len(fam.gender)
+        for x in range(n):
+            for y in range(n):
+                key = fg.relation_key(fam, x, y) if x != y else None
+                if key not in fg.TERMS:
+                    continue
+                path = fg.shortest_path(lambda i: fg.family_edges(fam, i), x, y)
+                assert fg.compose("".join(mv for _, mv, _ in path)) == key
+
+
+def test_sample_question_chain_matches_answer():
+    rng = random.Random(1)
+    for _ in range(100):
+        facts, (x, y), answer, chain, key = fg.sample_question(rng)
+        assert 2 <= len(facts) <= 5
+        assert fg.resolve_facts(facts, x, y) == (answer, chain)
+        assert chain[-1] == f"Therefore {x} is the {answer.lower()} of {y}."
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from core.file_manager import align_stores, append_records, iter_json_array, iter_records, read_manifest
+
+ITEMS = [7.5e3, 1, -0.25, 12345678901234567890, 1e-7, 3.0E+2, True, None, "7.5e3", {"x": [1.5, 2e10]}, []]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 5, 7, 16, 1 << 16])
+@pytest.mark.parametrize("text", [
+    "[7.5e3, 1]",
+    "[7.5e3,1]",
+    json.dumps(ITEMS),
+    json.dumps(ITEMS, indent=2),
+    "[ 1e5 ,\n 2.5 ]",
+])
+def test_iter_json_array_chunk_boundaries(tmp_path, chunk_size, text):
+    path = tmp_path / "items.json"
+    path.write_text(text, encoding="utf-8")
+    assert list(iter_json_array(str(path), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+def test_iter_json_array_rejects_bad_separator(tmp_path, chunk_size):
+    path = tmp_path / "items.json"
+    path.write_text("[7.5x, 1]", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size))
+
+
+def test_align_stores_drops_the_unpaired_trailing_shard(tmp_path):
+    questions, answers = str(tmp_path / "questions"), str(tmp_path / "answers")
+    append_records(questions, [{"q": 0}, {"q": 1}])
+    append_records(answers, [{"a": 0}, {"a": 1}])
+    # a run that died between the two appends
+    append_records(questions, [{"q": 2}])
+
+    assert align_stores((questions, answers)) == 1
+    assert read_manifest(questions)["records"] == 2
+    assert sorted(p.name for p in (tmp_path / "questions").iterdir()) == ["manifest.json", "shard-000000.jsonl"]
+
+    append_records(questions, [{"q": 3}])
+    append_records(answers, [{"a": 3}])
+    assert [q["q"] for q in iter_records(questions)] == [0, 1, 3]
+    assert align_stores((questions, answers)) == 0
+
+
+def test_align_stores_refuses_mismatched_shards(tmp_path):
+    questions, answers = str(tmp_path / "questions"), str(tmp_path / "answers")
+    append_records(questions, [{"q": 0}, {"q": 1}])
+    append_records(answers, [{"a": 0}])
+    with pytest.raises(ValueError):
+        align_stores((questions, answers))
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+import generate_dataset
+from core.dedup import canonical_key
+from core.file_manager import append_records, iter_records, read_manifest
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    for name in ("QUESTIONS_STORE", "ANSWERS_STORE"):
+        monkeypatch.setattr(generate_dataset, name, str(tmp_path / name.lower()))
+    for name in ("QUESTIONS_FILE", "ANSWERS_FILE"):
+        monkeypatch.setattr(generate_dataset, name, str(tmp_path / "missing.json"))
+    monkeypatch.setattr(generate_dataset, "DEDUP_INDEX", str(tmp_path / "dedup.idx"))
+
+
+def test_series_quota_fills_with_distinct_items(stores):
+    report = generate_dataset.generate_quota(
+        {"series": 300}, generate_dataset.load_dedup_index(), rng=random.Random(0)
+    )
+    assert report["series"]["filled"] and report["series"]["accepted"] == 300
+    keys = {canonical_key(q) for q in iter_records(generate_dataset.QUESTIONS_STORE)}
+    assert len(keys) == 300
+
+
+def test_quota_outside_the_difficulty_band_is_reported_unfilled(stores):
+    report = generate_dataset.generate_quota(
+        {"series": 5}, generate_dataset.load_dedup_index(), {"series": (9, 9)}, rng=random.Random(0)
+    )
+    assert not report["series"]["filled"]
+    assert report["series"]["draws"] == 5 * generate_dataset.MAX_DRAWS_PER_ITEM
+
+
+def test_generation_drops_questions_left_without_answers(stores):
+    rng = random.Random(0)
+    generate_dataset.generate_batch(5, rng=rng)
+    orphan = generate_dataset.TOPIC_GENERATORS["series"](rng)[0]
+    append_records(generate_dataset.QUESTIONS_STORE, [orphan])
+
+    generate_dataset.generate_batch(5, rng=rng)
+    assert read_manifest(generate_dataset.QUESTIONS_STORE)["records"] == 10
+    assert read_manifest(generate_dataset.ANSWERS_STORE)["records"] == 10
+    assert orphan not in list(iter_records(generate_dataset.QUESTIONS_STORE))
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from core import lengths
+
+
+def best_fit_loads(sizes, max_length):
+    """Pack totals of a plain best-fit-decreasing packing."""
+    loads = []
+    for n in sorted(sizes, reverse=True):
+        fits = [j for j, load in enumerate(loads) if load + n <= max_length and n < max_length]
+        if fits:
+            j = min(fits, key=lambda j: max_length - loads[j])
+            loads[j] += n
+        else:
+            loads.append(n)
+    return sorted(loads)
+
+
+def test_tokenizers_count_content_and_overhead():
+    messages = [{"role": "user", "content": "two words"}, {"role": "assistant", "content": "é"}]
+    assert lengths.load_tokenizer("whitespace")(messages) == 3 + 2 * lengths.MESSAGE_OVERHEAD
+    assert lengths.load_tokenizer("bytes")(messages) == 11 + 2 * lengths.MESSAGE_OVERHEAD
+    with pytest.raises(ValueError):
+        lengths.load_tokenizer("words")
+
+
+def test_bucketed_order_batches_similar_lengths():
+    rng = random.Random(0)
+    sizes = [rng.randint(1, 500) for _ in range(104)]
+    order = lengths.bucketed_order(sizes, 8, seed=1)
+    assert sorted(order) == list(range(len(sizes)))
+    assert order == lengths.bucketed_order(sizes, 8, seed=1)
+    # each batch is a contiguous run of the sorted lengths
+    ranked = sorted(sizes)
+    batches = [sorted(sizes[i] for i in order[j:j + 8]) for j in range(0, len(order), 8)]
+    runs = [ranked[j:j + 8] for j in range(0, len(ranked), 8)]
+    assert sorted(batches) == sorted(runs)
+    assert lengths.padding_efficiency([sizes[i] for i in order], 8) >= lengths.padding_efficiency(sizes, 8)
+
+
+def test_greedy_pack_places_every_record_within_the_limit():
+    rng = random.Random(2)
+    for _ in range(50):
+        sizes = [rng.randint(1, 300) for _ in range(rng.randint(0, 200))]
+        packs = lengths.greedy_pack(sizes, 256, seed=3)
+        assert sorted(i for p in packs for i in p) == list(range(len(sizes)))
+        for p in packs:
+            assert len(p) == 1 or sum(sizes[i] for i in p) <= 256
+        assert sorted(sum(sizes[i] for i in p) for p in packs) == best_fit_loads(sizes, 256)
+
+
+def test_greedy_pack_fills_exact_fits():
+    packs = lengths.greedy_pack([6, 4, 5, 5, 10, 3], 10)
+    assert sorted(sorted(p) for p in packs) == [[0, 1], [2, 3], [4], [5]]
+
+
+def test_padding_efficiency():
+    assert lengths.padding_efficiency([4, 2, 3, 3], 2) == 12 / 14
+    assert lengths.padding_efficiency([], 2) == 1.0
+
+
+def test_sidecar_round_trip(tmp_path):
+    path = str(tmp_path / "train.lengths.json")
+    lengths.write_sidecar(path, "whitespace", 512, [5, 7], order=[[1], [0]])
+    assert lengths.read_sidecar(path) == {
+        "tokenizer": "whitespace", "max_length": 512, "records": 2, "lengths": [5, 7], "order": [[1], [0]]
+    }
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import verify_dataset
+from core.question_parser import record_difficulty
+from generators import mixed_series
+
+
+def test_fibonacci_mod_k_that_fits_several_moduli_is_ambiguous():
+    # 1, 0, 1, 1, 2, 3, 5, 8 is the Fibonacci recurrence mod every k from 9 up
+    assert len(mixed_series.continuations([1, 0, 1, 1, 2, 3, 5, 8])) > 1
+    assert mixed_series.continuations([3, 5, 7, 9, 11, 13, 15, 17]) == {19}
+
+
+def test_generate_rule_covers_every_rule_and_step():
+    rng = random.Random(0)
+    items = [mixed_series.generate_rule(rng)[0] for _ in range(2000)]
+    payloads = [q["payload"] for q in items]
+    assert {p["rule"] for p in payloads} == set(mixed_series.NUMBER_RULES)
+    assert {p["letter_step"] for p in payloads} == set(mixed_series.LETTER_STEPS)
+    assert {p["difficulty"] for p in payloads} == {1, 2, 3, 4}
+
+
+def test_generate_rule_items_have_one_answer():
+    rng = random.Random(1)
+    for _ in range(500):
+        q, a = mixed_series.generate_rule(rng)
+        answer = mixed_series.next_term(q["payload"])
+        assert len(mixed_series.continuations(q["payload"]["numbers"])) == 1
+        assert len(set(q["choices"])) == 4
+        assert q["choices"]["ABCD".index(a["answer"])][3:] == answer
+        assert verify_dataset.verify_series(q["question"])[:2] == ("solved", answer)
+
+
+def test_batch_ambiguity_check_matches_scalar():
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(2)
+    n = 5000
+    b = rng.integers(2, 10, n)
+    nums = mixed_series.number_terms(
+        np, rng.integers(0, 4, n), rng.integers(0, 10, n), b, rng.integers(1, b),
+        rng.choice(mixed_series.MODULI, n), mixed_series.SERIES_LENGTH
+    )
+    counts = mixed_series.count_continuations(np, nums)
+    assert counts.tolist() == [len(mixed_series.continuations(row)) for row in nums.tolist()]
+    assert (counts > 1).any()
+
+
+def test_generate_batch_covers_every_rule_with_one_answer():
+    np = pytest.importorskip("numpy")
+    items = mixed_series.generate_batch(2000, np.random.default_rng(3))
+    assert len(items) == 2000
+    assert {q["payload"]["rule"] for q, _ in items} == set(mixed_series.NUMBER_RULES)
+    for q, a in items:
+        assert len(mixed_series.continuations(q["payload"]["numbers"])) == 1
+        assert q["choices"]["ABCD".index(a["answer"])][3:] == mixed_series.next_term(q["payload"])
+
+
+def test_series_without_payload_scored_from_its_terms():
+    legacy = {"topic": mixed_series.TOPIC, "question": "Find next term:\nC0, E1, G4, I9, K6, M5, O6, Q9, ?"}
+    assert record_difficulty(legacy) == mixed_series.difficulty("square_mod", 2)
+    linear = {"topic": mixed_series.TOPIC, "question": "Find next term:\nA1, D3, G5, J7, M9, P11, S13, V15, ?"}
+    assert record_difficulty(linear) == mixed_series.difficulty("linear", 3)
@@ -0,0 +1,116 @@
+import itertools
+import random
+
+from generators import seating
+
+PEOPLE = list("ABCDEF")
+
+
+def arrangements(clues, people=PEOPLE):
+    return [p for p in itertools.permutations(people) if all(p.index(a) < p.index(b) for a, b in clues)]
+
+
+def test_cached_solve_matches_brute_force():
+    rng = random.Random(0)
+    cache = seating.SolutionCache()
+    for _ in range(300):
+        n = rng.randint(2, len(PEOPLE))
+        people = PEOPLE[:n]
+        clues = [tuple(rng.sample(people, 2)) for _ in range(rng.randint(0, 6))]
+        order = seating.build_order(clues, people)
+        expected = arrangements(clues, people)
+        if order is None:
+            assert not expected
+            continue
+        count, witness = seating.solve(order, cache)
+        assert count == len(expected)
+        assert tuple(people[x] for x in witness) in expected
+    assert cache.stats["hits"] > 0
+
+
+def test_relabeled_keys_never_mix_up_orders():
+    people = list("ABCD")
+    one = seating.build_order([("A", "B"), ("C", "D")], people)
+    other = seating.build_order([("A", "D"), ("C", "B")], people)
+    # isomorphic orders may get separate entries, each with the right count
+    cache = seating.SolutionCache()
+    assert seating.solve(one, cache)[0] == seating.solve(other, cache)[0] == 6
+
+    # seats that differ only in their label share an entry
+    twins = [seating.build_order([(a, "C"), ("D", b)], people) for a, b in (("A", "B"), ("B", "A"))]
+    assert seating.canonical_order(twins[0])[0] == seating.canonical_order(twins[1])[0]
+
+
+def test_cache_hits_misses_and_evictions():
+    cache = seating.SolutionCache(maxsize=2)
+    orders = [seating.build_order(c, list("ABC")) for c in ([("A", "B")], [("A", "B"), ("B", "C")], [])]
+    seating.solve(orders[0], cache)
+    seating.solve(seating.build_order([("C", "A")], list("ABC")), cache)
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0}
+    seating.solve(orders[1], cache)
+    seating.solve(orders[2], cache)
+    assert cache.stats["evictions"] == 1 and len(cache) == 2
+    seating.solve(orders[0], cache)
+    assert cache.stats["misses"] == 4
+
+
+def test_cache_file_is_appended_in_batches_and_compacted(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.txt")
+    monkeypatch.setattr(seating, "FLUSH_EVERY", 2)
+    cache = seating.SolutionCache(path=path)
+    cache.put("0,1", (1, (0, 1)))
+    assert not (tmp_path / "cache.txt").exists()
+    cache.put("0,0", (2, (0, 1)))
+    cache.put("0,1", (1, (0, 1)))
+    assert (tmp_path / "cache.txt").read_text().splitlines() == ["0,1 1 0,1", "0,0 2 0,1"]
+
+    with open(path, "a") as f:
+        f.write("0,1 1 0,1\n")
+    reloaded = seating.SolutionCache(path=path)
+    assert reloaded.get("0,0") == (2, (0, 1))
+    assert len((tmp_path / "cache.txt").read_text().splitlines()) == 2
+
+    reloaded.read_only()
+    reloaded.put("0,0,3", (1, (0, 1, 2)))
+    reloaded.flush()
+    assert len((tmp_path / "cache.txt").read_text().splitlines()) == 2
+
+
+def test_add_clue_narrows_closes_and_rejects_contradictions():
+    order = seating.add_clue(seating.empty_order(3), 0, 1)
+    order = seating.add_clue(order, 1, 2)
+    # "0 left of 1" and "1 left of 2" imply "0 left of 2"
+    assert order[2] == 0b011
+    assert seating.add_clue(order, 0, 2) == order
+    assert seating.add_clue(order, 2, 0) is None
+    assert seating.is_unique(order)
+
+
+def test_count_solutions_and_first_extension_match_brute_force():
+    rng = random.Random(1)
+    for _ in range(200):
+        clues = [tuple(rng.sample(PEOPLE, 2)) for _ in range(rng.randint(0, 8))]
+        order = seating.build_order(clues, PEOPLE)
+        if order is None:
+            continue
+        expected = arrangements(clues)
+        assert seating.count_solutions(order) == len(expected)
+        assert tuple(PEOPLE[x] for x in seating.first_extension(order)) in expected
+
+
+def test_unique_solution():
+    people = list("ABC")
+    assert seating.unique_solution([("A", "B"), ("B", "C")], people) == (True, ("A", "B", "C"))
+    assert seating.unique_solution([("A", "B")], people) == (False, None)
+    assert seating.unique_solution([("A", "B"), ("B", "A")], people) == (False, None)
+
+
+def test_generated_clues_fix_exactly_the_hidden_arrangement():
+    rng = random.Random(2)
+    for _ in range(50):
+        q, _ = seating.generate(rng, cache=seating.SolutionCache())
+        p = q["payload"]
+        clues = [(a, b) if d == "left" else (b, a) for a, d, b in p["clues"]]
+        assert arrangements(clues, list(p["people"])) == [tuple(p["solution"])]
+        assert p["arrangements"][-1] == 1
+        assert all(x > y for x, y in zip(p["arrangements"], p["arrangements"][1:]))
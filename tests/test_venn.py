@@ -0,0 +1,80 @@
+import random
+
+from generators import venn
+
+QUANTIFIERS = [("All", False), ("No", False), ("Some", False), ("Some", True)]
+
+
+def holds(prop, diagram):
+    quant, a, neg, b = prop
+    inside = [r for r in diagram if r >> a & 1]
+    if quant == "All":
+        return all(r >> b & 1 for r in inside)
+    if quant == "No":
+        return not any(r >> b & 1 for r in inside)
+    return any((r >> b & 1) != neg for r in inside)
+
+
+def brute_force(k, premises, conclusions):
+    """Verdicts by listing every diagram (set of occupied regions) with no empty term."""
+    diagrams = []
+    for occupied in range(1 << (1 << k)):
+        diagram = [r for r in range(1 << k) if occupied >> r & 1]
+        if all(any(r >> t & 1 for r in diagram) for t in range(k)) and all(holds(p, diagram) for p in premises):
+            diagrams.append(diagram)
+    if not diagrams:
+        return False, (), False
+    verdicts = []
+    for c in conclusions:
+        truths = {holds(c, d) for d in diagrams}
+        verdicts.append(venn.FOLLOWS if truths == {True} else venn.CONTRADICTED if truths == {False} else venn.UNCERTAIN)
+    either_or = verdicts == [venn.UNCERTAIN] * 2 and all(any(holds(c, d) for c in conclusions) for d in diagrams)
+    return True, tuple(verdicts), either_or
+
+
+def random_prop(rng, k):
+    quant, neg = rng.choice(QUANTIFIERS)
+    a, b = rng.sample(range(k), 2)
+    return quant, a, neg, b
+
+
+def test_analyse_shape_matches_diagram_enumeration():
+    rng = random.Random(0)
+    for _ in range(400):
+        k = rng.choice((2, 3))
+        premises = tuple(random_prop(rng, k) for _ in range(rng.randint(1, 3)))
+        conclusions = tuple(random_prop(rng, k) for _ in range(2))
+        consistent, verdicts, either_or, _ = venn.analyse_shape(k, premises, conclusions)
+        assert (consistent, verdicts, either_or) == brute_force(k, premises, conclusions), (premises, conclusions)
+
+
+def test_classic_syllogisms():
+    all_ab, all_bc = ("All", 0, False, 1), ("All", 1, False, 2)
+    some_ac, no_ac = ("Some", 0, False, 2), ("No", 0, False, 2)
+    _, verdicts, _, _ = venn.analyse_shape(3, (all_ab, all_bc), (("All", 0, False, 2), no_ac))
+    assert verdicts == (venn.FOLLOWS, venn.CONTRADICTED)
+
+    # "Some A are C" and "No A are C" are complementary: one of them always holds
+    _, verdicts, either_or, _ = venn.analyse_shape(3, (all_ab,), (some_ac, no_ac))
+    assert verdicts == (venn.UNCERTAIN, venn.UNCERTAIN) and either_or
+    assert venn.answer_for(verdicts, either_or) == venn.ANSWERS["either"]
+
+    consistent, _, _, _ = venn.analyse_shape(2, (all_ab, ("No", 0, False, 1)), (all_ab,))
+    assert not consistent
+
+
+def test_witness_names_the_forcing_premise():
+    # "Some A are B" alone makes "No A are B" false
+    _, verdicts, _, witnesses = venn.analyse_shape(2, (("All", 1, False, 0), ("Some", 0, False, 1)), (("No", 0, False, 1),))
+    assert verdicts == (venn.CONTRADICTED,) and witnesses == (1,)
+    # with "All A are B", only A being non-empty gives "Some A are B"
+    _, verdicts, _, witnesses = venn.analyse_shape(2, (("All", 0, False, 1),), (("Some", 0, False, 1),))
+    assert verdicts == (venn.FOLLOWS,) and witnesses == (-1,)
+
+
+def test_analyse_is_independent_of_term_names():
+    premises = [("All", "cats", False, "dogs"), ("Some", "dogs", True, "birds")]
+    conclusions = [("Some", "cats", False, "dogs"), ("No", "cats", False, "birds")]
+    k, ps, cs, names = venn.canonical_shape(premises, conclusions)
+    assert (k, names) == (3, ["cats", "dogs", "birds"])
+    assert venn.analyse(premises, conclusions) == venn.analyse_shape(k, ps, cs)
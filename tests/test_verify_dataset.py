@@ -0,0 +1,43 @@
+import random
+
+import verify_dataset
+from generators import blood_relation
+
+# a legacy record: A and E are both C's father, so A is F's brother
+LEGACY_KINSHIP = {
+    "topic": "Blood Relations and Family Tree",
+    "question": "A is the father of B. B is the sister of C. C is the son of D. D is the wife of E. "
+                "E is the brother of F. How is A related to F?",
+    "choices": ["A) Grandfather", "B) Brother-in-law", "C) Father", "D) Uncle"],
+    "expected_answer": "B",
+}
+
+
+def test_legacy_brother_in_law_label_is_a_mismatch():
+    kind, status, keyed, solved, _ = verify_dataset.verify_record(LEGACY_KINSHIP)
+    assert (kind, status, keyed, solved) == ("kinship", "mismatch", "Brother-in-law", "Brother")
+
+
+def test_kinship_model_agrees_with_the_generator():
+    rng = random.Random(0)
+    for _ in range(300):
+        q, _ = blood_relation.generate(rng)
+        assert verify_dataset.verify_record(q)[1] == "ok", q["question"]
+
+
+def test_kinship_relations_from_stated_facts():
+    cases = [
+        ("A is the brother of B. B is the mother of C. How is A related to C?", "Uncle"),
+        ("A is the wife of B. B is the brother of C. How is A related to C?", "Sister-in-law"),
+        ("A is the son of B. B is the sister of C. C is the father of D. How is A related to D?", "Cousin"),
+        ("A is the father of B. C is the mother of B. How is A related to C?", "Husband"),
+    ]
+    for text, relation in cases:
+        assert verify_dataset.verify_kinship(text) == ("solved", relation, None), text
+
+
+def test_contradictory_kinship_facts_are_unsolved():
+    status, solved, note = verify_dataset.verify_kinship(
+        "A is the father of B. A is the mother of C. How is A related to B?"
+    )
+    assert (status, solved) == ("unsolved", None)
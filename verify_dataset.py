@@ -0,0 +1,447 @@
+import argparse
+import itertools
+import json
+import os
+import string
+import sys
+import time
+from multiprocessing import Pool
+
+from core.file_manager import iter_json_array, read_manifest, read_shard
+from core.question_parser import (
+    choice_text, topic_kind, parse_seating, parse_series, parse_syllogism, parse_kinship
+)
+from generators import seating, venn, family_graph
+
+# Re-solve every question from its text and compare with the keyed answer.
+#
+# Each topic has its own solver that works on the question text only (the
+# generator payload is ignored), so a bug in a generator cannot vouch for
+# itself. Every record gets one status:
+#   ok         the solver's answer is the keyed choice
+#   mismatch   the solver found a different answer
+#   ambiguous  the question has more than one valid answer
+#   unsolved   the solver could not read or solve the question
+#   skipped    no solver for the topic
+
+QUESTIONS_FILE="dataset/questions.json"
+QUESTIONS_STORE="dataset/store/questions"
+
+STATUSES=("ok","mismatch","ambiguous","unsolved","skipped")
+CHUNK_SIZE=10000
+
+# largest modulus the series fitter tries for "mod k" number rules
+MAX_MODULUS=16
+
+# SQUARE_STARTS[k][first three terms] -> offsets a with (i+a)^2 mod k
+SQUARE_STARTS={k:{} for k in range(1,MAX_MODULUS+1)}
+for k,starts in SQUARE_STARTS.items():
+    for a in range(k):
+        starts.setdefault(tuple((i+a)**2 % k for i in range(3)),[]).append(a)
+
+COUNT_NUMBERS={w.lower():n for n,w in seating.COUNT_WORDS.items()}
+
+def verify_seating(text):
+    body=parse_seating(text)
+    count=COUNT_NUMBERS.get(text.split(" ",1)[0].lower())
+    if count is None or body.ask is None:
+        return "unsolved",None,"cannot read the question"
+    people=list(string.ascii_uppercase[:count])
+    clues=[(a,b) if d=="left" else (b,a) for a,d,b in body.clues]
+    if any(p not in people for c in clues for p in c) or body.ask not in people:
+        return "unsolved",None,"names outside the stated group"
+    order=seating.build_order(clues,people)
+    if order is None:
+        return "unsolved",None,"contradictory clues"
+    if not seating.is_unique(order):
+        count,_=seating.solve(order)
+        return "ambiguous",None,f"{len(clues)} clues leave {count} arrangements"
+    solution=seating.solution_of(order,people)
+    return "solved",str(solution.index(body.ask)+1),None
+
+def fit_letters(letters):
+    """Next letter of a constant-step (mod 26) letter sequence, or None."""
+    if len(letters)<2:
+        return None
+    idx=[ord(l)-65 for l in letters]
+    step=(idx[1]-idx[0]) % 26
+    if any((b-a) % 26!=step for a,b in zip(idx,idx[1:])):
+        return None
+    return chr(65+(idx[-1]+step) % 26)
+
+def fit_numbers(nums):
+    """Next numbers predicted by every number rule that fits the terms."""
+    n=len(nums)
+    out=set()
+    if n<3:
+        return out
+    diffs=[b-a for a,b in zip(nums,nums[1:])]
+    if len(set(diffs[0::2]))==1 and len(set(diffs[1::2]))==1:
+        # constant or alternating differences
+        out.add(nums[-1]+diffs[(n-1) % 2])
+    head=tuple(nums[:3])
+    for k in range(max(nums)+1,MAX_MODULUS+1):
+        for a in SQUARE_STARTS[k].get(head,()):
+            if all((i+a)**2 % k==v for i,v in enumerate(nums)):
+                out.add((n+a)**2 % k)
+        if all((x+y) % k==z for x,y,z in zip(nums,nums[1:],nums[2:])):
+            out.add((nums[-2]+nums[-1]) % k)
+    return out
+
+def verify_series(text):
+    body=parse_series(text)
+    if body is None or len(body.letters)!=len(body.numbers):
+        return "unsolved",None,"cannot read the terms"
+    letter=fit_letters(body.letters)
+    numbers=fit_numbers(body.numbers)
+    if letter is None or not numbers:
+        return "unsolved",None,"no rule fits"
+    if len(numbers)>1:
+        return "ambiguous",None,"rules disagree on the next number: "+", ".join(map(str,sorted(numbers)))
+    return "solved",f"{letter}{numbers.pop()}",None
+
+def verify_syllogism(text):
+    body=parse_syllogism(text)
+    if body is None or not body.premises or not body.conclusions or None in body.conclusions:
+        return "unsolved",None,"cannot read the statements"
+    if len(body.premises)!=len(body.statements):
+        return "unsolved",None,"unreadable premise"
+    consistent,verdicts,either_or,_=venn.analyse(body.premises,body.conclusions)
+    if not consistent:
+        return "unsolved",None,"premises contradict each other"
+    if len(verdicts)==2:
+        return "solved",venn.answer_for(verdicts,either_or),None
+    return "solved","Follows" if verdicts[0]==venn.FOLLOWS else "Does not follow",None
+
+# Kinship questions are re-solved on a family rebuilt from the stated facts,
+# not with the generator's move algebra: everyone has one father, one mother
+# and at most one spouse, siblings share both parents and a child's parents
+# are married. People (and the unnamed parents the facts imply) that these
+# rules force together are merged, and the relation is read off ancestor
+# tables; only the naming of relations (family_graph.TERMS) is shared.
+
+ROLE_FACTS={role:(kind,g) for kind,pair in family_graph.ROLES.items() for g,role in enumerate(pair)}
+PARENT_SLOTS=("father","mother")
+
+class Contradiction(Exception):
+    pass
+
+class Family:
+    """Union-find over people; each class has a gender, parents and a spouse."""
+
+    def __init__(self):
+        self.parent={}
+        self.people={}
+        self.unnamed=0
+
+    def find(self, x):
+        while self.parent[x]!=x:
+            self.parent[x]=self.parent[self.parent[x]]
+            x=self.parent[x]
+        return x
+
+    def add(self, name=None, gender=None):
+        named=name is not None
+        if not named:
+            self.unnamed+=1
+            name=f"?{self.unnamed}"
+        if name not in self.parent:
+            self.parent[name]=name
+            self.people[name]={"named":named,"gender":None,"father":None,"mother":None,"spouse":None}
+        x=self.find(name)
+        self.set_gender(x,gender)
+        return x
+
+    def get(self, x, slot):
+        y=self.people[self.find(x)][slot]
+        return None if y is None else self.find(y)
+
+    def set_gender(self, x, gender):
+        p=self.people[self.find(x)]
+        if gender is not None and p["gender"] not in (None,gender):
+            raise Contradiction(f"{x} is stated as both male and female")
+        if p["gender"] is None:
+            p["gender"]=gender
+
+    def set(self, x, slot, y):
+        """x's father, mother or spouse is y; merges y with whoever already holds the slot."""
+        p=self.people[self.find(x)]
+        if p[slot] is None:
+            p[slot]=self.find(y)
+            return True
+        return self.merge(p[slot],y)
+
+    def merge(self, a, b):
+        work=[(a,b)]
+        merged=False
+        while work:
+            a,b=(self.find(x) for x in work.pop())
+            if a==b:
+                continue
+            keep,gone=self.people[a],self.people.pop(b)
+            self.parent[b]=a
+            merged=True
+            keep["named"]|=gone["named"]
+            self.set_gender(a,gone["gender"])
+            for slot in ("father","mother","spouse"):
+                if keep[slot] is None:
+                    keep[slot]=gone[slot]
+                elif gone[slot] is not None:
+                    work.append((keep[slot],gone[slot]))
+        return merged
+
+    def marry(self, a, b):
+        ga,gb=(self.people[self.find(x)]["gender"] for x in (a,b))
+        if ga is not None and ga==gb:
+            raise Contradiction(f"{a} and {b} are stated as spouses of the same gender")
+        self.set_gender(a,None if gb is None else 1-gb)
+        self.set_gender(b,None if ga is None else 1-ga)
+        return self.set(a,"spouse",b)|self.set(b,"spouse",a)
+
+    def parents(self, x):
+        """x's father and mother, creating unnamed ones as needed."""
+        out=[]
+        for g,slot in enumerate(PARENT_SLOTS):
+            if self.get(x,slot) is None:
+                self.set(x,slot,self.add(None,g))
+            out.append(self.get(x,slot))
+        return out
+
+    def close(self):
+        """Marry every child's parents until nothing more gets merged."""
+        while True:
+            changed=False
+            for x in list(self.people):
+                if x in self.people and any(self.people[x][s] for s in PARENT_SLOTS):
+                    before=self.unnamed
+                    father,mother=self.parents(x)
+                    changed|=self.marry(father,mother) or self.unnamed!=before
+            if not changed:
+                return
+
+    def ancestors(self, x):
+        """{ancestor: generations up}, x itself at 0."""
+        table={self.find(x):0}
+        frontier=list(table)
+        up=0
+        while frontier:
+            up+=1
+            parents=[]
+            for c in frontier:
+                for p in (self.get(c,s) for s in PARENT_SLOTS):
+                    if p is not None and p not in table:
+                        table[p]=up
+                        parents.append(p)
+            frontier=parents
+        return table
+
+def family_from_facts(facts):
+    fam=Family()
+    unsexed=[]
+    for a,role,b in facts:
+        kind,g=ROLE_FACTS[role]
+        fam.add(a,g)
+        fam.add(b)
+        if kind=="spouse":
+            fam.marry(a,b)
+        elif kind=="sibling":
+            father,mother=fam.parents(a)
+            fam.set(b,"father",father)
+            fam.set(b,"mother",mother)
+    for a,role,b in facts:
+        kind,g=ROLE_FACTS[role]
+        if kind=="parent":
+            fam.set(b,PARENT_SLOTS[g],a)
+        elif kind=="child":
+            unsexed.append((a,b))
+    for child,parent in unsexed:
+        g=fam.people[fam.find(parent)]["gender"]
+        if g is None:
+            # the parent's gender is never stated: take a slot no named
+            # person holds yet
+            held=[fam.get(child,s) for s in PARENT_SLOTS]
+            if fam.find(parent) in held:
+                continue
+            free=[i for i,p in enumerate(held) if p is None or not fam.people[p]["named"]]
+            if not free:
+                raise Contradiction(f"{child} has more than two parents")
+            g=free[0]
+        fam.set(child,PARENT_SLOTS[g],parent)
+    fam.close()
+    return fam
+
+def stated_genders(facts):
+    """Genders the facts state: from each subject's role, and opposite a spouse's."""
+    genders={a:ROLE_FACTS[role][1] for a,role,_ in facts}
+    for a,role,b in facts:
+        if ROLE_FACTS[role][0]=="spouse" and b not in genders:
+            genders[b]=1-genders[a]
+    return genders
+
+def kin_key(fam, x, y):
+    """Relation key of x to y in the style of family_graph.TERMS, or None."""
+    def blood(u, v):
+        au,av=fam.ancestors(u),fam.ancestors(v)
+        common=[(au[c]+av[c],au[c],av[c]) for c in au if c in av]
+        return ("",)+min(common)[1:]+("",) if common else None
+    key=blood(x,y)
+    if key:
+        return key
+    sx,sy=fam.get(x,"spouse"),fam.get(y,"spouse")
+    key=blood(sx,y) if sx is not None else None
+    if key:
+        return ("S",)+key[1:]
+    key=blood(x,sy) if sy is not None else None
+    if key:
+        return key[:3]+("S",)
+    return None
+
+def verify_kinship(text):
+    body=parse_kinship(text)
+    if not body.query or not body.facts:
+        return "unsolved",None,"cannot read the relations"
+    if any(role not in ROLE_FACTS for _,role,_ in body.facts):
+        return "unsolved",None,"unknown relation word"
+    try:
+        fam=family_from_facts(body.facts)
+    except Contradiction as e:
+        return "unsolved",None,str(e)
+    x,y=body.query
+    if x not in fam.parent or y not in fam.parent:
+        return "unsolved",None,"the question names someone the facts do not"
+    gender=stated_genders(body.facts).get(x)
+    relation=family_graph.term(kin_key(fam,x,y),gender) if gender is not None else None
+    if relation is None:
+        return "unsolved",None,"relation not derivable from the facts"
+    return "solved",relation,None
+
+SOLVERS={
+    "seating":verify_seating,
+    "series":verify_series,
+    "syllogism":verify_syllogism,
+    "kinship":verify_kinship,
+}
+
+def verify_record(q):
+    """(kind, status, keyed answer text, solver answer, note)"""
+    kind=topic_kind(q.get("topic",""))
+    solver=SOLVERS.get(kind)
+    if solver is None:
+        return kind,"skipped",None,None,None
+    keyed=choice_text(q.get("choices",[]),q.get("expected_answer",""))
+    status,solved,note=solver(q.get("question",""))
+    if status=="solved":
+        texts=[c.partition(")")[2].strip() for c in q.get("choices",[])]
+        if keyed is None or keyed!=solved:
+            status="mismatch"
+        elif texts.count(keyed)>1:
+            status,note="ambiguous","keyed answer appears in more than one choice"
+        else:
+            status="ok"
+    return kind,status,keyed,solved,note
+
+def verify_chunk(start, questions, max_issues=None):
+    counts={}
+    issues=[]
+    for i,q in enumerate(questions,start):
+        kind,status,keyed,solved,note=verify_record(q)
+        per_kind=counts.setdefault(kind,dict.fromkeys(STATUSES,0))
+        per_kind[status]+=1
+        if status in ("mismatch","ambiguous","unsolved") and (max_issues is None or len(issues)<max_issues):
+            issues.append({"index":i,"topic":kind,"status":status,"keyed":keyed,"solved":solved,"note":note})
+    return len(questions),counts,issues
+
+def _verify_shard(task):
+    store_dir,shard,max_issues=task
+    return verify_chunk(shard["start"],read_shard(store_dir,shard),max_issues)
+
+def _verify_list(task):
+    return verify_chunk(*task)
+
+def json_chunks(path, size=CHUNK_SIZE):
+    it=iter_json_array(path)
+    start=0
+    while True:
+        chunk=list(itertools.islice(it,size))
+        if not chunk:
+            return
+        yield start,chunk
+        start+=len(chunk)
+
+def verify(source, workers=1, max_issues=1000):
+    """
+    Verify a question store directory or JSON array file over `workers`
+    processes (one task per shard / chunk). Status counts cover every record;
+    only the first max_issues issues are listed (None for all).
+    """
+    t0=time.perf_counter()
+    if os.path.isdir(source):
+        tasks=((source,s,max_issues) for s in read_manifest(source)["shards"])
+        fn=_verify_shard
+    else:
+        tasks=((start,chunk,max_issues) for start,chunk in json_chunks(source))
+        fn=_verify_list
+
+    report={"source":source,"records":0,"topics":{},"issues":[]}
+
+    def merge(results):
+        for n,counts,issues in results:
+            report["records"]+=n
+            for kind,c in counts.items():
+                per_kind=report["topics"].setdefault(kind,dict.fromkeys(STATUSES,0))
+                for status,v in c.items():
+                    per_kind[status]+=v
+            room=None if max_issues is None else max_issues-len(report["issues"])
+            report["issues"].extend(issues[:room])
+
+    if workers>1:
+        with Pool(workers) as pool:
+            merge(pool.imap(fn,tasks))
+    else:
+        merge(map(fn,tasks))
+
+    seconds=time.perf_counter()-t0
+    report["seconds"]=round(seconds,3)
+    report["records_per_sec"]=round(report["records"]/seconds) if seconds else None
+    report["issue_count"]=sum(c[s] for c in report["topics"].values() for s in ("mismatch","ambiguous","unsolved"))
+    return report
+
+def print_report(report, max_issues=20, out=sys.stdout):
+    print(f"{report['records']} records verified in {report['seconds']}s "
+          f"({report['records_per_sec']} records/sec)",file=out)
+    print(f"{'topic':<10}"+"".join(f"{s:>10}" for s in STATUSES),file=out)
+    for kind,c in sorted(report["topics"].items()):
+        print(f"{kind:<10}"+"".join(f"{c[s]:>10}" for s in STATUSES),file=out)
+    issues=report["issues"]
+    for issue in issues[:max_issues]:
+        line=f"#{issue['index']} {issue['topic']} {issue['status']}: keyed {issue['keyed']!r}"
+        if issue["solved"] is not None:
+            line+=f", solved {issue['solved']!r}"
+        if issue["note"]:
+            line+=f" ({issue['note']})"
+        print(line,file=out)
+    shown=min(len(issues),max_issues)
+    if report["issue_count"]>shown:
+        print(f"... {report['issue_count']-shown} more issues",file=out)
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Re-solve every question and check the keyed answers")
+    parser.add_argument("source",nargs="?",default=None,
+                        help="question store directory or JSON array file "
+                             f"(default: {QUESTIONS_STORE} if it exists, else {QUESTIONS_FILE})")
+    parser.add_argument("--workers",type=int,default=os.cpu_count())
+    parser.add_argument("--max-issues",type=int,default=20,
+                        help="issues to print")
+    parser.add_argument("--report",default=None,help="write the report as JSON here")
+    parser.add_argument("--report-issues",type=int,default=1000,
+                        help="issues to list in the --report file (0 for all)")
+    args=parser.parse_args()
+
+    source=args.source or (QUESTIONS_STORE if os.path.isdir(QUESTIONS_STORE) else QUESTIONS_FILE)
+    keep=None if args.report_issues==0 else max(args.max_issues,args.report_issues)
+    report=verify(source,args.workers,keep)
+    print_report(report,args.max_issues)
+    if args.report:
+        with open(args.report,"w",encoding="utf-8") as f:
+            json.dump(report,f,indent=2)
+    sys.exit(1 if any(c["mismatch"] for c in report["topics"].values()) else 0)